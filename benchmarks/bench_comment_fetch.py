@@ -0,0 +1,44 @@
+"""
+Comment-expansion benchmark against the offline fake Reddit client.
+
+Every simulated API round trip sleeps for `--latency` seconds, so the run
+shows how wall-clock time drops as comment trees are fetched concurrently.
+
+Usage (from the repo root):
+    python benchmarks/bench_comment_fetch.py --posts 200 --latency 0.05
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import ingestion  # noqa: E402
+from fake_reddit import FakeReddit  # noqa: E402
+from ratelimit import TokenBucket  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rpm", type=float, default=6000, help="simulated API quota (requests/minute)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'workers':>7} {'seconds':>9} {'posts/sec':>11} {'speedup':>8}")
+    for workers in args.workers:
+        reddit = FakeReddit(posts=args.posts, latency=args.latency, match_ratio=1.0)
+        ingestion.api_budget = TokenBucket(rate=args.rpm / 60, capacity=workers)
+        start = time.perf_counter()
+        posts = list(ingestion.fetch_posts("Insurance", limit=args.posts, reddit=reddit, workers=workers))
+        elapsed = time.perf_counter() - start
+        rate = len(posts) / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>7} {elapsed:>9.2f} {rate:>11.1f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
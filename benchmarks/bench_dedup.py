@@ -0,0 +1,113 @@
+"""
+Near-duplicate detection benchmark on the synthetic corpus plus perturbed
+copies of some of its posts (a "[x-post]" title prefix and a share of the body
+words replaced), as cross-posts and reposts look:
+
+  throughput     posts per second through DuplicateIndex.stream
+  recall         copies put in their original's cluster, per perturbation level
+  false merges   original posts put in another post's cluster
+  sentiment      copies that took their cluster's score instead of being scored
+  LLM calls      text summaries of a batch of clustered posts, stub model, with
+                 and without sharing them across a cluster
+  top posts      distinct stories among the top-N posts, with and without dedupe
+
+Usage (from the repo root):
+    python benchmarks/bench_dedup.py --posts 5000 --copies 500
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+sys.path.insert(0, str(HERE))
+
+from corpus import generate_posts  # noqa: E402
+from dedup import DEDUP_THRESHOLD, DuplicateIndex  # noqa: E402
+from scoring import score_stream  # noqa: E402
+from storage import Storage  # noqa: E402
+from summary_worker import SummaryWorker  # noqa: E402
+from text_summarizer import StubModel, set_model  # noqa: E402
+
+# Shares of body words replaced in the copies
+PERTURBATIONS = (0.0, 0.02, 0.05, 0.1)
+FILLER = ["really", "honestly", "lol", "btw", "edit", "update", "anyway", "ugh"]
+
+
+def perturb(post: dict, share: float, suffix: str, rng: random.Random) -> dict:
+    """A copy of `post` with ID <id><suffix>, a cross-post title and `share` of its body words replaced."""
+    words = post["body"].split()
+    for _ in range(int(len(words) * share)):
+        words[rng.randrange(len(words))] = rng.choice(FILLER)
+    return {**post, "id": f"{post['id']}{suffix}", "title": f"[x-post] {post['title']}", "body": " ".join(words),
+            "comments": [], "created_utc": post["created_utc"] + rng.randrange(60, 7200)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--copies", type=int, default=500, help="perturbed copies per perturbation level")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Unscored, as ingestion fetches them
+    posts = [{k: v for k, v in p.items() if k not in ("score", "label")} for p in generate_posts(args.posts)]
+    copies = {
+        share: [perturb(p, share, f"x{i}", rng) for p in rng.sample(posts, args.copies)]
+        for i, share in enumerate(PERTURBATIONS)
+    }
+    original_of = {c["id"]: c["id"][:-2] for level in copies.values() for c in level}
+    # Originals arrive before their copies
+    records = posts + rng.sample([c for level in copies.values() for c in level], len(original_of))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = Storage(Path(tmp) / "dedup.db")
+        # The corpus spans 90 days; keep all of it in the index
+        index = DuplicateIndex(store, window_days=365)
+        print(f"{len(posts)} posts, {args.copies} copies per level, threshold {DEDUP_THRESHOLD}")
+
+        start = time.perf_counter()
+        clustered = list(index.stream(dict(r) for r in records))
+        elapsed = time.perf_counter() - start
+        print(f"throughput: {len(clustered) / elapsed:.0f} posts/s")
+
+        cluster_of = {r["id"]: r["cluster_id"] for r in clustered}
+        for share, level in copies.items():
+            found = sum(cluster_of[c["id"]] == cluster_of[original_of[c["id"]]] for c in level)
+            print(f"recall, {share:.0%} of words changed: {found / len(level):.3f}")
+        false = sum(cluster_of[p["id"]] != p["id"] for p in posts)
+        print(f"false merges: {false} of {len(posts)} originals")
+
+        # Score and store the originals, then run fresh copies through the pipeline
+        store.save(list(score_stream(clustered)))
+        fresh = [perturb(p, 0.02, "y", rng) for p in rng.sample(posts, args.copies)]
+        reused = sum("score" in r for r in index.stream(fresh))
+        print(f"sentiment reused: {reused} of {len(fresh)} new copies")
+
+        # Summaries for a batch of posts from a few stories
+        model = StubModel()
+        set_model(model)
+        stories = rng.sample(posts, 4)
+        batch = [perturb(p, 0.02, f"z{i}", rng) for p in stories for i in range(2)]
+        store.save(list(score_stream(index.stream(batch))))
+        ids = [p["id"] for p in stories] + [p["id"] for p in batch]
+        # Comment summaries stay per post (cross-posts get different comments); count text summaries only
+        for post_id in ids:
+            store.update_summaries(post_id, "", "No comments to summarize.")
+        SummaryWorker(store, batch_size=len(ids))._process_batch(ids)
+        print(f"LLM calls for {len(ids)} posts of {len(stories)} stories: {model.calls} (batched), "
+              f"{len(ids)} without clusters or batching")
+
+        for dedupe in (False, True):
+            top = store.get_top_posts("Positive", 20, 90, dedupe=dedupe)
+            stories = {store.get_post_by_id(p[0])["cluster_id"] or p[0] for p in top}
+            print(f"top 20 positive, dedupe={dedupe}: {len(stories)} distinct stories")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Export benchmark: wall time and peak Python memory (tracemalloc) of getting
+every post out of the database
+
+  fetchall         SELECT * into one list, as pandas.read_sql does
+  iter_posts       Storage.iter_posts, fetchmany in EXPORT_CHUNK_ROWS chunks
+  ndjson           the body GET /export streams, drained as the server would
+  arrow export     manage.py export to a day-partitioned Arrow IPC snapshot
+  parquet export   the same as Parquet
+  append           an incremental export after 1% more posts arrive
+
+and reading the Arrow snapshot back, memory-mapped. tracemalloc slows the
+allocation-heavy modes down; compare seconds between modes, not to production.
+
+Usage (from the repo root):
+    python benchmarks/bench_export.py --posts 100000
+    python benchmarks/bench_export.py --db /tmp/export.db --posts 1000000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from itertools import islice
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+sys.path.insert(0, str(HERE))
+
+from corpus import generate_posts  # noqa: E402
+
+
+def save(store, posts) -> None:
+    from storage import SAVE_BATCH_SIZE
+
+    while batch := list(islice(posts, SAVE_BATCH_SIZE)):
+        store.save(batch)
+
+
+def run(name: str, fn) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<16} {rows:>9} {elapsed:>9.2f} {peak / 2**20:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--db", help="reuse (or build) the database at this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        # The API opens its own Storage at DB_PATH when imported
+        os.environ["DB_PATH"] = args.db or str(tmp / "export.db")
+        # Imported up front so their import cost stays out of the memory peaks
+        import pyarrow.ipc
+        import pyarrow.parquet  # noqa: F401
+        import api
+        # pyarrow imports its timezone support (pandas included) on the first timestamp conversion
+        pyarrow.array([0], type=pyarrow.timestamp("s", tz="UTC"))
+        from export import export_posts
+        from storage import COMPRESSED_COLUMNS, EXPORT_COLUMNS
+
+        store = api.store
+        with store._connection() as con:
+            stored = con.execute("SELECT count(*) FROM posts").fetchone()[0]
+        # The corpus is deterministic: skip the posts already stored
+        corpus = islice(generate_posts(max(args.posts, stored) + args.posts // 100), stored, None)
+        if stored < args.posts:
+            print(f"Building a {args.posts}-post database...")
+            save(store, islice(corpus, args.posts - stored))
+
+        def fetchall():
+            with store._connection() as con:
+                columns = (f"inflate({c})" if c in COMPRESSED_COLUMNS else c for c in EXPORT_COLUMNS)
+                return len(con.execute(f"SELECT {', '.join(columns)} FROM posts").fetchall())
+
+        def stream():
+            return sum(len(chunk) for chunk in store.iter_posts())
+
+        def ndjson():
+            # The test client buffers whole responses, so drain the body generator instead
+            async def drain():
+                rows = 0
+                async for body in api._ndjson(store.iter_posts()):
+                    rows += body.count(b"\n")
+                return rows
+
+            return asyncio.run(drain())
+
+        def read_arrow():
+            import pyarrow as pa
+
+            rows = 0
+            for path in (tmp / "arrow").glob("day=*/*.arrow"):
+                with pa.memory_map(str(path)) as source:
+                    rows += pa.ipc.open_file(source).read_all().num_rows
+            return rows
+
+        print(f"{'mode':<16} {'rows':>9} {'seconds':>9} {'peak MiB':>11}")
+        run("fetchall", fetchall)
+        run("iter_posts", stream)
+        run("ndjson", ndjson)
+        run("arrow export", lambda: export_posts(store, tmp / "arrow", fmt="arrow")["rows"])
+        run("parquet export", lambda: export_posts(store, tmp / "parquet", fmt="parquet")["rows"])
+        run("arrow read (mmap)", read_arrow)
+        save(store, corpus)
+        run("append", lambda: export_posts(store, tmp / "arrow")["rows"])
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
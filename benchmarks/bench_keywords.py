@@ -0,0 +1,117 @@
+"""
+Keyword filter micro-benchmark: the compiled KeywordMatcher against the
+original per-keyword `keyword.lower() in post_text.lower()` loop, with the
+shipped keywords file and with a large synthetic term list.
+
+First checks KeywordMatcher.find against one whole-word regex per term on
+texts full of overlapping terms, and exits 1 if they disagree.
+
+Usage (from the repo root):
+    python benchmarks/bench_keywords.py --posts 20000 --terms 2000
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from keywords import KeywordMatcher, _is_acronym, load_keywords  # noqa: E402
+
+WORDS = [
+    "claim", "denied", "agent", "premium", "great", "terrible", "roof", "hail",
+    "policy", "renewal", "deductible", "coverage", "quote", "switched", "the", "my",
+]
+
+
+# Terms that overlap each other: nested, sharing words, and starting inside one another
+OVERLAPPING = [
+    "State Farm", "Farm Bureau", "State Farm Bureau", "Jake from State Farm", "State Farm Bank",
+    "bank", "SF", "SF Bay", "Bay Area", "statefarm.com", "farm",
+]
+
+
+def reference_find(text: str, terms: list[str]) -> list[str]:
+    """What find() must return: each term searched for on its own."""
+    found = []
+    for term in terms:
+        body = r"\s+".join(re.escape(word) for word in term.split())
+        flags = 0 if _is_acronym(term) else re.IGNORECASE
+        if re.search(rf"(?<!\w){body}(?!\w)", text, flags):
+            found.append(term)
+    return found
+
+
+def check_find(rng: random.Random, n: int = 2000) -> bool:
+    matcher = KeywordMatcher(OVERLAPPING)
+    fillers = ["the", "agent", "Bay", "sfo", "farms", "State", "from", "Bank.", "SF,"]
+    for _ in range(n):
+        words = rng.choices(OVERLAPPING + fillers, k=rng.randint(1, 12))
+        text = " ".join(w.lower() if rng.random() < 0.3 else w for w in words)
+        expected = reference_find(text, OVERLAPPING)
+        if matcher.find(text) != expected:
+            print(f"find({text!r}) = {matcher.find(text)}, expected {expected}")
+            return False
+    print(f"find() matches per-term search on {n} texts with overlapping terms")
+    return True
+
+
+def loop_filter(texts: list[str], keywords: list[str]) -> int:
+    return sum(1 for t in texts if any(keyword.lower() in t.lower() for keyword in keywords))
+
+
+def matcher_filter(texts: list[str], matcher: KeywordMatcher) -> int:
+    return sum(1 for t in texts if matcher.matches(t))
+
+
+def make_texts(n: int, terms: list[str], rng: random.Random) -> list[str]:
+    texts = []
+    for _ in range(n):
+        words = rng.choices(WORDS, k=rng.randint(20, 200))
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(terms))
+        texts.append(" ".join(words))
+    return texts
+
+
+def run(name: str, texts: list[str], terms: list[str]):
+    start = time.perf_counter()
+    matcher = KeywordMatcher(terms)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loop_hits = loop_filter(texts, terms)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matcher_hits = matcher_filter(texts, matcher)
+    matcher_time = time.perf_counter() - start
+
+    print(
+        f"{name:<18} {len(terms):>6} {loop_time:>9.3f} {matcher_time:>10.3f} {build:>8.3f} "
+        f"{loop_time / matcher_time:>7.1f}x  hits {loop_hits}/{matcher_hits}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--terms", type=int, default=2000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    if not check_find(rng):
+        sys.exit(1)
+
+    # Hit counts can differ: the loop also matches terms inside other words
+    print(f"{'term list':<18} {'terms':>6} {'loop s':>9} {'matcher s':>10} {'build s':>8} {'speedup':>8}")
+    shipped = load_keywords()
+    run("keywords.txt", make_texts(args.posts, shipped, rng), shipped)
+
+    synthetic = [f"{rng.choice(['agent', 'product', 'brand'])} {i:05d} {rng.choice(WORDS)}" for i in range(args.terms)]
+    run("synthetic", make_texts(args.posts, synthetic, rng), synthetic)
+
+
+if __name__ == "__main__":
+    main()
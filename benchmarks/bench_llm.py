@@ -0,0 +1,79 @@
+"""
+LLM summarization benchmark with the deterministic stub model (no network):
+LLM calls and wall time to summarize a set of posts
+
+  per-post       one summarize_post call per post, no cache (the old path)
+  batched        summarize_posts, LLM_BATCH_SIZE posts per call, cold llm_cache
+  batched, warm  the same posts again, answered from llm_cache
+  comments       summarize_comments per post, cold then warm
+
+and a run where the first calls fail, to show retries with backoff.
+
+Usage (from the repo root):
+    python benchmarks/bench_llm.py --posts 64 --latency 0.5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+sys.path.insert(0, str(HERE))
+
+# Keep the failure demo short; must be set before text_summarizer is imported
+os.environ.setdefault("LLM_BACKOFF_SECONDS", "0.05")
+
+from corpus import generate_posts  # noqa: E402
+from llm_cache import LLMCache  # noqa: E402
+from storage import Storage  # noqa: E402
+import text_summarizer  # noqa: E402
+from text_summarizer import StubModel, set_model, summarize_comments, summarize_post, summarize_posts  # noqa: E402
+
+
+def run(name: str, model: StubModel, fn) -> dict:
+    calls = model.calls
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<22} {model.calls - calls:>9} {elapsed:>9.2f}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per stub LLM call")
+    args = parser.parse_args()
+
+    posts = [{"id": p["id"], "title": p["title"], "body": p["body"], "comments": p["comments"]}
+             for p in generate_posts(args.posts)]
+    model = StubModel(latency=args.latency)
+    set_model(model)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = Storage(Path(tmp) / "llm.db")
+        cache = LLMCache(store)
+        print(f"{args.posts} posts, {args.latency}s per LLM call, batches of {text_summarizer.LLM_BATCH_SIZE}, "
+              f"{text_summarizer.LLM_CONCURRENCY} calls in flight")
+        print(f"{'mode':<22} {'LLM calls':>9} {'seconds':>9}")
+
+        single = run("per-post", model, lambda: {p["id"]: summarize_post(p["title"], p["body"]) for p in posts})
+        batched = run("batched", model, lambda: summarize_posts(posts, cache=cache))
+        run("batched, warm", model, lambda: summarize_posts(posts, cache=cache))
+        for label in ("comments", "comments, warm"):
+            run(label, model, lambda: [
+                summarize_comments([c["body"] for c in p["comments"]], cache=cache) for p in posts if p["comments"]
+            ])
+        print(f"batched summaries identical to per-post: {batched == single}")
+
+        flaky = StubModel(latency=args.latency, failures=2)
+        set_model(flaky)
+        run("per-post, 2 failures", flaky, lambda: summarize_post(posts[0]["title"], posts[0]["body"]))
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+End-to-end ingestion memory benchmark: fetch -> score -> save against the
+offline fake Reddit client, reporting peak traced memory per corpus size.
+Peak memory should stay roughly flat as the number of posts grows.
+
+Usage (from the repo root):
+    python benchmarks/bench_pipeline.py --posts 1000 10000 50000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from dedup import DuplicateIndex  # noqa: E402
+import ingestion  # noqa: E402
+from fake_reddit import FakeReddit  # noqa: E402
+from ratelimit import TokenBucket  # noqa: E402
+from score_cache import ScoreCache  # noqa: E402
+from storage import Storage  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    ingestion.api_budget = TokenBucket(rate=1e9)
+    print(f"{'posts':>7} {'seconds':>9} {'posts/sec':>11} {'peak MiB':>9}")
+    for n in args.posts:
+        with tempfile.TemporaryDirectory() as tmp:
+            ingestion.store = Storage(os.path.join(tmp, "bench.db"))
+            ingestion.score_cache = ScoreCache(ingestion.store)
+            ingestion.duplicate_index = DuplicateIndex(ingestion.store)
+            reddit = FakeReddit(posts=n, comments_per_post=20)
+            tracemalloc.start()
+            start = time.perf_counter()
+            ingestion.run_ingestion("Insurance", limit=n, incremental=False, reddit=reddit)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        print(f"{n:>7} {elapsed:>9.2f} {n / elapsed:>11.0f} {peak / 2**20:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
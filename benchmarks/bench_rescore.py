@@ -0,0 +1,123 @@
+"""
+Rescore benchmark: `manage.py rescore` on a synthetic database after
+
+  thresholds   a label threshold change: posts are relabelled from their stored score
+  lexicon      a lexicon change: posts are re-scored with VADER, per worker count
+  throttled    a lexicon change at --rate posts/s, while this process runs
+               get_top_posts and get_sentiment_summary as the API would
+
+reporting posts per second, posts changed, read latency during the throttled
+run against an idle database, and whether the rollups still match a full
+recount. Each step writes a new analyzer config, so every post is stale again.
+
+Usage (from the repo root):
+    python benchmarks/bench_rescore.py --posts 20000 --workers 1 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from itertools import islice
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+SRC = HERE.parent / "src"
+sys.path.insert(0, str(SRC))
+sys.path.insert(0, str(HERE))
+
+from corpus import generate_posts  # noqa: E402
+from storage import SAVE_BATCH_SIZE, Storage  # noqa: E402
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def rescore(db_path: Path, config: dict, config_path: Path, *options: str) -> float:
+    """Run `manage.py rescore` with `config` as the analyzer file; return its wall time."""
+    config_path.write_text(json.dumps(config))
+    env = {**os.environ, "DB_PATH": str(db_path), "ANALYZER_FILE": str(config_path)}
+    start = time.perf_counter()
+    subprocess.run([sys.executable, str(SRC / "manage.py"), "rescore", *options], env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def read_latencies(store: Storage, stop: threading.Event) -> list[float]:
+    """Milliseconds per dashboard read (top posts and the summary) until `stop` is set."""
+    times = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        store.get_top_posts("Positive", 5, 7)
+        store.get_sentiment_summary()
+        times.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.005)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--rate", type=float, default=1000, help="throttle of the throttled run, posts/s")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, config_path = Path(tmp) / "rescore.db", Path(tmp) / "analyzer.json"
+        store = Storage(db_path)
+        print(f"Building a {args.posts}-post database...")
+        corpus = generate_posts(args.posts)
+        while batch := list(islice(corpus, SAVE_BATCH_SIZE)):
+            store.save(batch)
+
+        print(f"{'run':<20} {'seconds':>8} {'posts/s':>9} {'changed':>9}")
+
+        def scores() -> dict:
+            with store._connection() as con:
+                return {rowid: scored for rowid, *scored in con.execute("SELECT rowid, sentiment, label FROM posts")}
+
+        def report(name: str, seconds: float, before: dict):
+            changed = sum(scored != before[rowid] for rowid, scored in scores().items())
+            print(f"{name:<20} {seconds:>8.1f} {args.posts / seconds:>9.0f} {changed:>9}")
+
+        before = scores()
+        report("thresholds", rescore(db_path, {"positive_threshold": 0.1, "negative_threshold": -0.1},
+                                      config_path, "--rate", "0"), before)
+        for i, workers in enumerate(args.workers):
+            before = scores()
+            config = {"lexicon": {"lowballed": -2.0, "denied": -2.0 - i / 10}}
+            report(f"lexicon, {workers} workers",
+                   rescore(db_path, config, config_path, "--rate", "0", "--workers", str(workers)), before)
+
+        stop = threading.Event()
+        idle = []
+        reader = threading.Thread(target=lambda: idle.extend(read_latencies(store, stop)))
+        reader.start()
+        time.sleep(2)
+        stop.set()
+        reader.join()
+
+        stop.clear()
+        busy = []
+        reader = threading.Thread(target=lambda: busy.extend(read_latencies(store, stop)))
+        reader.start()
+        before = scores()
+        seconds = rescore(db_path, {"lexicon": {"lowballed": -3.0}}, config_path,
+                          "--rate", str(args.rate), "--workers", str(args.workers[-1]))
+        stop.set()
+        reader.join()
+        report(f"throttled, {args.rate:g}/s", seconds, before)
+
+        print(f"dashboard reads, idle:       p50 {percentile(idle, 50):.2f} ms, p99 {percentile(idle, 99):.2f} ms")
+        print(f"dashboard reads, rescoring:  p50 {percentile(busy, 50):.2f} ms, p99 {percentile(busy, 99):.2f} ms")
+        print(f"rollup mismatches: {len(store.verify_rollups())}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
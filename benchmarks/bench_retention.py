@@ -0,0 +1,97 @@
+"""
+Retention benchmark: database size and query latency of a 90-day corpus stored
+as plain text (as before compression), then
+
+  compress   manage.py maintain: compress bodies and summaries, merge the search index,
+             incremental vacuum, ANALYZE
+  archive    manage.py archive: move posts older than --days to the archive database
+  maintain   manage.py maintain again, reclaiming the pages the archived posts used
+
+Sizes include the WAL. Rollup-backed aggregates must not change along the way.
+
+Usage (from the repo root):
+    python benchmarks/bench_retention.py --posts 100000 --days 30
+"""
+import argparse
+import sys
+import tempfile
+import time
+from itertools import islice
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+sys.path.insert(0, str(HERE))
+
+from corpus import generate_posts  # noqa: E402
+import storage  # noqa: E402
+from storage import SAVE_BATCH_SIZE, Storage  # noqa: E402
+
+
+def size_mib(path: Path) -> float:
+    wal = path.with_name(f"{path.name}-wal")
+    return (path.stat().st_size + (wal.stat().st_size if wal.exists() else 0)) / 2**20
+
+
+def latency_ms(fn, repeat: int = 20) -> float:
+    """Median milliseconds over `repeat` calls, after one warm-up."""
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return sorted(times)[len(times) // 2]
+
+
+def report(step: str, seconds: float, store: Storage, db_path: Path):
+    now = int(time.time())
+    print(f"{step:<10} {seconds:>8.1f} {size_mib(db_path):>9.1f} "
+          f"{latency_ms(lambda: store.get_top_posts('Positive', 5, 7)):>11.2f} "
+          f"{latency_ms(lambda: store.get_trend(now - 90 * 86400, now, 'day')):>10.2f} "
+          f"{latency_ms(lambda: store.search('claim'), 5):>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--days", type=float, default=30, help="retention window")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, archive_path = Path(tmp) / "retention.db", Path(tmp) / "archive.db"
+        store = Storage(db_path)
+        print(f"Building a {args.posts}-post database without compression...")
+        min_bytes, storage.COMPRESS_MIN_BYTES = storage.COMPRESS_MIN_BYTES, 0
+        corpus = generate_posts(args.posts)
+        while batch := list(islice(corpus, SAVE_BATCH_SIZE)):
+            store.save(batch)
+        storage.COMPRESS_MIN_BYTES = min_bytes
+        with store._connection() as con:
+            con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        aggregates = (store.get_sentiment_summary(), store.get_daily_counts(120))
+
+        print(f"{'step':<10} {'seconds':>8} {'DB MiB':>9} {'top 7d ms':>11} {'trend ms':>10} {'search ms':>10}")
+        report("start", 0, store, db_path)
+
+        start = time.perf_counter()
+        compressed = store.compress_posts()
+        store.optimize()
+        report("compress", time.perf_counter() - start, store, db_path)
+
+        start = time.perf_counter()
+        archived = store.archive_posts(int(time.time() - args.days * 86400), archive_path)
+        report("archive", time.perf_counter() - start, store, db_path)
+
+        start = time.perf_counter()
+        store.optimize()
+        report("maintain", time.perf_counter() - start, store, db_path)
+
+        print(f"{compressed} posts compressed, {archived} archived ({size_mib(archive_path):.1f} MiB archive); "
+              f"aggregates unchanged: {(store.get_sentiment_summary(), store.get_daily_counts(120)) == aggregates}, "
+              f"rollup mismatches: {len(store.verify_rollups())}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
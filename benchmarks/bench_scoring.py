@@ -0,0 +1,60 @@
+"""
+Scoring throughput benchmark: posts/sec for analyze_sentiments at increasing
+worker counts.
+
+Usage (from the repo root):
+    python benchmarks/bench_scoring.py --posts 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from scoring import score_records  # noqa: E402
+
+WORDS = [
+    "claim", "denied", "agent", "premium", "great", "terrible", "helpful", "slow",
+    "State", "Farm", "policy", "renewal", "love", "hate", "rate", "increase",
+    "adjuster", "quick", "awful", "fair", "the", "my", "was", "and", "after",
+]
+
+
+def make_posts(n: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"p{i}",
+            "title": " ".join(rng.choices(WORDS, k=8)),
+            "body": " ".join(rng.choices(WORDS, k=rng.randint(20, 200))),
+        }
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    posts = make_posts(args.posts)
+    cores = os.cpu_count() or 1
+    worker_counts = sorted({1, *(w for w in (2, 4, 8, 16) if w <= cores), cores})
+
+    baseline = None
+    print(f"{'workers':>7} {'seconds':>9} {'posts/sec':>11} {'speedup':>8}")
+    for workers in worker_counts:
+        start = time.perf_counter()
+        score_records(posts, workers=workers, chunk_size=args.chunk_size)
+        elapsed = time.perf_counter() - start
+        rate = len(posts) / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>7} {elapsed:>9.2f} {rate:>11.0f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Full-text search benchmark: Storage.search (FTS5, BM25-ranked) against the
+LIKE scan over titles, bodies and comments it replaces, on a synthetic
+corpus (benchmarks/corpus.py) with common, mid-frequency and rare terms.
+
+"LIKE page" is the newest `--limit` matches, which stops early for common
+terms but must scan the whole table for rare ones; "LIKE all" finds every
+match, as ranking or counting LIKE results requires.
+
+Usage (from the repo root):
+    python benchmarks/bench_search.py --posts 100000
+    python benchmarks/bench_search.py --db /tmp/search.db --posts 1000000
+"""
+import argparse
+import sys
+import tempfile
+import time
+from itertools import islice
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+sys.path.insert(0, str(HERE))
+
+from corpus import LONG_TAIL, generate_posts  # noqa: E402
+from storage import SAVE_BATCH_SIZE, Storage  # noqa: E402
+
+# name -> (FTS5 query, LIKE pattern)
+QUERIES = {
+    "common word": ("claim", "%claim%"),
+    "frequent tail word": (LONG_TAIL[0], f"%{LONG_TAIL[0]}%"),
+    "mid tail word": (LONG_TAIL[500], f"%{LONG_TAIL[500]}%"),
+    "rare tail word": (LONG_TAIL[15000], f"%{LONG_TAIL[15000]}%"),
+    "phrase": ('"State Farm agent"', "%State Farm agent%"),
+    "prefix": (f"{LONG_TAIL[500][:4]}*", f"%{LONG_TAIL[500][:4]}%"),
+}
+
+LIKE_SQL = """
+    SELECT p.id FROM posts p
+    WHERE p.title LIKE :pattern OR inflate(p.body) LIKE :pattern
+       OR EXISTS (SELECT 1 FROM comments c WHERE c.post_id = p.id AND c.body LIKE :pattern)
+    ORDER BY p.created_utc DESC
+    LIMIT :limit
+"""
+
+
+def build(db_path: Path, posts: int) -> Storage:
+    store = Storage(db_path)
+    if store.get_data_version() == 0:
+        print(f"Building a {posts}-post database...")
+        start = time.perf_counter()
+        corpus = generate_posts(posts)
+        while batch := list(islice(corpus, SAVE_BATCH_SIZE)):
+            store.save(batch)
+        print(f"  {time.perf_counter() - start:.1f}s")
+    return store
+
+
+def timed(fn, repeat: int) -> tuple[float, int]:
+    """Median milliseconds over `repeat` calls (after one warm-up) and the result size."""
+    result = fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return sorted(times)[len(times) // 2], len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=20, help="results per query (one page)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", help="reuse (or build) the database at this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = build(Path(args.db) if args.db else Path(tmp) / "search.db", args.posts)
+        with store._connection() as con:
+            docs = con.execute("SELECT count(*) FROM posts").fetchone()[0]
+        print(f"{docs} posts, {args.limit} results per query, median of {args.repeat} runs")
+        print(f"{'query':<20} {'matches':>8} {'LIKE page ms':>13} {'LIKE all ms':>12} {'FTS ms':>9} {'vs all':>8}")
+        for name, (match, pattern) in QUERIES.items():
+            def like(limit):
+                with store._connection() as con:
+                    return con.execute(LIKE_SQL, {"pattern": pattern, "limit": limit}).fetchall()
+
+            page_ms, _ = timed(lambda: like(args.limit), args.repeat)
+            all_ms, _ = timed(lambda: like(-1), args.repeat)
+            fts_ms, _ = timed(lambda: store.search(match, limit=args.limit), args.repeat)
+            with store._connection() as con:
+                matches = con.execute("SELECT count(*) FROM posts_fts WHERE posts_fts MATCH ?", (match,)).fetchone()[0]
+            print(f"{name:<20} {matches:>8} {page_ms:>13.1f} {all_ms:>12.1f} {fts_ms:>9.1f} {all_ms / fts_ms:>7.1f}x")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Cold-start benchmark: how long a fresh interpreter takes to import each
+service entry point (API, ingestion worker, scheduler, summary worker),
+plus a `python -X importtime` breakdown of where that time goes, summed
+per top-level package.
+
+Usage (from the repo root):
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 20 --top 15 api
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+# Modules the service processes import on start
+ENTRY_POINTS = ("api", "ingestion", "scheduler", "summary_worker")
+
+
+def _run(args: list[str], db_path: Path) -> subprocess.CompletedProcess:
+    # Every entry point opens the database at import; keep it off the real one
+    env = {**os.environ, "DB_PATH": str(db_path)}
+    return subprocess.run(
+        [sys.executable, *args], cwd=SRC, env=env, capture_output=True, text=True, check=True
+    )
+
+
+def cold_start_ms(module: str, runs: int, db_path: Path) -> list[float]:
+    """Wall-clock milliseconds of `runs` fresh interpreters importing `module` (after one warm-up run)."""
+    _run(["-c", f"import {module}"], db_path)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        _run(["-c", f"import {module}"], db_path)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def import_profile(module: str, db_path: Path) -> tuple[float, Counter]:
+    """Total import milliseconds of `module` and self time per top-level package, from -X importtime."""
+    stderr = _run(["-X", "importtime", "-c", f"import {module}"], db_path).stderr
+    total, packages = 0.0, Counter()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        packages[name.split(".")[0]] += int(self_us) / 1000
+        if name == module:
+            total = int(cumulative_us) / 1000
+    return total, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="*", metavar="entry_point", help=f"any of {', '.join(ENTRY_POINTS)} (default: all)")
+    parser.add_argument("--runs", type=int, default=10, help="cold starts timed per entry point")
+    parser.add_argument("--top", type=int, default=8, help="packages listed per entry point")
+    args = parser.parse_args()
+    targets = args.targets or ENTRY_POINTS
+    if unknown := set(targets) - set(ENTRY_POINTS):
+        parser.error(f"unknown entry points: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "startup.db"
+        print(f"{'entry point':<16} {'p50 ms':>8} {'min ms':>8} {'import ms':>10}")
+        profiles = {}
+        for module in targets:
+            times = sorted(cold_start_ms(module, args.runs, db_path))
+            total, packages = profiles[module] = import_profile(module, db_path)
+            print(f"{module:<16} {times[len(times) // 2]:>8.0f} {times[0]:>8.0f} {total:>10.0f}")
+
+        for module, (total, packages) in profiles.items():
+            print(f"\n{module}: slowest packages to import (self time, ms)")
+            for package, ms in packages.most_common(args.top):
+                print(f"  {package:<28} {ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Benchmark suite on a synthetic corpus (benchmarks/corpus.py).
+
+Builds a temporary database at the chosen scale and measures:
+  scoring   posts and comments per second through scoring.score_records/score_comments
+  insert    posts per second through Storage.save (comments, terms and rollup triggers included)
+  queries   p50/p99 latency of every Storage read query
+  api       p50/p99 latency of the API endpoints through FastAPI's TestClient
+  startup   cold-start time of a fresh interpreter importing the API and the ingestion worker
+
+Results are printed as a table and, with --output, written as JSON. Each
+metric is checked against benchmarks/thresholds.json for the scale; any
+regression makes the run exit 1.
+
+Usage (from the repo root):
+    python benchmarks/bench_suite.py --scale 1k
+    python benchmarks/bench_suite.py --scale 100k --output results-100k.json
+    python benchmarks/bench_suite.py --scale 1m --only insert queries
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from itertools import islice
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+sys.path.insert(0, str(HERE))
+
+from corpus import LONG_TAIL, SCALES, TERMS, generate_posts, make_post, scale_size  # noqa: E402
+
+SECTIONS = ("scoring", "insert", "queries", "api", "startup")
+THRESHOLDS_FILE = HERE / "thresholds.json"
+# Scoring throughput is measured on at most this many posts
+SCORING_SAMPLE = 20_000
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def measure(fn, repeat: int) -> dict:
+    """Call `fn` once to warm up, then `repeat` times; return latency stats in milliseconds."""
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50_ms": round(percentile(times, 50), 3),
+        "p99_ms": round(percentile(times, 99), 3),
+        "mean_ms": round(sum(times) / len(times), 3),
+        "runs": repeat,
+    }
+
+
+def bench_scoring(args, results: dict):
+    from scoring import score_comments, score_records
+
+    sample = [
+        {"id": p["id"], "title": p["title"], "body": p["body"], "comments": p["comments"]}
+        for p in generate_posts(min(args.posts, SCORING_SAMPLE), seed=args.seed)
+    ]
+    comments = sum(len(p["comments"]) for p in sample)
+
+    start = time.perf_counter()
+    score_records(sample)
+    elapsed = time.perf_counter() - start
+    results["scoring.posts"] = {"per_sec": round(len(sample) / elapsed, 1), "count": len(sample)}
+
+    start = time.perf_counter()
+    score_comments(sample)
+    elapsed = time.perf_counter() - start
+    results["scoring.comments"] = {"per_sec": round(comments / elapsed, 1), "count": comments}
+
+
+def bench_insert(args, results: dict, db_path: Path):
+    from storage import SAVE_BATCH_SIZE, Storage
+
+    store = Storage(db_path)
+    corpus = generate_posts(args.posts, seed=args.seed, now=args.now)
+    posts = comments = 0
+    elapsed = 0.0
+    # Only the saves are timed, not generating the corpus
+    while batch := list(islice(corpus, SAVE_BATCH_SIZE)):
+        start = time.perf_counter()
+        store.save(batch)
+        elapsed += time.perf_counter() - start
+        posts += len(batch)
+        comments += sum(len(p["comments"]) for p in batch)
+    store.close()
+    results["insert"] = {
+        "per_sec": round(posts / elapsed, 1),
+        "comments_per_sec": round(comments / elapsed, 1),
+        "count": posts,
+        "seconds": round(elapsed, 3),
+    }
+
+
+def ensure_database(args, db_path: Path):
+    if not db_path.exists():
+        print(f"Building a {args.posts}-post database for the query benchmarks...")
+        bench_insert(args, {}, db_path)
+
+
+def storage_queries(store, args) -> dict:
+    """Every Storage read query, as name -> (callable, repeat)."""
+    rng = random.Random(args.seed)
+    ids = [make_post(rng.randrange(args.posts), seed=args.seed, now=args.now)["id"] for _ in range(100)]
+    pick = lambda: rng.choice(ids)  # noqa: E731
+    cache_keys = [f"{i:064x}" for i in range(500)]
+    heavy = max(1, args.repeat // 10)
+    return {
+        "get_data_version": (store.get_data_version, args.repeat),
+        "get_daily_counts(7)": (lambda: store.get_daily_counts(7), args.repeat),
+        "get_daily_counts(90)": (lambda: store.get_daily_counts(90), args.repeat),
+        "get_sentiment_summary": (store.get_sentiment_summary, args.repeat),
+        "get_top_posts(Positive, 7d)": (lambda: store.get_top_posts("Positive", 5, 7), args.repeat),
+        "get_top_posts(Negative, 7d)": (lambda: store.get_top_posts("Negative", 5, 7), args.repeat),
+        "get_top_posts(Positive, 90d)": (lambda: store.get_top_posts("Positive", 5, 90), args.repeat),
+        "get_top_posts(Positive, 7d, dedupe)": (
+            lambda: store.get_top_posts("Positive", 5, 7, dedupe=True), args.repeat
+        ),
+        "get_top_posts(Positive, 7d, term)": (
+            lambda: store.get_top_posts("Positive", 5, 7, term=TERMS[0]), args.repeat
+        ),
+        "get_terms": (store.get_terms, heavy),
+        "get_post_by_id": (lambda: store.get_post_by_id(pick()), args.repeat),
+        "sample_comments(random)": (lambda: store.sample_comments(pick(), 50, "random"), args.repeat),
+        "sample_comments(extreme)": (lambda: store.sample_comments(pick(), 50, "extreme"), args.repeat),
+        "get_unscored_comments": (store.get_unscored_comments, heavy),
+        "get_cached_scores(500)": (lambda: store.get_cached_scores(cache_keys), args.repeat),
+        "get_checkpoint": (lambda: store.get_checkpoint("Insurance", int(args.now - 3 * 86400)), args.repeat),
+        "get_summary_job": (lambda: store.get_summary_job(pick()), args.repeat),
+        "get_ingestion_state": (lambda: store.get_ingestion_state("Insurance"), args.repeat),
+        "get_ingestion_runs": (store.get_ingestion_runs, args.repeat),
+        "verify_rollups": (store.verify_rollups, heavy),
+        "search(common)": (lambda: store.search("claim"), heavy),
+        "search(rare)": (lambda: store.search(LONG_TAIL[5000]), args.repeat),
+        "search(phrase, Negative)": (lambda: store.search('"State Farm agent"', label="Negative"), heavy),
+        "get_trend(hour, 365d)": (
+            lambda: store.get_trend(int(args.now) - 365 * 86400, int(args.now), "hour", 24), heavy
+        ),
+        "get_trend(day, 90d)": (lambda: store.get_trend(int(args.now) - 90 * 86400, int(args.now), "day", 7), args.repeat),
+    }
+
+
+def bench_queries(args, results: dict, db_path: Path):
+    from storage import Storage
+
+    ensure_database(args, db_path)
+    store = Storage(db_path)
+    for name, (fn, repeat) in storage_queries(store, args).items():
+        results[f"query.{name}"] = measure(fn, repeat)
+    store.close()
+
+
+def bench_api(args, results: dict, db_path: Path):
+    ensure_database(args, db_path)
+    from fastapi.testclient import TestClient
+    import api
+
+    post_ids = [make_post(i, seed=args.seed, now=args.now)["id"] for i in range(20)]
+    for post_id in post_ids:
+        # /summarize is measured on the cached path; LLM latency is not the API's
+        api.store.update_summaries(post_id, "benchmark summary", "benchmark comment summary")
+    ids = iter(post_ids * (args.repeat + 1))
+    yesterday = time.strftime("%Y-%m-%d", time.gmtime(args.now - 86400))
+
+    with TestClient(api.app) as client:
+        etag = client.get("/dashboard").headers["etag"]
+        requests = {
+            "GET /health": lambda: client.get("/health"),
+            "GET /top-positive": lambda: client.get("/top-positive"),
+            "GET /top-negative": lambda: client.get("/top-negative"),
+            "GET /top-positive?term": lambda: client.get("/top-positive", params={"term": TERMS[0]}),
+            "GET /terms": lambda: client.get("/terms"),
+            "GET /sentiment-summary": lambda: client.get("/sentiment-summary"),
+            "GET /daily-summary": lambda: client.get("/daily-summary"),
+            "GET /dashboard": lambda: client.get("/dashboard"),
+            "GET /dashboard (304)": lambda: client.get("/dashboard", headers={"If-None-Match": etag}),
+            "GET /summarize/{id}": lambda: client.get(f"/summarize/{next(ids)}", params={"wait": 0}),
+            "GET /search": lambda: client.get("/search", params={"q": LONG_TAIL[500]}),
+            "GET /trend": lambda: client.get("/trend", params={"granularity": "hour", "window": 24}),
+            "GET /export (1 day)": lambda: client.get("/export", params={"since": yesterday, "until": yesterday}),
+        }
+        for name, request in requests.items():
+            response = request()
+            if response.status_code >= 400:
+                raise RuntimeError(f"{name} returned {response.status_code}: {response.text}")
+            results[f"api.{name}"] = measure(request, args.repeat)
+
+
+def bench_startup(args, results: dict, db_path: Path):
+    from bench_startup import cold_start_ms
+
+    ensure_database(args, db_path)
+    for module in ("api", "ingestion"):
+        times = cold_start_ms(module, max(5, args.repeat // 5), db_path)
+        results[f"startup.{module}"] = {
+            "p50_ms": round(percentile(times, 50), 3),
+            "p99_ms": round(percentile(times, 99), 3),
+            "mean_ms": round(sum(times) / len(times), 3),
+            "runs": len(times),
+        }
+
+
+def check_thresholds(results: dict, thresholds: dict) -> list[dict]:
+    """Compare results against {metric: {stat: {"min"|"max": limit}}}; return every check made."""
+    checks = []
+    for metric, stats in thresholds.items():
+        if metric not in results:
+            continue
+        for stat, bound in stats.items():
+            value = results[metric].get(stat)
+            if value is None:
+                continue
+            ok = (value >= bound["min"]) if "min" in bound else (value <= bound["max"])
+            checks.append({"metric": metric, "stat": stat, **bound, "value": value, "ok": ok})
+    return checks
+
+
+def print_results(results: dict):
+    print(f"{'metric':<44} {'p50 ms':>9} {'p99 ms':>9} {'per sec':>11}")
+    for name, r in results.items():
+        p50 = f"{r['p50_ms']:.2f}" if "p50_ms" in r else ""
+        p99 = f"{r['p99_ms']:.2f}" if "p99_ms" in r else ""
+        rate = f"{r['per_sec']:.0f}" if "per_sec" in r else ""
+        print(f"{name:<44} {p50:>9} {p99:>9} {rate:>11}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="1k", help=f"{', '.join(SCALES)} or a post count (default: %(default)s)")
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument("--repeat", type=int, default=50, help="timed calls per query or endpoint")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", help="reuse (or build) the benchmark database at this path")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--thresholds", default=THRESHOLDS_FILE, help="regression thresholds (default: %(default)s)")
+    parser.add_argument("--no-check", action="store_true", help="report results without checking thresholds")
+    args = parser.parse_args()
+    args.posts = scale_size(args.scale)
+    # Corpus timestamps are relative to one "now" for the whole run
+    args.now = time.time()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(args.db) if args.db else Path(tmp) / "bench.db"
+        # The API module opens the default database at import time
+        os.environ["DB_PATH"] = str(db_path)
+        os.environ.setdefault("SUMMARIZER_MODEL", "stub")
+        os.environ.setdefault("PREGENERATE_SUMMARIES", "0")
+
+        results = {}
+        for section in SECTIONS:
+            if section not in args.only:
+                continue
+            print(f"== {section}")
+            if section == "scoring":
+                bench_scoring(args, results)
+            elif section == "insert":
+                if db_path.exists():
+                    print(f"  {db_path} exists; skipping insert")
+                    continue
+                bench_insert(args, results, db_path)
+            elif section == "queries":
+                bench_queries(args, results, db_path)
+            elif section == "api":
+                bench_api(args, results, db_path)
+            elif section == "startup":
+                bench_startup(args, results, db_path)
+
+    print_results(results)
+
+    checks = []
+    thresholds_path = Path(args.thresholds)
+    if not args.no_check and thresholds_path.exists():
+        scale_key = args.scale if args.scale in SCALES else None
+        checks = check_thresholds(results, json.loads(thresholds_path.read_text()).get(scale_key, {}))
+        for c in checks:
+            if not c["ok"]:
+                limit = f">= {c['min']}" if "min" in c else f"<= {c['max']}"
+                print(f"REGRESSION {c['metric']} {c['stat']} = {c['value']} (expected {limit})")
+        print(f"{sum(c['ok'] for c in checks)}/{len(checks)} threshold checks passed")
+
+    if args.output:
+        report = {
+            "scale": args.scale,
+            "posts": args.posts,
+            "seed": args.seed,
+            "environment": {
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+            },
+            "results": results,
+            "checks": checks,
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"Wrote {args.output}")
+
+    return 1 if any(not c["ok"] for c in checks) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
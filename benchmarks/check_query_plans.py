@@ -0,0 +1,241 @@
+"""
+Query plan check: call every Storage method against a synthetic database with
+its SQL traced, run EXPLAIN QUERY PLAN on each statement, and fail when a plan
+reads a whole table (a full scan, or a full pass over one of its indexes)
+that is not in ALLOWED_SCANS.
+
+The check runs on a fresh database, as the API first sees it, and again after
+`manage.py maintain` has ANALYZEd it, since statistics change the planner's
+choices. Statements are explained with the values they were run with.
+
+Usage (from the repo root):
+    python benchmarks/check_query_plans.py
+    python benchmarks/check_query_plans.py --posts 20000 --verbose
+"""
+import argparse
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from argparse import Namespace
+from itertools import islice
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+sys.path.insert(0, str(HERE))
+
+from bench_suite import storage_queries  # noqa: E402
+from corpus import generate_posts, make_post  # noqa: E402
+from dedup import DuplicateIndex  # noqa: E402
+from storage import SAVE_BATCH_SIZE, Storage  # noqa: E402
+
+# (method, table) -> why reading the whole table is expected there
+ALLOWED_SCANS = {
+    ("get_terms", "post_terms"): "counts every keyword match; cached by the API per data version",
+    ("verify_rollups", "posts"): "recounts every post to compare with the rollups",
+    ("verify_rollups", "daily_rollup"): "compares every rollup row",
+    ("verify_rollups", "hourly_rollup"): "compares every rollup row",
+    ("verify_rollups", "archived_rollup"): "recounts archived posts with the live ones",
+    ("rebuild_rollups", "posts"): "recounts every post",
+    ("rebuild_rollups", "archived_rollup"): "recounts archived posts with the live ones",
+    ("rebuild_rollups", "daily_rollup"): "sums every day into the label totals",
+    ("rebuild_search_index", "posts"): "reindexes every post",
+    ("archive_posts", "post_terms"): "clears the archived posts' terms in one pass at the end",
+    ("archive_posts", "seen_posts"): "clears old ingestion state in one pass at the end",
+    ("migrate_comment_blobs", "posts"): "one-off migration of every legacy comments blob",
+    ("iter_posts", "posts"): "exports every post when no window is given, in created_utc order",
+    ("get_ingestion_runs", "ingestion_runs"): "walks the rowid backwards and stops after `n` runs",
+    ("evict_llm_cache", "llm_cache"): "skips the `max_entries` most recently used entries to find the rest",
+    ("get_analyzer_versions", "posts"): "counts posts per analyzer version to plan a rescore",
+}
+# Tables of a handful of rows, where a scan is the best plan
+SMALL_TABLES = {"meta", "label_totals", "checkpoints"}
+
+STATEMENT = re.compile(r"^\s*(SELECT|WITH|INSERT|REPLACE|UPDATE|DELETE)\b", re.IGNORECASE)
+# Table names and aliases in FROM and JOIN clauses
+SOURCE = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(?:\w+\.)?(\w+)(?:\s+(?:AS\s+)?(?!(?:WHERE|JOIN|ON|INDEXED|NOT|USING|SET|"
+    r"VALUES|SELECT|LEFT|INNER|CROSS|GROUP|ORDER|LIMIT|AND|DEFAULT)\b)(\w+))?",
+    re.IGNORECASE,
+)
+# "SCAN posts", "SCAN p USING COVERING INDEX idx_posts_top": every row of the table
+SCAN = re.compile(r"^SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?$")
+LITERALS = re.compile(r"'(?:[^']|'')*'|x'[0-9a-fA-F]*'|-?\b\d+(?:\.\d+)?\b")
+
+
+class TracedStorage(Storage):
+    """Storage recording each SQL statement its connections run, under the name of the method running it."""
+
+    def __init__(self, *args, **kwargs):
+        self.method = "_init_db"
+        self.traced = {}
+        super().__init__(*args, **kwargs)
+
+    def _connect(self) -> sqlite3.Connection:
+        con = super()._connect()
+        con.set_trace_callback(self._trace)
+        return con
+
+    def _trace(self, sql: str):
+        if STATEMENT.match(sql):
+            # One plan per statement shape: executemany and repeated calls differ only in their values
+            self.traced.setdefault((self.method, LITERALS.sub("?", sql)), sql)
+
+    def call(self, method: str, fn):
+        self.method = method
+        try:
+            return fn()
+        finally:
+            self.method = None
+
+
+def exercise(store: TracedStorage, args, now: float, archive_path: Path, archive_days: int):
+    """Call every Storage method at least once."""
+    call = store.call
+    bench_args = Namespace(seed=args.seed, posts=args.posts, now=now, repeat=1)
+    for name, (fn, _) in storage_queries(store, bench_args).items():
+        call(name.split("(")[0], fn)
+
+    post_ids = [make_post(i, seed=args.seed, now=now)["id"] for i in range(20)]
+    # New posts, clustered as ingestion does, plus a refresh of stored ones
+    extra = list(islice(generate_posts(args.posts + 50, seed=args.seed, now=now), args.posts, None))
+    index = DuplicateIndex(store, window_days=365)
+    extra = call("DuplicateIndex.stream", lambda: list(index.stream(extra)))
+    refresh = [{**p, "refresh": True} for p in generate_posts(10, seed=args.seed, now=now)]
+    call("save", lambda: store.save(extra + refresh))
+    call("get_unclustered_posts", lambda: store.get_unclustered_posts())
+    call("set_post_clusters", lambda: store.set_post_clusters({post_ids[1]: post_ids[0]}))
+    call("get_cluster_sentiments", lambda: store.get_cluster_sentiments(post_ids[:5]))
+    call("get_post_clusters", lambda: store.get_post_clusters(post_ids[:5]))
+    call("prune_clusters", lambda: store.prune_clusters(int(now)))
+
+    call("search", lambda: store.search("claim", since=int(now - 7 * 86400), until=int(now)))
+    call("iter_posts", lambda: list(store.iter_posts()))
+    call("iter_posts", lambda: list(store.iter_posts(since=int(now - 86400), until=int(now), label="Positive")))
+    call("iter_posts", lambda: list(store.iter_posts(after_rowid=args.posts // 2, upto_rowid=args.posts)))
+    call("get_post_days", lambda: store.get_post_days(after_rowid=args.posts // 2))
+
+    call("update_summaries", lambda: store.update_summaries(post_ids[0], "summary", "comment summary"))
+    call("get_cluster_text_summaries", lambda: store.get_cluster_text_summaries(post_ids))
+    call("enqueue_summaries", lambda: store.enqueue_summaries(post_ids))
+    claimed = call("claim_summary_jobs", lambda: store.claim_summary_jobs(2))
+    call("finish_summary_job", lambda: store.finish_summary_job(claimed[0]))
+    call("finish_summary_job", lambda: store.finish_summary_job(claimed[1], error="failed"))
+    call("requeue_running_summary_jobs", store.requeue_running_summary_jobs)
+
+    stale = call("get_stale_posts", lambda: store.get_stale_posts("check", args.posts // 2, 10))
+    call("get_analyzer_versions", store.get_analyzer_versions)
+    call("update_post_sentiments", lambda: store.update_post_sentiments(
+        [(rowid, -sentiment, label, "check") for rowid, _, sentiment, label, _, _ in stale]
+    ))
+
+    call("get_unscored_comments", lambda: store.get_unscored_comments(10))
+    call("update_comment_sentiments", lambda: store.update_comment_sentiments([(0.5, 1), (-0.5, 2)]))
+    call("migrate_comment_blobs", store.migrate_comment_blobs)
+
+    call("save_cached_scores", lambda: store.save_cached_scores({f"{i:064x}": 0.5 for i in range(10)}))
+    call("save_llm_responses", lambda: store.save_llm_responses([(f"k{i}", "text", "response") for i in range(10)]))
+    call("get_llm_responses", lambda: store.get_llm_responses([f"k{i}" for i in range(5)], max_age=3600))
+    call("evict_llm_cache", lambda: store.evict_llm_cache(5, max_age=3600))
+
+    call("save_checkpoint", lambda: store.save_checkpoint("Insurance", int(now), extra[:10]))
+    run_id = call("start_ingestion_run", lambda: store.start_ingestion_run("Insurance", int(now)))
+    call("finish_ingestion_run", lambda: store.finish_ingestion_run(run_id, new_posts=10))
+    call("start_ingestion_run", lambda: store.start_ingestion_run("Insurance", int(now) + 60))
+    call("fail_running_ingestion_runs", store.fail_running_ingestion_runs)
+
+    call("rebuild_rollups", store.rebuild_rollups)
+    call("compress_posts", store.compress_posts)
+    archived = make_post(args.posts - 1, seed=args.seed, now=now)
+    call("archive_posts", lambda: store.archive_posts(int(now - archive_days * 86400), archive_path))
+    call("get_archived_post", lambda: store.get_archived_post(archived["id"], archive_path))
+
+
+def table_of(sql: str) -> dict[str, str]:
+    """Map each table name and alias in `sql` to its table."""
+    tables = {}
+    for table, alias in SOURCE.findall(sql):
+        tables[table] = table
+        if alias:
+            tables[alias] = table
+    return tables
+
+
+def check(store: TracedStorage, archive_path: Path, verbose: bool) -> list[tuple]:
+    """EXPLAIN every traced statement; return (method, table, plan line, SQL) for each unexpected full scan."""
+    failures = []
+    con = sqlite3.connect(store.db_path)
+    con.create_function("inflate", 1, lambda value: value, deterministic=True)
+    if archive_path.exists():
+        con.execute("ATTACH DATABASE ? AS archive", (str(archive_path),))
+    real = {name for (name,) in con.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    real |= {name for (name,) in con.execute("SELECT name FROM archive.sqlite_master WHERE type = 'table'")} \
+        if archive_path.exists() else set()
+    # Scanning a partial index reads only the rows it holds
+    partial = {name for (name,) in con.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '% WHERE %'")}
+    for (method, _), sql in sorted(store.traced.items()):
+        try:
+            plan = [row[3] for row in con.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        except sqlite3.Error as e:
+            print(f"  {method}: cannot explain ({e}): {' '.join(sql.split())[:120]}")
+            continue
+        tables = table_of(sql)
+        for line in plan:
+            match = SCAN.match(line)
+            table = tables.get(match.group(1), match.group(1)) if match else None
+            flagged = (
+                table in real and table not in SMALL_TABLES and not table.startswith("posts_fts")
+                and match.group(2) not in partial and (method, table) not in ALLOWED_SCANS
+            )
+            if flagged:
+                failures.append((method, table, line, sql))
+        if verbose:
+            print(f"  {method}: {' '.join(sql.split())[:100]}")
+            for line in plan:
+                print(f"      {line}")
+    con.close()
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="print every statement's plan")
+    args = parser.parse_args()
+    now = time.time()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, archive_path = Path(tmp) / "plans.db", Path(tmp) / "archive.db"
+        print(f"Building a {args.posts}-post database...")
+        builder = Storage(db_path)
+        corpus = generate_posts(args.posts, seed=args.seed, now=now)
+        while batch := list(islice(corpus, SAVE_BATCH_SIZE)):
+            builder.save(batch)
+            # As ingestion does with PREGENERATE_SUMMARIES on
+            builder.enqueue_summaries([p["id"] for p in batch])
+        builder.close()
+
+        # The corpus spans 90 days; each pass archives a little of it
+        for stage, archive_days in (("fresh", 85), ("analyzed", 80)):
+            store = TracedStorage(db_path)
+            if stage == "analyzed":
+                store.call("optimize", store.optimize)
+            exercise(store, args, now, archive_path, archive_days)
+            methods = {method for method, _ in store.traced}
+            print(f"== {stage}: {len(store.traced)} statements from {len(methods)} methods")
+            stage_failures = check(store, archive_path, args.verbose)
+            for method, table, line, sql in stage_failures:
+                print(f"FULL SCAN {method}: {table} ({line})\n    {' '.join(sql.split())[:200]}")
+            failures += stage_failures
+            store.close()
+
+    print(f"{len(failures)} unexpected full scans; {len(ALLOWED_SCANS)} allowed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
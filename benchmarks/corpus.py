@@ -0,0 +1,103 @@
+"""
+Deterministic synthetic Reddit corpus for benchmarks.
+
+Every post (with its comments and timestamps) is derived from the seed and
+its index alone, so a corpus can be streamed at any scale without holding
+it in memory, and every run at a given scale sees the same data. Records
+have the shape ingestion hands to `Storage.save`, already scored.
+
+    from corpus import generate_posts
+    store.save(generate_posts(100_000))
+"""
+import random
+import time
+from itertools import product
+from typing import Iterator
+
+# Named corpus sizes, in posts
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+SUBREDDITS = ["Insurance", "personalfinance", "HomeImprovement", "texas", "illinois"]
+TERMS = ["State Farm", "SF", "State Farm agent", "Jake from State Farm", "statefarm.com"]
+WORDS = [
+    "claim", "denied", "agent", "premium", "great", "terrible", "helpful", "slow",
+    "policy", "renewal", "love", "hate", "rate", "increase", "adjuster", "quick",
+    "awful", "fair", "roof", "hail", "deductible", "coverage", "quote", "switched",
+    "the", "my", "was", "and", "after", "they", "called", "again", "for", "a",
+]
+# Pseudo-words drawn with a skewed (Zipf-like) distribution, so searches see a
+# realistic mix of common, mid-frequency and rare terms
+_SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vi", "so", "pe", "da", "ge", "bu", "fo", "hi", "ju", "ze"]
+LONG_TAIL = ["".join(p) for n in (2, 3, 4) for p in product(_SYLLABLES, repeat=n)][:20_000]
+# Share of body words taken from LONG_TAIL
+LONG_TAIL_SHARE = 0.3
+
+
+def scale_size(scale: str | int) -> int:
+    """Number of posts for a named scale ("1k", "100k", "1m") or a plain count."""
+    if isinstance(scale, int) or str(scale).isdigit():
+        return int(scale)
+    try:
+        return SCALES[scale.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown scale {scale!r}; use one of {', '.join(SCALES)} or a post count") from None
+
+
+def _label(compound: float) -> str:
+    # Same cut-offs as scoring.label_for, without importing the VADER stack
+    if compound >= 0.05:
+        return "Positive"
+    if compound <= -0.05:
+        return "Negative"
+    return "Neutral"
+
+
+def make_post(i: int, seed: int = 0, now: float | None = None, days: int = 90,
+              comments_per_post: int = 4) -> dict:
+    """Build post `i` of the corpus: a scored record with `comments_per_post` comments on average."""
+    now = time.time() if now is None else now
+    rng = random.Random(seed * 1_000_003 + i)
+    post_id = f"b{i:07d}"
+    subreddit = SUBREDDITS[i % len(SUBREDDITS)]
+    term = rng.choice(TERMS)
+    words = rng.choices(WORDS, k=rng.randint(10, 120))
+    for k in range(len(words)):
+        if rng.random() < LONG_TAIL_SHARE:
+            words[k] = LONG_TAIL[int(len(LONG_TAIL) * rng.random() ** 4)]
+    words.insert(rng.randrange(len(words) + 1), term)
+    created = int(now - rng.random() * days * 86400)
+    # A fifth of posts carry no sentiment words and score exactly 0, as with VADER
+    compound = 0.0 if rng.random() < 0.2 else round(rng.uniform(-1, 1), 4)
+    comments = [
+        {
+            "id": f"{post_id}_c{j}",
+            "body": " ".join(rng.choices(WORDS, k=rng.randint(5, 40))),
+            "created_utc": created + rng.randint(60, 86400),
+            "score": rng.randint(-20, 200),
+            "sentiment": round(rng.uniform(-1, 1), 4),
+        }
+        for j in range(rng.randint(0, comments_per_post * 2))
+    ]
+    return {
+        "id": post_id,
+        "title": " ".join(rng.choices(WORDS, k=8)),
+        "body": " ".join(words),
+        "created_utc": created,
+        "permalink": f"https://reddit.com/r/{subreddit}/comments/{post_id}/",
+        "subreddit": subreddit,
+        "num_comments": len(comments),
+        "edited": False,
+        "refresh": False,
+        "matched_terms": [term],
+        "comments": comments,
+        "score": compound,
+        "label": _label(compound),
+    }
+
+
+def generate_posts(n: int, seed: int = 0, now: float | None = None, days: int = 90,
+                   comments_per_post: int = 4, start: int = 0) -> Iterator[dict]:
+    """Yield posts `start` .. `start + n - 1` of the corpus, created over the last `days` days."""
+    now = time.time() if now is None else now
+    for i in range(start, start + n):
+        yield make_post(i, seed, now, days, comments_per_post)
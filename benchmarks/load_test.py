@@ -0,0 +1,130 @@
+"""
+API load test: p50/p99 latency of /top-positive, alone and while
+/summarize/{post_id} requests are generating summaries.
+
+By default the API runs in-process (httpx ASGI transport) against a
+temporary seeded database, with the LLM replaced by text_summarizer's stub
+model blocking for `--llm-latency` seconds per call. Pass `--url` to hit a
+running server instead.
+
+Usage (from the repo root):
+    python benchmarks/load_test.py --duration 10 --concurrency 20 --summarizers 4
+    python benchmarks/load_test.py --url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def in_process_client(args, tmp: str) -> tuple[httpx.AsyncClient, list[str]]:
+    os.environ["DB_PATH"] = os.path.join(tmp, "load.db")
+    # The stub model blocks like a real SDK call would
+    os.environ["SUMMARIZER_MODEL"] = "stub"
+    os.environ["STUB_MODEL_LATENCY"] = str(args.llm_latency)
+    sys.path.insert(0, str(SRC))
+    import api
+    from storage import Storage
+
+    rng = random.Random(0)
+    now = time.time()
+    posts = [
+        {
+            "id": f"p{i}",
+            "title": f"post {i}",
+            "body": "State Farm " * rng.randint(5, 50),
+            "comments": [
+                {"id": f"p{i}_c{j}", "body": f"comment {j}", "created_utc": now, "score": 1}
+                for j in range(rng.randint(0, 20))
+            ],
+            "created_utc": now - rng.randint(0, 6 * 86400),
+            "permalink": f"https://reddit.com/p{i}",
+            "score": rng.uniform(-1, 1),
+        }
+        for i in range(args.posts)
+    ]
+    for p in posts:
+        p["label"] = "Positive" if p["score"] >= 0.05 else "Negative" if p["score"] <= -0.05 else "Neutral"
+    Storage(os.environ["DB_PATH"]).save(posts)
+
+    # The ASGI transport does not send lifespan events
+    api.summaries.start()
+    transport = httpx.ASGITransport(app=api.app)
+    client = httpx.AsyncClient(transport=transport, base_url="http://api", timeout=60)
+    return client, [p["id"] for p in posts]
+
+
+async def hammer(client: httpx.AsyncClient, path: str, stop: float, latencies: list[float]):
+    while time.perf_counter() < stop:
+        start = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def summarize_loop(client: httpx.AsyncClient, ids: list[str], stop: float, done: list[int]):
+    while time.perf_counter() < stop and ids:
+        await client.get(f"/summarize/{ids.pop()}", params={"wait": 60})
+        done[0] += 1
+
+
+async def phase(client, args, ids: list[str], summarizers: int) -> tuple[list[float], int]:
+    stop = time.perf_counter() + args.duration
+    latencies, done = [], [0]
+    tasks = [hammer(client, "/top-positive", stop, latencies) for _ in range(args.concurrency)]
+    tasks += [summarize_loop(client, ids, stop, done) for _ in range(summarizers)]
+    await asyncio.gather(*tasks)
+    return latencies, done[0]
+
+
+async def main_async(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=60)
+            ids = [p["id"] for p in (await client.get("/top-positive", params={"n": 100})).json()]
+            ids += [p["id"] for p in (await client.get("/top-negative", params={"n": 100})).json()]
+        else:
+            client, ids = in_process_client(args, tmp)
+
+        async with client:
+            print(f"{'phase':<22} {'requests':>8} {'p50 ms':>8} {'p99 ms':>8} {'summaries':>9}")
+            for name, summarizers in (("top-positive only", 0), ("with summarization", args.summarizers)):
+                latencies, summaries = await phase(client, args, ids, summarizers)
+                print(
+                    f"{name:<22} {len(latencies):>8} "
+                    f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f} "
+                    f"{summaries:>9}"
+                )
+            if latencies:
+                print(f"mean /top-positive latency under load: {statistics.mean(latencies) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="base URL of a running API (default: in-process)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per phase")
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent /top-positive clients")
+    parser.add_argument("--summarizers", type=int, default=4, help="concurrent /summarize clients")
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="in-process stub LLM latency (s)")
+    parser.add_argument("--posts", type=int, default=5000, help="posts seeded in-process")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
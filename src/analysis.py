@@ -1,43 +1,17 @@
-import matplotlib.pyplot as plt
-import streamlit as st
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-from collections import Counter
-import nltk
-
-nltk.download('vader_lexicon')
-
-sid = SentimentIntensityAnalyzer()
+"""
+Headless sentiment analysis used by ingestion, the API and workers.
+Plotting lives in `plots`, which only the dashboard imports.
+"""
+from scoring import score_records, score_stream
 
 # Analyze sentiment of posts
-def analyze_sentiments(posts: list[dict]) -> list[dict]:
-    out = []
-    for p in posts:
-        text = f"{p['title']} {p.get('body', '')}"
-        scores = sid.polarity_scores(text)
-        compound = scores["compound"]
-        if compound >= 0.05:
-            label = "Positive"
-        elif compound <= -0.05:
-            label = "Negative"
-        else:
-            label = "Neutral"
-        out.append({**p, "score": compound, "label": label}) 
-    return out
-
-# Plot sentiment pie chart
-def plot_sentiment_distribution(data):
-    labels = ["Positive", "Neutral", "Negative"]
-    sizes = [
-        sum(1 for d in data if d["sentiment"] == "Positive"),
-        sum(1 for d in data if d["sentiment"] == "Neutral"),
-        sum(1 for d in data if d["sentiment"] == "Negative"),
-    ]
-    colors = ["#A3E4D7", "#F9E79F", "#F5B7B1"]
-    fig, ax = plt.subplots()
-    ax.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=140)
-    ax.axis('equal')
-    st.pyplot(fig)
+def analyze_sentiments(posts: list[dict], workers: int | None = None, cache=None) -> list[dict]:
+    return score_records(posts, workers=workers, cache=cache)
 
+# Analyze sentiment of a stream of posts, chunk by chunk
+def analyze_sentiment_stream(posts, workers: int | None = None, cache=None, chunk_size: int | None = None,
+                             pool=None):
+    return score_stream(posts, workers=workers, cache=cache, chunk_size=chunk_size, pool=pool)
 
 def sentiment_summary(sentiments):
     total = len(sentiments)
@@ -73,27 +47,3 @@ def get_top_sentiment_posts(analyzed_posts: list[dict]) -> tuple[list[dict], lis
     top_negative = sorted(negatives, key=lambda x: x["score"])[:5]
 
     return top_positive, top_negative
-
-def plot_emotion_bar(summary):
-    fig, ax = plt.subplots()
-    categories = ["Positive", "Neutral", "Negative"]
-    values = [
-        summary["Positive (%)"],
-        summary["Neutral (%)"],
-        summary["Negative (%)"]
-    ]
-    bars = ax.barh(categories, values, color=["#2ECC71", "#F4D03F", "#E74C3C"])
-    ax.set_xlim(0, 100)
-    ax.set_xlabel("Percentage")
-    for bar in bars:
-        width = bar.get_width()
-        ax.text(width + 1, bar.get_y() + bar.get_height()/2, f"{int(width)}%", va='center')
-    st.pyplot(fig)
-
-def plot_wordcloud(posts):
-    all_text = " ".join(post["body"] for post in posts)
-    wc = WordCloud(width=600, height=300, background_color="white").generate(all_text)
-    fig, ax = plt.subplots()
-    ax.imshow(wc, interpolation="bilinear")
-    ax.axis("off")
-    st.pyplot(fig)
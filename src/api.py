@@ -1,18 +1,79 @@
-from fastapi import FastAPI, HTTPException
-from storage import Storage
-from text_summarizer import summarize_post, summarize_comments
+import asyncio
+import base64
+import calendar
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Literal
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from storage import EXPORT_COLUMNS, Storage
+from async_storage import AsyncStorage
+from summary_worker import SummaryWorker
+from metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware
+
+# Default seconds /summarize waits for a queued summary before answering "pending"
+SUMMARY_WAIT_SECONDS = float(os.getenv("SUMMARY_WAIT_SECONDS", "20"))
+# Seconds a /dashboard payload is reused while no new posts are saved
+DASHBOARD_TTL_SECONDS = float(os.getenv("DASHBOARD_TTL_SECONDS", "60"))
+# Largest top-post list and daily window /dashboard serves, and (n, days) payloads kept cached
+DASHBOARD_MAX_POSTS = 50
+DASHBOARD_MAX_DAYS = 366
+DASHBOARD_CACHE_SIZE = 32
+# Largest page /search returns
+SEARCH_MAX_RESULTS = 100
+# Most buckets one /trend response may hold (a leap year of hours fits)
+TREND_MAX_BUCKETS = int(os.getenv("TREND_MAX_BUCKETS", "10000"))
 
 app = FastAPI()
+# Per-route latency histograms, and ?profile=1 sampling profiles when API_PROFILING=1
+app.add_middleware(MetricsMiddleware)
 store = Storage()
+# Handlers never touch SQLite on the event loop
+db = AsyncStorage(store)
+# LLM calls run on the summary worker threads, never in a request
+summaries = SummaryWorker(store)
+# (n, days) -> (data_version, expires_at, etag, body), least recently used first
+_dashboard_cache: OrderedDict[tuple, tuple] = OrderedDict()
+
+SUMMARY_REQUESTS = REGISTRY.counter(
+    "summary_requests_total", "/summarize requests by result (cached = summary already stored)", ["result"]
+)
+DASHBOARD_CACHE = REGISTRY.counter("dashboard_cache_requests_total", "/dashboard payload cache lookups", ["result"])
+
+
+def _summary_hit_ratio() -> float:
+    counts = {result: value for (result,), value in SUMMARY_REQUESTS.values().items()}
+    total = sum(counts.values())
+    return counts.get("cached", 0) / total if total else 0.0
+
+
+REGISTRY.gauge("summary_cache_hit_ratio", "Share of /summarize requests answered from stored summaries",
+               fn=_summary_hit_ratio)
+
+@app.on_event("startup")
+def start_summary_worker():
+    summaries.start()
+
+@app.on_event("shutdown")
+def close_storage():
+    summaries.stop(timeout=5)
+    db.close()
 
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
-@app.get("/top-positive")
-async def get_top_positive_posts(n: int = 5):
-    """Returns top n positive posts"""
-    posts = store.get_top_posts(label="Positive", n=n)
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics for this API process (requests, storage, LLM calls, caches)"""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+def _post_rows(posts) -> list[dict]:
     return [
         {
             "id": row[0],
@@ -24,43 +85,232 @@ async def get_top_positive_posts(n: int = 5):
         for row in posts
     ]
 
-@app.get("/top-negative")
-async def get_top_negative_posts(n: int = 5):
-    """Returns top n negative posts"""
-    posts = store.get_top_posts(label="Negative", n=n)
+def _daily_rows(daily_counts) -> list[dict]:
     return [
+        {"day": row[0], "positive": row[1], "neutral": row[2], "negative": row[3]}
+        for row in daily_counts
+    ]
+
+@app.get("/top-positive")
+async def get_top_positive_posts(n: int = 5, term: str | None = None, dedupe: bool = False):
+    """
+    Returns top n positive posts, optionally only those matching keyword `term`;
+    with `dedupe`, one post per cluster of near-duplicates (cross-posts, reposts)
+    """
+    posts = await db.get_top_posts(label="Positive", n=n, term=term, dedupe=dedupe)
+    return _post_rows(posts)
+
+@app.get("/top-negative")
+async def get_top_negative_posts(n: int = 5, term: str | None = None, dedupe: bool = False):
+    """
+    Returns top n negative posts, optionally only those matching keyword `term`;
+    with `dedupe`, one post per cluster of near-duplicates (cross-posts, reposts)
+    """
+    posts = await db.get_top_posts(label="Negative", n=n, term=term, dedupe=dedupe)
+    return _post_rows(posts)
+
+@app.get("/terms")
+async def terms():
+    """Returns every keyword term with the number of stored posts that matched it"""
+    rows = await db.get_terms()
+    return [{"term": term, "posts": count} for term, count in rows]
+
+def _encode_cursor(rank: float, rowid: int, floor: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([rank, rowid, floor]).encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple[float, int, int]:
+    try:
+        rank, rowid, floor = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return float(rank), int(rowid), int(floor)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
+
+@app.get("/search")
+async def search(q: str, label: Literal["Positive", "Neutral", "Negative"] | None = None,
+                 since: date | None = None, until: date | None = None, limit: int = 20,
+                 cursor: str | None = None):
+    """
+    Full-text search over post titles, bodies, comments and summaries, best match first.
+    `q` accepts words, "quoted phrases", prefix* and AND/OR/NOT; filter by `label` and
+    by creation date (`since`/`until`, inclusive, UTC). Matches are wrapped in <mark> in
+    each result's snippet. Pass `next_cursor` back as `cursor` for the next page.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+    limit = max(1, min(limit, SEARCH_MAX_RESULTS))
+    try:
+        rows = await db.search(
+            q,
+            label=label,
+            since=calendar.timegm(since.timetuple()) if since else None,
+            until=calendar.timegm(until.timetuple()) + 86400 if until else None,
+            limit=limit,
+            after=after,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    results = [
         {
             "id": row[0],
             "title": row[1],
-            "body": row[2],
-            "permalink": row[3],
-            "sentiment": row[4],
+            "permalink": row[2],
+            "sentiment": row[3],
+            "label": row[4],
+            "created_utc": row[5],
+            "snippet": row[6],
         }
-        for row in posts
+        for row in rows
     ]
+    # A full page may have more behind it
+    next_cursor = _encode_cursor(*rows[-1][7:10]) if len(rows) == limit else None
+    return {"results": results, "next_cursor": next_cursor}
+
+@app.get("/dashboard")
+async def dashboard(request: Request, n: int = Query(5, ge=1, le=DASHBOARD_MAX_POSTS),
+                    days: int = Query(7, ge=1, le=DASHBOARD_MAX_DAYS)):
+    """
+    Returns everything the dashboard renders in one response: top n positive
+    and negative posts, the sentiment summary and daily counts.
+    Cached until the TTL expires or new posts are saved; supports If-None-Match.
+    """
+    version = await db.get_data_version()
+    key = (n, days)
+    cached = _dashboard_cache.get(key)
+    if cached is None or cached[0] != version or cached[1] < time.monotonic():
+        DASHBOARD_CACHE.labels(result="miss").inc()
+        positive, negative, summary, daily = await asyncio.gather(
+            db.get_top_posts(label="Positive", n=n),
+            db.get_top_posts(label="Negative", n=n),
+            db.get_sentiment_summary(),
+            db.get_daily_counts(days=days),
+        )
+        body = json.dumps({
+            "top_positive": _post_rows(positive),
+            "top_negative": _post_rows(negative),
+            "sentiment_summary": summary,
+            "daily_summary": _daily_rows(daily),
+        }).encode("utf-8")
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        # Payloads of an older data version can never be served again
+        for stale in [k for k, entry in _dashboard_cache.items() if entry[0] != version]:
+            del _dashboard_cache[stale]
+        cached = _dashboard_cache[key] = (version, time.monotonic() + DASHBOARD_TTL_SECONDS, etag, body)
+        while len(_dashboard_cache) > DASHBOARD_CACHE_SIZE:
+            _dashboard_cache.popitem(last=False)
+    else:
+        DASHBOARD_CACHE.labels(result="hit").inc()
+    _dashboard_cache.move_to_end(key)
+
+    _, _, etag, body = cached
+    headers = {"ETag": etag, "Cache-Control": f"max-age={int(DASHBOARD_TTL_SECONDS)}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.get("/sentiment-summary")
 async def sentiment_summary():
     """Returns a summary of all sentiments"""
-    return store.get_sentiment_summary()
+    return await db.get_sentiment_summary()
 
 @app.get("/daily-summary")
 async def daily_summary(days: int = 7):
     """Returns a daily summary of sentiments for the last n days"""
-    daily_counts = store.get_daily_counts(days=days)
-    return [
-        {"day": row[0], "positive": row[1], "neutral": row[2], "negative": row[3]}
-        for row in daily_counts
-    ]
+    daily_counts = await db.get_daily_counts(days=days)
+    return _daily_rows(daily_counts)
+
+def _epoch(moment: datetime) -> int:
+    # Naive datetimes are UTC
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+def _utc_iso(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+@app.get("/trend")
+async def trend(granularity: Literal["hour", "day", "week"] = "day",
+                start: datetime | None = None, end: datetime | None = None, window: int = 7):
+    """
+    Sentiment trend between `start` (inclusive) and `end` (exclusive, default now;
+    `start` defaults to 30 days earlier) in hour, day or week buckets (UTC, weeks
+    start on Monday): per-label counts, mean compound score, and rolling averages
+    of post count and compound over the last `window` buckets.
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=30)
+    start_utc, end_utc = _epoch(start), _epoch(end)
+    if start_utc >= end_utc:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    size = {"hour": 3600, "day": 86400, "week": 604800}[granularity]
+    if (end_utc - start_utc) / size > TREND_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=400, detail=f"More than {TREND_MAX_BUCKETS} {granularity} buckets; use a coarser granularity"
+        )
+    window = max(1, min(window, TREND_MAX_BUCKETS))
+    rows = await db.get_trend(start_utc, end_utc, granularity=granularity, window=window)
+    # Up to TREND_MAX_BUCKETS rows: serialize directly rather than through FastAPI's encoder
+    body = json.dumps({
+        "granularity": granularity,
+        "start": _utc_iso(start_utc),
+        "end": _utc_iso(end_utc),
+        "window": window,
+        "buckets": [
+            {
+                "start": _utc_iso(row[0]),
+                "positive": row[1],
+                "neutral": row[2],
+                "negative": row[3],
+                "posts": row[4],
+                "mean_compound": row[5],
+                "rolling_posts": row[6],
+                "rolling_compound": row[7],
+            }
+            for row in rows
+        ],
+    }).encode("utf-8")
+    return Response(content=body, media_type="application/json")
+
+async def _ndjson(chunks):
+    # Each chunk is fetched on the DB pool; only one chunk is ever held in memory
+    lock = threading.Lock()
+
+    def step(action):
+        with lock:
+            return action()
+
+    try:
+        while chunk := await db.run(step, lambda: next(chunks, None)):
+            yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in chunk).encode("utf-8")
+    finally:
+        # A client that disconnects mid-stream must not leave the read snapshot open
+        # (and its pooled connection out) until GC: it would hold back WAL checkpoints.
+        # The lock lets a fetch still running after the disconnect finish first.
+        await db.run(step, chunks.close)
+
+@app.get("/export")
+async def export(label: Literal["Positive", "Neutral", "Negative"] | None = None,
+                 since: date | None = None, until: date | None = None):
+    """
+    Streams every post (optionally filtered by `label` and creation date, `since`/`until`
+    inclusive, UTC) as newline-delimited JSON, oldest first, from one consistent snapshot.
+    Memory use is the same for any number of posts.
+    """
+    chunks = store.iter_posts(
+        since=calendar.timegm(since.timetuple()) if since else None,
+        until=calendar.timegm(until.timetuple()) + 86400 if until else None,
+        label=label,
+    )
+    return StreamingResponse(_ndjson(chunks), media_type="application/x-ndjson")
 
 @app.get("/summarize/{post_id}")
-async def get_or_create_summary(post_id: str):
+async def get_or_create_summary(post_id: str, wait: float = SUMMARY_WAIT_SECONDS):
     """
     Returns summaries for a given post.
-    If summaries don't exist, they are generated and saved.
+    If summaries don't exist, a summary job is queued and this waits up to
+    `wait` seconds for it; after that the response has status "pending".
     """
-    post = store.get_post_by_id(post_id)
+    post = await db.get_post_by_id(post_id)
     if not post:
+        SUMMARY_REQUESTS.labels(result="not_found").inc()
         raise HTTPException(status_code=404, detail="Post not found")
 
     # post is a sqlite3.Row, can be accessed by index or key
@@ -68,22 +318,24 @@ async def get_or_create_summary(post_id: str):
     comment_summary = post["comment_summary"]
 
     if text_summary and comment_summary:
-        return {"text_summary": text_summary, "comment_summary": comment_summary}
+        SUMMARY_REQUESTS.labels(result="cached").inc()
+        return {"status": "done", "text_summary": text_summary, "comment_summary": comment_summary}
 
-    # Generate summaries if they don't exist
-    if not text_summary:
-        text_summary = summarize_post(post["title"], post["body"])
-
-    if not comment_summary:
-        comments_str = post["comments"]
-        comments_list = comments_str.split("\n") if comments_str else []
-        # In case there are no comments
-        if not comments_list:
-            comment_summary = "No comments to summarize."
-        else:
-            comment_summary = summarize_comments(comments_list)
-
-    # Save to DB
-    store.update_summaries(post_id, text_summary, comment_summary)
+    # Concurrent requests for the same post share one job
+    future = await db.run(summaries.submit, post_id)
+    try:
+        text_summary, comment_summary = await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(future)), timeout=max(0.0, wait)
+        )
+    except asyncio.TimeoutError:
+        SUMMARY_REQUESTS.labels(result="pending").inc()
+        return {"status": "pending", "text_summary": None, "comment_summary": None}
+    except LookupError:
+        SUMMARY_REQUESTS.labels(result="not_found").inc()
+        raise HTTPException(status_code=404, detail="Post not found")
+    except Exception as e:
+        SUMMARY_REQUESTS.labels(result="failed").inc()
+        raise HTTPException(status_code=502, detail=f"Summary generation failed: {e}")
 
-    return {"text_summary": text_summary, "comment_summary": comment_summary}
+    SUMMARY_REQUESTS.labels(result="generated").inc()
+    return {"status": "done", "text_summary": text_summary, "comment_summary": comment_summary}
@@ -1,11 +1,13 @@
 import streamlit as st
-from analysis import analyze_sentiments, plot_sentiment_distribution, sentiment_summary, get_top_sentiment_posts, plot_emotion_bar, plot_wordcloud
+from analysis import analyze_sentiments, sentiment_summary, get_top_sentiment_posts
+from plots import plot_sentiment_distribution, plot_emotion_bar, plot_wordcloud
 import pandas as pd
 import matplotlib.pyplot as plt
 from wordcloud import WordCloud
 import random
 import re
 from collections import Counter
+import os
 import requests
 
 st.set_page_config(
@@ -14,6 +16,46 @@ st.set_page_config(
     layout="wide",
 )
 
+API_URL = os.getenv("API_URL", "http://api:8000")
+# Seconds API responses are reused across reruns, tab switches and widget interactions
+API_CACHE_TTL = int(os.getenv("API_CACHE_TTL", "60"))
+
+
+class SummaryPending(Exception):
+    """Raised for a pending summary so st.cache_data does not cache it."""
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """One pooled HTTP session shared by every rerun."""
+    return requests.Session()
+
+
+@st.cache_resource
+def _dashboard_etag() -> dict:
+    return {}
+
+
+@st.cache_data(ttl=API_CACHE_TTL, show_spinner=False)
+def fetch_dashboard() -> dict:
+    """All dashboard panel data in one request, revalidated with the last ETag."""
+    last = _dashboard_etag()
+    headers = {"If-None-Match": last["etag"]} if "etag" in last else {}
+    response = get_session().get(f"{API_URL}/dashboard", headers=headers, timeout=30)
+    if response.status_code == 304:
+        return last["payload"]
+    response.raise_for_status()
+    last.update(etag=response.headers.get("ETag"), payload=response.json())
+    return last["payload"]
+
+
+@st.cache_data(ttl=API_CACHE_TTL, show_spinner=False)
+def fetch_summary(post_id: str) -> dict:
+    summary = get_session().get(f"{API_URL}/summarize/{post_id}", timeout=60).json()
+    if summary.get("status") == "pending":
+        raise SummaryPending(post_id)
+    return summary
+
 
 def display_single_post(post, col):
     sentiment_score = post.get("sentiment", post.get("score", 0))
@@ -25,9 +67,12 @@ def display_single_post(post, col):
     text_summary = post.get("text_summary", "No Summary Available")
     comment_summary = post.get("comment_summary", "No Comment Summary Available")
     if text_summary == "No Summary Available":
-        summary_requests = requests.get(f"http://api:8000//summarize/{post_id}").json()
-        text_summary = summary_requests.get("text_summary")
-        comment_summary = summary_requests.get("comment_summary")
+        try:
+            summary_requests = fetch_summary(post_id)
+            text_summary = summary_requests.get("text_summary")
+            comment_summary = summary_requests.get("comment_summary")
+        except SummaryPending:
+            text_summary = comment_summary = "Summary is being generated, check back shortly."
     
     with col.container():
         st.markdown(f"""
@@ -55,10 +100,11 @@ def main():
     tab1, tab2 = st.tabs(["Home", "Dashboard"])
 
     # Analyze sentiment
-    positive_posts = requests.get("http://api:8000/top-positive").json()
-    negative_posts = requests.get("http://api:8000/top-negative").json()
+    dashboard = fetch_dashboard()
+    positive_posts = dashboard["top_positive"]
+    negative_posts = dashboard["top_negative"]
     
-    summary = requests.get("http://api:8000/sentiment-summary").json()
+    summary = dashboard["sentiment_summary"]
 
     with tab1:
         st.markdown("<h3 style='text-align: center; color: #FF6961;'>Top 5 Posts</h3>", unsafe_allow_html=True)
@@ -0,0 +1,48 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import Storage
+
+# Threads running blocking SQLite queries for the API
+DB_WORKERS = int(os.getenv("API_DB_WORKERS", "8"))
+
+
+class Offloader:
+    """Runs blocking callables on a dedicated, bounded thread pool from async code."""
+
+    def __init__(self, max_workers: int, name: str):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class AsyncStorage(Offloader):
+    """
+    Awaitable view of a `Storage`: every method call runs on the DB pool,
+    e.g. `await db.get_top_posts(label="Positive", n=5)`.
+    """
+
+    def __init__(self, store: Storage, max_workers: int = DB_WORKERS):
+        super().__init__(max_workers, name="storage")
+        self.store = store
+
+    def __getattr__(self, name):
+        method = getattr(self.store, name)
+        if not callable(method):
+            return method
+
+        async def call(*args, **kwargs):
+            return await self.run(method, *args, **kwargs)
+
+        return call
+
+    def close(self):
+        super().close()
+        self.store.close()
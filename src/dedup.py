@@ -0,0 +1,193 @@
+"""
+Near-duplicate detection for posts (cross-posts and reposts of the same story).
+
+Each post's title and body are shingled into word 3-grams and reduced to a
+MinHash signature; LSH splits the signature into bands so that posts sharing
+a band bucket become candidates, and a candidate is accepted when the
+signatures estimate a Jaccard similarity of at least DEDUP_THRESHOLD. A post
+joins the cluster of its best match, or starts a new cluster named after
+itself. Clusters live in the `clusters` and `lsh_buckets` tables, so the
+index grows incrementally across ingestion runs and processes.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+import zlib
+from itertools import islice
+from typing import Iterable, Iterator
+
+from metrics import REGISTRY
+from scoring import ANALYZER_VERSION, BUILTIN_ANALYZER_VERSION
+
+# Estimated Jaccard similarity of word 3-grams above which two posts are near-duplicates
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.7"))
+# Clusters without a new post for this long leave the LSH index (posts keep their cluster_id)
+DEDUP_WINDOW_DAYS = float(os.getenv("DEDUP_WINDOW_DAYS", "30"))
+
+# 32 bands of 4 rows: pairs at 0.7 similarity become candidates >99.9% of the
+# time, unrelated posts (below 0.2) about 5% of the time, and are then checked
+# against the full signature
+NUM_PERM = 128
+BANDS = 32
+SHINGLE_WORDS = 3
+# Smallest prime above 2**32: keeps the permutation hashes exact in uint64
+_PRIME = 4294967311
+_SEED = 1
+
+_WORDS = re.compile(r"\w+")
+
+DEDUP_POSTS = REGISTRY.counter(
+    "dedup_posts_total", "Posts clustered by near-duplicate detection (new cluster or duplicate)", ["result"]
+)
+SENTIMENT_REUSED = REGISTRY.counter(
+    "dedup_sentiment_reused_total", "Posts that took their sentiment from an already scored near-duplicate"
+)
+
+_permutations = None
+
+
+def _get_permutations():
+    """(a, b) coefficients of the NUM_PERM hash permutations, built on first use."""
+    global _permutations
+    if _permutations is None:
+        # Imported here so importing ingestion stays fast
+        import numpy as np
+
+        rng = np.random.RandomState(_SEED)
+        _permutations = (
+            rng.randint(1, 2**32, size=NUM_PERM, dtype=np.uint64),
+            rng.randint(0, 2**32, size=NUM_PERM, dtype=np.uint64),
+        )
+    return _permutations
+
+
+def shingles(text: str) -> set[int]:
+    """crc32 hashes of the lowercased word 3-grams of `text` (the whole text if shorter)."""
+    words = _WORDS.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"))
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+
+def signature(text: str) -> bytes:
+    """MinHash signature of `text`: NUM_PERM little-endian uint32 values."""
+    import numpy as np
+
+    a, b = _get_permutations()
+    hashes = np.fromiter(shingles(text), dtype=np.uint64)
+    # a * h + b < 2**64 for 32-bit a, b and h, so nothing overflows before the modulo
+    mins = ((np.outer(hashes, a) + b) % _PRIME).min(axis=0)
+    return (mins & 0xFFFFFFFF).astype("<u4").tobytes()
+
+
+def similarity(sig_a: bytes, sig_b: bytes) -> float:
+    """Estimated Jaccard similarity: the share of MinHash values two signatures agree on."""
+    import numpy as np
+
+    return float(np.count_nonzero(np.frombuffer(sig_a, "<u4") == np.frombuffer(sig_b, "<u4"))) / NUM_PERM
+
+
+def buckets(sig: bytes) -> list[tuple[int, int]]:
+    """LSH (band, bucket) pairs of a signature: each band's rows hashed to a signed 64-bit bucket."""
+    width = len(sig) // BANDS
+    return [
+        (band, int.from_bytes(hashlib.blake2b(sig[band * width:(band + 1) * width], digest_size=8).digest(),
+                              "little", signed=True))
+        for band in range(BANDS)
+    ]
+
+
+def post_text(record: dict) -> str:
+    return f"{record['title']} {record.get('body') or ''}"
+
+
+class DuplicateIndex:
+    """
+    Incremental MinHash/LSH index over the `clusters` and `lsh_buckets` tables.
+    Safe to share between threads (concurrent ingestion runs); assignment is
+    serialized so two copies of a story arriving at once land in one cluster.
+    """
+
+    def __init__(self, store, threshold: float = DEDUP_THRESHOLD, window_days: float = DEDUP_WINDOW_DAYS):
+        self.store = store
+        self.threshold = threshold
+        self.window_seconds = window_days * 86400
+        self._lock = threading.Lock()
+
+    def assign(self, posts: list[tuple[str, int, str]]) -> dict[str, str]:
+        """
+        Cluster `posts`, given as (post ID, created_utc, text) in arrival order, and
+        index the new clusters. Returns {post ID: cluster ID}; a post that starts a
+        cluster is its own cluster ID.
+        """
+        signatures = {post_id: signature(text) for post_id, _, text in posts}
+        post_buckets = {post_id: buckets(sig) for post_id, sig in signatures.items()}
+        with self._lock:
+            members, known = self.store.get_cluster_candidates(
+                [pair for pairs in post_buckets.values() for pair in pairs]
+            )
+            assigned, new, grown = {}, [], {}
+            for post_id, created, _ in posts:
+                sig = signatures[post_id]
+                candidates = {cluster_id for pair in post_buckets[post_id] for cluster_id in members.get(pair, ())}
+                best, best_score = None, self.threshold
+                for cluster_id in sorted(candidates):
+                    score = similarity(sig, known[cluster_id])
+                    if score >= best_score:
+                        best, best_score = cluster_id, score
+                if best is None:
+                    # Later posts of this batch can join it straight away
+                    best = post_id
+                    known[post_id] = sig
+                    for pair in post_buckets[post_id]:
+                        members.setdefault(pair, []).append(post_id)
+                    new.append((post_id, sig, int(created), post_buckets[post_id]))
+                    DEDUP_POSTS.labels(result="new_cluster").inc()
+                else:
+                    added, newest = grown.get(best, (0, 0))
+                    grown[best] = (added + 1, max(newest, int(created)))
+                    DEDUP_POSTS.labels(result="duplicate").inc()
+                assigned[post_id] = best
+            # New clusters are inserted before `grown` is applied, so members they
+            # gained within this batch are counted too
+            self.store.save_clusters(new, grown)
+        return assigned
+
+    def prune(self) -> int:
+        """Drop clusters idle for longer than the window from the LSH index."""
+        return self.store.prune_clusters(int(time.time() - self.window_seconds))
+
+    def stream(self, records: Iterable[dict], chunk_size: int = 500) -> Iterator[dict]:
+        """
+        Tag each new record of a stream with its `cluster_id`, a chunk at a time, and
+        give records joining an already scored cluster that cluster's `score` and
+        `label`, so scoring skips them. Records flagged `refresh` pass through, and
+        posts already stored (a re-crawl) keep their stored cluster without joining it again.
+        """
+        it = iter(records)
+        while chunk := list(islice(it, chunk_size)):
+            fresh = [r for r in chunk if not r.get("refresh")]
+            stored = self.store.get_post_clusters([r["id"] for r in fresh]) if fresh else {}
+            for r in fresh:
+                if r["id"] in stored:
+                    r["cluster_id"] = stored[r["id"]]
+            fresh = [r for r in fresh if r["id"] not in stored]
+            if fresh:
+                clusters = self.assign([(r["id"], r["created_utc"], post_text(r)) for r in fresh])
+                scored = self.store.get_cluster_sentiments(
+                    list({c for post_id, c in clusters.items() if c != post_id})
+                )
+                for r in fresh:
+                    r["cluster_id"] = clusters[r["id"]]
+                    sentiment, label, version = scored.get(r["cluster_id"], (None, None, None))
+                    # Clusters labelled by an older analyzer (awaiting `manage.py rescore`) are not reused
+                    if sentiment is not None and (version or BUILTIN_ANALYZER_VERSION) == ANALYZER_VERSION:
+                        r["score"], r["label"], r["analyzer_version"] = sentiment, label, ANALYZER_VERSION
+                        SENTIMENT_REUSED.inc()
+            yield from chunk
+        self.prune()
@@ -0,0 +1,130 @@
+"""
+Columnar snapshots of `posts` for analytics, partitioned by UTC day:
+
+    <dir>/day=2024-05-01/part-000001.arrow
+    <dir>/day=2024-05-01/part-000002.arrow   (posts added by a later export)
+    <dir>/_export_state.json
+
+Each export run appends one file per day that gained posts since the last run.
+Arrow IPC files are uncompressed so they can be memory-mapped; Parquet files are
+zstd-compressed. Read a snapshot with pyarrow:
+
+    pyarrow.dataset.dataset(dir, format="arrow", partitioning="hive")
+
+Needs the optional pyarrow package.
+"""
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from storage import Storage
+
+# Where `manage.py export` writes snapshots
+EXPORT_DIR = Path(os.getenv("EXPORT_DIR", "data/export"))
+# "arrow" (Arrow IPC, memory-mappable) or "parquet"
+EXPORT_FORMAT = os.getenv("EXPORT_FORMAT", "arrow")
+
+EXTENSIONS = {"arrow": "arrow", "parquet": "parquet"}
+# Leading underscore: pyarrow.dataset skips it when reading the snapshot
+STATE_FILE = "_export_state.json"
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError("Columnar export needs the optional pyarrow package (pip install pyarrow).") from None
+    return pyarrow
+
+
+def post_schema(pa):
+    return pa.schema([
+        ("id", pa.string()),
+        ("subreddit", pa.string()),
+        ("created_utc", pa.timestamp("s", tz="UTC")),
+        ("title", pa.string()),
+        ("body", pa.string()),
+        ("permalink", pa.string()),
+        ("sentiment", pa.float64()),
+        ("label", pa.string()),
+        ("text_summary", pa.string()),
+        ("comment_summary", pa.string()),
+    ])
+
+
+def read_state(directory: Path) -> dict | None:
+    path = directory / STATE_FILE
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def _write_state(directory: Path, state: dict):
+    tmp = directory / f".{STATE_FILE}.tmp"
+    tmp.write_text(json.dumps(state, indent=2))
+    tmp.replace(directory / STATE_FILE)
+
+
+def _open_writer(pa, fmt: str, path: Path, schema):
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(path, schema, compression="zstd")
+    return pa.ipc.new_file(path, schema)
+
+
+def _write_day(pa, store: Storage, fmt: str, path: Path, day: str, after_rowid: int, upto_rowid: int) -> int:
+    """Write the day's posts in (after_rowid, upto_rowid] to `path`, one record batch per fetched chunk."""
+    schema = post_schema(pa)
+    start = int(datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Written under a hidden name and renamed into place, so readers never see a partial file
+    tmp = path.with_name(f".{path.name}.tmp")
+    rows = 0
+    with _open_writer(pa, fmt, tmp, schema) as writer:
+        for chunk in store.iter_posts(since=start, until=start + 86400, after_rowid=after_rowid, upto_rowid=upto_rowid):
+            columns = zip(*chunk)
+            writer.write_batch(pa.record_batch(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            ))
+            rows += len(chunk)
+    tmp.replace(path)
+    return rows
+
+
+def export_posts(store: Storage, directory: Path | str = EXPORT_DIR, fmt: str | None = None,
+                 full: bool = False) -> dict:
+    """
+    Append every post stored since the last export to the snapshot in `directory`,
+    or rewrite it from scratch with `full` (needed to pick up summaries or labels
+    changed after a post was exported, or to switch formats). Returns a summary of the run.
+    """
+    pa = _pyarrow()
+    directory = Path(directory)
+    state = None if full else read_state(directory)
+    fmt = fmt or (state or {}).get("format") or EXPORT_FORMAT
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unknown export format {fmt!r}; use one of {', '.join(EXTENSIONS)}")
+    if state is not None and state["format"] != fmt:
+        raise ValueError(f"{directory} holds a snapshot in {state['format']} format; export in full to switch to {fmt}")
+    if state is None:
+        # Start over: drop earlier partitions so no post appears twice
+        for partition in directory.glob("day=*"):
+            shutil.rmtree(partition)
+        state = {"format": fmt, "last_rowid": 0, "runs": 0, "rows": 0}
+
+    upto_rowid, days = store.get_post_days(after_rowid=state["last_rowid"])
+    if not days:
+        return {"run": None, "rows": 0, "days": 0, "last_rowid": state["last_rowid"]}
+
+    # A run that died before saving its state is redone under the same number, overwriting its files
+    run = state["runs"] + 1
+    rows = 0
+    for day in days:
+        path = directory / f"day={day}" / f"part-{run:06d}.{EXTENSIONS[fmt]}"
+        rows += _write_day(pa, store, fmt, path, day, state["last_rowid"], upto_rowid)
+
+    state.update(last_rowid=upto_rowid, runs=run, rows=state["rows"] + rows, exported_at=int(time.time()))
+    _write_state(directory, state)
+    return {"run": run, "rows": rows, "days": len(days), "last_rowid": upto_rowid}
@@ -0,0 +1,115 @@
+"""
+Offline stand-in for the parts of praw.Reddit used by ingestion.
+
+Serves deterministic canned submissions and comments, sleeping for a
+configurable latency on every simulated API round trip, so ingestion can
+be exercised and benchmarked without network access.
+"""
+import random
+import threading
+import time
+
+_WORDS = [
+    "claim", "denied", "agent", "premium", "great", "terrible", "helpful", "slow",
+    "policy", "renewal", "love", "hate", "rate", "increase", "adjuster", "quick",
+    "awful", "fair", "roof", "hail", "deductible", "coverage", "quote", "switched",
+]
+_BRANDS = ["State Farm", "StateFarm", "Geico", "Allstate", "Progressive"]
+
+
+class FakeComment:
+    def __init__(self, id: str, body: str, created_utc: float, score: int):
+        self.id = id
+        self.body = body
+        self.created_utc = created_utc
+        self.score = score
+
+
+class FakeSubmission:
+    def __init__(self, client: "FakeReddit", subreddit: str, id: str, title: str, selftext: str,
+                 created_utc: float, num_comments: int):
+        self._client = client
+        self.id = id
+        self.title = title
+        self.selftext = selftext
+        self.created_utc = created_utc
+        self.num_comments = num_comments
+        self.edited = False
+        self.permalink = f"/r/{subreddit}/comments/{id}/"
+
+    @property
+    def comments(self) -> list[FakeComment]:
+        # Like PRAW, the comment tree is fetched lazily with one round trip
+        self._client._round_trip()
+        rng = random.Random(f"{self._client.seed}:{self.id}")
+        return [
+            FakeComment(
+                id=f"{self.id}_c{i}",
+                body=" ".join(rng.choices(_WORDS, k=rng.randint(5, 40))),
+                created_utc=self.created_utc + rng.randint(60, 86400),
+                score=rng.randint(-20, 200),
+            )
+            for i in range(self.num_comments)
+        ]
+
+
+class FakeSubreddit:
+    def __init__(self, client: "FakeReddit", name: str):
+        self._client = client
+        self.display_name = name
+
+    def _listing(self, limit: int | None):
+        submissions = self._client.submissions(self.display_name, limit)
+        for i, sub in enumerate(submissions):
+            # Listings come back 100 items per request
+            if i % 100 == 0:
+                self._client._round_trip()
+            yield sub
+
+    def top(self, time_filter: str = "month", limit: int | None = 100):
+        return self._listing(limit)
+
+    def new(self, limit: int | None = 100):
+        return self._listing(limit)
+
+
+class FakeReddit:
+    """Drop-in for praw.Reddit: `FakeReddit(posts=500, latency=0.2).subreddit("Insurance")`."""
+
+    def __init__(self, posts: int = 500, comments_per_post: int = 20, latency: float = 0.0,
+                 match_ratio: float = 0.5, seed: int = 0, now: float | None = None):
+        self.posts = posts
+        self.comments_per_post = comments_per_post
+        self.latency = latency
+        self.match_ratio = match_ratio
+        self.seed = seed
+        self.now = now if now is not None else time.time()
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def subreddit(self, name: str) -> FakeSubreddit:
+        return FakeSubreddit(self, name)
+
+    def submissions(self, name: str, limit: int | None = None):
+        """Generate the canned submissions for `name`, newest first."""
+        count = self.posts if limit is None else min(limit, self.posts)
+        for i in range(count):
+            rng = random.Random(f"{self.seed}:{name}:{i}")
+            brand = "State Farm" if rng.random() < self.match_ratio else rng.choice(_BRANDS[2:])
+            words = rng.choices(_WORDS, k=rng.randint(10, 120))
+            words.insert(rng.randrange(len(words) + 1), brand)
+            yield FakeSubmission(
+                self,
+                subreddit=name,
+                id=f"{name.lower()}{i:06d}",
+                title=" ".join(rng.choices(_WORDS, k=6)),
+                selftext=" ".join(words),
+                created_utc=self.now - i * 600,
+                num_comments=rng.randint(0, self.comments_per_post * 2),
+            )
+
+    def _round_trip(self):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
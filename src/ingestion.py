@@ -1,11 +1,24 @@
 import os
-import praw
-import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator
 from dotenv import load_dotenv
-from storage import Storage
-from analysis import analyze_sentiments
+from storage import Storage, SAVE_BATCH_SIZE
+from analysis import analyze_sentiment_stream
+from dedup import DuplicateIndex
+from score_cache import ScoreCache
+from scoring import SCORING_WORKERS, scoring_pool
+from ratelimit import TokenBucket
+from pipeline import counted, stage
+from keywords import KeywordMatcher, load_keywords
+from metrics import REGISTRY
 
 store = Storage()
+score_cache = ScoreCache(store)
+duplicate_index = DuplicateIndex(store)
 
 load_dotenv()
 CLIENT_ID = os.getenv("REDDIT_CLIENT_ID")
@@ -14,16 +27,64 @@ USERNAME = os.getenv("REDDIT_USERNAME")
 PASSWORD = os.getenv("REDDIT_PASSWORD")
 USER_AGENT = f"MyRedditScraper/0.0.1 by u/{USERNAME}"
 
-if not all([CLIENT_ID, CLIENT_SECRET, USERNAME, PASSWORD]):
-    raise Exception("Missing one or more environment variables. Check your .env file.")
-
-#Configure parameters
-SUBREDDIT = "Insurance"
-KEYWORDS = ["State Farm", "StateFarm", "SF"]
-POST_LIMIT = 500 
+#Configure parameters (scheduler.py ingests several subreddits on their own intervals)
+SUBREDDIT = os.getenv("SUBREDDIT", "Insurance")
+# Brand, product and agent terms, loaded from KEYWORDS_FILE (src/keywords.txt)
+KEYWORDS = load_keywords()
+POST_LIMIT = int(os.getenv("POST_LIMIT", "500"))
+# Only walk new submissions after the first run (set to 0 to always crawl top posts)
+INCREMENTAL = os.getenv("INCREMENTAL_INGESTION", "1") == "1"
+# Cluster near-duplicate posts and reuse their sentiment (set to 0 to score every post)
+DEDUPLICATE = os.getenv("DEDUPLICATE", "1") == "1"
+# Posts younger than this may still be gaining comments and get refreshed
+ACTIVE_WINDOW_DAYS = float(os.getenv("ACTIVE_WINDOW_DAYS", "3"))
+# Comment trees expanded concurrently, and the Reddit API budget shared by every
+# listing page and comment fetch in the process (all scheduled subreddits included)
+COMMENT_WORKERS = int(os.getenv("COMMENT_WORKERS", "8"))
+REQUESTS_PER_MINUTE = float(os.getenv("REDDIT_REQUESTS_PER_MINUTE", "100"))
+# Top positive/negative posts queued for LLM summaries after each run (0 disables)
+PREGENERATE_SUMMARIES = int(os.getenv("PREGENERATE_SUMMARIES", "5"))
 FIELDNAMES = ["subreddit", "type", "post_id", "comment_id", "title", "body", "url"]
 
+api_budget = TokenBucket(rate=REQUESTS_PER_MINUTE / 60, capacity=COMMENT_WORKERS)
+keyword_matcher = KeywordMatcher(KEYWORDS)
+
+STAGES = ("fetched", "matched", "scored", "saved")
+STAGE_POSTS = REGISTRY.counter(
+    "ingestion_posts_total", "Posts through each ingestion stage: listed, keyword-matched, scored, saved",
+    ["subreddit", "stage"],
+)
+STAGE_RATE = REGISTRY.gauge(
+    "ingestion_posts_per_second", "Per-stage throughput of the last ingestion run", ["subreddit", "stage"]
+)
+REGISTRY.gauge("score_cache_hit_ratio", "Share of sentiment scores served from the score cache",
+               fn=lambda: score_cache.stats()["hit_ratio"])
+RUN_CACHE_HIT_RATIO = REGISTRY.gauge(
+    "ingestion_score_cache_hit_ratio", "Share of the last ingestion run's sentiment scores served from the score cache",
+    ["subreddit"],
+)
+
+_scoring_pool = None
+_scoring_pool_lock = threading.Lock()
+
+def get_scoring_pool():
+    """
+    The scoring process pool shared by every ingestion run in this process
+    (None with SCORING_WORKERS=1). Its workers are forked on the first call,
+    so call it from the main thread before starting runs in other threads.
+    """
+    global _scoring_pool
+    with _scoring_pool_lock:
+        if _scoring_pool is None and SCORING_WORKERS > 1:
+            _scoring_pool = scoring_pool(SCORING_WORKERS)
+    return _scoring_pool
+
 def get_reddit_client():
+    if not all([CLIENT_ID, CLIENT_SECRET, USERNAME, PASSWORD]):
+        raise Exception("Missing one or more environment variables. Check your .env file.")
+    # Imported on first use: runs against FakeReddit never need PRAW
+    import praw
+
     try:
         client = praw.Reddit(
             client_id=CLIENT_ID,
@@ -36,28 +97,208 @@ def get_reddit_client():
     except Exception as e:
         print(f"Error: {e}")
 
-def fetch_posts(subreddit_name: str, limit: int = 100):
-    reddit = get_reddit_client()
+def _matched_terms(sub) -> list[str]:
+    post_text = (sub.title or "") + " " + (sub.selftext or "")
+    return keyword_matcher.find(post_text)
+
+def _to_record(sub, terms: list[str], refresh: bool = False) -> dict:
+    api_budget.acquire()
+    return {
+        "id": sub.id,
+        "title": sub.title,
+        "body": sub.selftext,
+        "created_utc": sub.created_utc, #timestamp
+        "permalink": f"https://reddit.com{sub.permalink}",
+        "num_comments": sub.num_comments,
+        "edited": sub.edited,
+        "refresh": refresh,
+        "matched_terms": terms,
+        "comments": [
+            {
+                "id": c.id,
+                "body": c.body,
+                "created_utc": c.created_utc,
+                "score": c.score,
+            }
+            for c in sub.comments
+            if hasattr(c, "body")
+        ]
+    }
+
+class FetchStats:
+    """Progress and throughput counters for one fetch."""
+
+    def __init__(self):
+        self.done = 0
+        self.comments = 0
+        self.started = time.perf_counter()
+
+    def record(self, post: dict):
+        self.done += 1
+        self.comments += len(post["comments"])
+        if self.done % 25 == 0:
+            print(f"  comments expanded for {self.done} posts ({self.summary()})")
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        return f"{self.comments} comments, {elapsed:.1f}s, {rate:.1f} posts/s"
+
+def _expand_comments(candidates: Iterable[tuple], workers: int) -> Iterator[dict]:
+    """
+    Expand comment trees in a bounded thread pool, yielding posts in listing order.
+    At most `2 * workers` expansions are in flight, so the listing is only
+    consumed as fast as results are taken.
+    """
+    workers = max(1, workers)
+    stats = FetchStats()
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for candidate in candidates:
+            in_flight.append(pool.submit(_to_record, *candidate))
+            if len(in_flight) >= 2 * workers:
+                post = in_flight.popleft().result()
+                stats.record(post)
+                yield post
+        while in_flight:
+            post = in_flight.popleft().result()
+            stats.record(post)
+            yield post
+    print(f"  comments expanded for {stats.done} posts ({stats.summary()})")
+
+def _listing(submissions, counter):
+    """Iterate a listing, taking a token from `api_budget` before each page is fetched."""
+    it = iter(submissions)
+    fetched = 0
+    while True:
+        # PRAW fetches listings lazily, 100 submissions per request
+        if fetched % 100 == 0:
+            api_budget.acquire()
+        sub = next(it, None)
+        if sub is None:
+            return
+        fetched += 1
+        counter.inc()
+        yield sub
+
+def _top_candidates(subreddit, limit: int, time_filter: str, fetched):
+    for sub in _listing(subreddit.top(time_filter=time_filter, limit=limit), fetched):
+        terms = _matched_terms(sub)
+        if terms:
+            yield (sub, terms)
+
+def _new_candidates(subreddit, limit: int, checkpoint: dict, fetched):
+    active_since = time.time() - ACTIVE_WINDOW_DAYS * 86400
+    stop_before = min(checkpoint["newest_created_utc"], active_since)
+    seen = checkpoint["seen"]
+    for sub in _listing(subreddit.new(limit=limit), fetched):
+        if sub.created_utc < stop_before:
+            break
+        terms = _matched_terms(sub)
+        if not terms:
+            continue
+        if sub.id not in seen:
+            yield (sub, terms)
+            continue
+        if sub.created_utc < active_since:
+            continue
+        if seen[sub.id] != (sub.num_comments, int(sub.edited or 0)):
+            yield (sub, terms, True)
+
+def fetch_posts(subreddit_name: str, limit: int = 100, checkpoint: dict | None = None,
+                reddit=None, workers: int = COMMENT_WORKERS, time_filter: str = "month") -> Iterator[dict]:
+    """
+    Yield keyword-matching posts with their comments, tagged with `subreddit_name`.
+    Without a checkpoint this crawls the top posts of `time_filter`. With one, only
+    the newest submissions are walked: unseen posts are yielded as new,
+    seen posts that are still active and have new comments or edits are
+    yielded with `refresh` set, and unchanged posts are skipped before
+    their comment tree is expanded.
+    Comment trees are expanded by `workers` threads sharing `api_budget`.
+    """
+    reddit = reddit or get_reddit_client()
     subreddit = reddit.subreddit(subreddit_name)
-    results = []
-    for sub in subreddit.top(time_filter="month", limit=limit):
-        post_text = (sub.title or "") + " " + (sub.selftext or "")
-        if any(keyword.lower() in post_text.lower() for keyword in KEYWORDS):
-            results.append({
-                "id": sub.id,
-                "title": sub.title,
-                "body": sub.selftext,
-                "created_utc": sub.created_utc, #timestamp
-                "permalink": f"https://reddit.com{sub.permalink}",
-                "comments": [c.body for c in sub.comments if hasattr(c, "body")]
-            })
-    return results
-
-def run_ingestion(subreddit: str = "Insurance", limit: int = 100):
-    raw_data= fetch_posts(subreddit, limit)
-    print(f"{len(raw_data)} posts pulled")
-    enriched_data= analyze_sentiments(raw_data)
-    store.save(enriched_data)
-    print(f"Saved {len(enriched_data)} posts to {store.db_path}")
-
-run_ingestion(subreddit=SUBREDDIT, limit=POST_LIMIT)
\ No newline at end of file
+    fetched = STAGE_POSTS.labels(subreddit=subreddit_name, stage="fetched")
+    if checkpoint is None:
+        candidates = _top_candidates(subreddit, limit, time_filter, fetched)
+    else:
+        candidates = _new_candidates(subreddit, limit, checkpoint, fetched)
+    candidates = counted(candidates, STAGE_POSTS.labels(subreddit=subreddit_name, stage="matched"))
+    for post in _expand_comments(candidates, workers):
+        post["subreddit"] = subreddit_name
+        yield post
+
+def run_ingestion(subreddit: str = "Insurance", limit: int = 100, incremental: bool = INCREMENTAL, reddit=None,
+                  time_filter: str = "month") -> dict:
+    """
+    Stream posts through fetch -> cluster near-duplicates -> score -> save.
+    Each stage runs in its own thread with a bounded queue in between, and
+    posts are committed in batches, so memory stays flat regardless of
+    `limit` and a crash keeps every batch already saved.
+    Returns {"new": ..., "refreshed": ...} post counts.
+    """
+    checkpoint = None
+    if incremental:
+        checkpoint = store.get_checkpoint(subreddit, int(time.time() - ACTIVE_WINDOW_DAYS * 86400))
+
+    pool = get_scoring_pool()
+    counters = {name: STAGE_POSTS.labels(subreddit=subreddit, stage=name) for name in STAGES}
+    before = {name: counter.value for name, counter in counters.items()}
+    # The cache is shared by every run in the process; count this run's lookups only
+    run_cache = score_cache.counted()
+    started = time.perf_counter()
+
+    fetched = stage(fetch_posts(subreddit, limit, checkpoint, reddit=reddit, time_filter=time_filter))
+    if DEDUPLICATE:
+        fetched = duplicate_index.stream(fetched, chunk_size=SAVE_BATCH_SIZE)
+    scored = stage(counted(
+        analyze_sentiment_stream(fetched, cache=run_cache, chunk_size=SAVE_BATCH_SIZE, pool=pool), counters["scored"]
+    ))
+
+    new_count = refresh_count = 0
+    newest = 0
+    while batch := list(islice(scored, SAVE_BATCH_SIZE)):
+        # Posts before the archive cutoff and posts already stored are not inserted
+        inserted = store.save(batch)
+        refreshed = sum(1 for p in batch if p["refresh"])
+        counters["saved"].inc(inserted + refreshed)
+        store.save_checkpoint(subreddit, None, batch)
+        refresh_count += refreshed
+        new_count += inserted
+        newest = max(newest, max(p["created_utc"] for p in batch))
+
+    if new_count or refresh_count or checkpoint is None:
+        store.save_checkpoint(subreddit, newest, [])
+
+    elapsed = time.perf_counter() - started
+    totals = {name: int(counter.value - before[name]) for name, counter in counters.items()}
+    for name, total in totals.items():
+        STAGE_RATE.labels(subreddit=subreddit, stage=name).set(total / elapsed if elapsed else 0.0)
+    print(
+        f"r/{subreddit}: " + ", ".join(f"{total} {name}" for name, total in totals.items())
+        + f" in {elapsed:.1f}s ({totals['saved'] / elapsed if elapsed else 0.0:.1f} saved/s)"
+    )
+
+    stats = run_cache.stats()
+    RUN_CACHE_HIT_RATIO.labels(subreddit=subreddit).set(stats["hit_ratio"])
+    print(
+        f"r/{subreddit}: score cache {stats['memory_hits']} memory hits, {stats['db_hits']} db hits, "
+        f"{stats['misses']} misses (hit ratio {stats['hit_ratio']:.0%})"
+    )
+    print(f"r/{subreddit}: saved {new_count} new posts and refreshed comments on {refresh_count} posts in {store.db_path}")
+
+    if PREGENERATE_SUMMARIES and new_count:
+        top_ids = [
+            row[0]
+            for label in ("Positive", "Negative")
+            for row in store.get_top_posts(label=label, n=PREGENERATE_SUMMARIES, dedupe=True)
+        ]
+        print(f"Queued {store.enqueue_summaries(top_ids)} summary jobs for top posts")
+
+    return {"new": new_count, "refreshed": refresh_count}
+
+if __name__ == "__main__":
+    try:
+        run_ingestion(subreddit=SUBREDDIT, limit=POST_LIMIT)
+    finally:
+        store.close()
\ No newline at end of file
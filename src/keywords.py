@@ -0,0 +1,122 @@
+import os
+import re
+from pathlib import Path
+
+# One term per line; blank lines and lines starting with "#" are ignored
+KEYWORDS_FILE = Path(os.getenv("KEYWORDS_FILE", Path(__file__).with_name("keywords.txt")))
+# Up to this many distinct leading words, texts are screened with plain substring
+# checks before running the regex (substring search beats a regex scan for few terms)
+MAX_PREFILTER_ANCHORS = 32
+
+_WORD_CHAR = re.compile(r"\w")
+
+
+def load_keywords(path: Path | str = KEYWORDS_FILE) -> list[str]:
+    """Read brand/product/agent terms from a keywords file."""
+    terms = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            terms.append(line)
+    return terms
+
+
+def _normalize(term: str) -> str:
+    return " ".join(term.split())
+
+
+def _is_acronym(term: str) -> bool:
+    return term.isupper() and len(term.replace(" ", "")) <= 4
+
+
+def _trie_pattern(terms: list[str]) -> str:
+    """Compile terms into a character trie regex so shared prefixes are only matched once."""
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+    return _node_pattern(trie)
+
+
+def _anchors(terms: list[str]) -> list[str]:
+    """Smallest set of lowercase substrings at least one of which every matching text contains."""
+    anchors = []
+    for word in sorted({t.split()[0].lower() for t in terms}, key=len):
+        if not any(a in word for a in anchors):
+            anchors.append(word)
+    return anchors
+
+
+def _node_pattern(node: dict) -> str:
+    branches = []
+    for ch in sorted(k for k in node if k):
+        # A space inside a term matches any run of whitespace ("State\nFarm")
+        atom = r"\s+" if ch == " " else re.escape(ch)
+        branches.append(atom + _node_pattern(node[ch]))
+    if not branches:
+        return ""
+    ends_here = "" in node
+    if len(branches) == 1 and not ends_here:
+        return branches[0]
+    group = "(?:" + "|".join(branches) + ")"
+    return group + "?" if ends_here else group
+
+
+class KeywordMatcher:
+    """
+    Matches a fixed set of terms in one regex pass over the text.
+
+    Terms only match as whole words, so "SF" does not match inside "SFO"
+    or "asf". Short all-caps terms (acronyms such as "SF") are matched
+    case-sensitively; every other term is matched case-insensitively.
+    Overlapping terms are all found ("State Farm" and "Farm Bureau" in
+    "State Farm Bureau").
+    """
+
+    def __init__(self, terms: list[str]):
+        self.terms = list(dict.fromkeys(_normalize(t) for t in terms if t.strip()))
+        acronyms = [t for t in self.terms if _is_acronym(t)]
+        words = [t for t in self.terms if not _is_acronym(t)]
+        self._canonical = {t: t for t in acronyms}
+        self._canonical.update({t.lower(): t for t in words})
+        # The term is matched inside a lookahead, so the scan resumes at the next
+        # character instead of after the term and terms starting inside it are found too
+        self._patterns = []
+        if words:
+            self._patterns.append(
+                re.compile(rf"(?<!\w)(?=((?:{_trie_pattern([t.lower() for t in words])})(?!\w)))", re.IGNORECASE)
+            )
+        if acronyms:
+            self._patterns.append(re.compile(rf"(?<!\w)(?=((?:{_trie_pattern(acronyms)})(?!\w)))"))
+        anchors = _anchors(self.terms) if self.terms else []
+        self._anchors = anchors if len(anchors) <= MAX_PREFILTER_ANCHORS else None
+
+    def _may_match(self, text: str) -> bool:
+        if self._anchors is None:
+            return True
+        lowered = text.lower()
+        return any(a in lowered for a in self._anchors)
+
+    def matches(self, text: str) -> bool:
+        return self._may_match(text) and any(p.search(text) for p in self._patterns)
+
+    def find(self, text: str) -> list[str]:
+        """Return the distinct configured terms found in `text`, in config order."""
+        if not self._may_match(text):
+            return []
+        found = set()
+        for pattern in self._patterns:
+            for m in pattern.finditer(text):
+                # The regex reports the longest term starting at each word; also record
+                # the shorter terms it begins with ("State Farm" in "State Farm Bank")
+                match = m.group(1)
+                for end in range(1, len(match) + 1):
+                    if end < len(match) and _WORD_CHAR.match(match, end):
+                        continue
+                    candidate = _normalize(match[:end])
+                    term = self._canonical.get(candidate) or self._canonical.get(candidate.lower())
+                    if term:
+                        found.add(term)
+        return [t for t in self.terms if t in found]
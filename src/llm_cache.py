@@ -0,0 +1,69 @@
+import hashlib
+import os
+import threading
+
+from metrics import REGISTRY
+
+# Responses kept in the `llm_cache` table; least recently used ones beyond this are evicted
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "100000"))
+# Days a cached response is reused before it is asked for again
+LLM_CACHE_TTL_DAYS = float(os.getenv("LLM_CACHE_TTL_DAYS", "30"))
+# Writes between eviction passes
+LLM_CACHE_EVICT_EVERY = 100
+
+LLM_CACHE = REGISTRY.counter("llm_cache_requests_total", "LLM response cache lookups", ["kind", "result"])
+
+
+def normalize_text(text: str) -> str:
+    # Whitespace-only differences never change what the model is asked
+    return " ".join(text.split())
+
+
+class LLMCache:
+    """
+    Persistent LLM response cache backed by the `llm_cache` table, with TTL
+    and LRU eviction. Keys address the model, prompt template version and
+    normalized input, so editing a prompt (and bumping its version) or
+    switching models never reuses stale responses.
+    """
+
+    def __init__(self, store, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl_days: float = LLM_CACHE_TTL_DAYS):
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_days * 86400
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(version: str, text: str) -> str:
+        """Content address for `text` sent through the prompt template `version`."""
+        return hashlib.sha256(f"{version}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, kind: str, keys: list[str]) -> dict[str, str]:
+        """Return cached responses for `keys`; missing or expired keys are simply absent."""
+        found = self.store.get_llm_responses(keys, max_age=self.ttl_seconds) if keys else {}
+        LLM_CACHE.labels(kind=kind, result="hit").inc(len(found))
+        LLM_CACHE.labels(kind=kind, result="miss").inc(len(set(keys)) - len(found))
+        return found
+
+    def get(self, kind: str, key: str) -> str | None:
+        return self.get_many(kind, [key]).get(key)
+
+    def put_many(self, kind: str, responses: dict[str, str]):
+        if not responses:
+            return
+        self.store.save_llm_responses([(key, kind, response) for key, response in responses.items()])
+        with self._lock:
+            self._writes += len(responses)
+            evict = self._writes >= LLM_CACHE_EVICT_EVERY
+            if evict:
+                self._writes = 0
+        if evict:
+            self.evict()
+
+    def put(self, kind: str, key: str, response: str):
+        self.put_many(kind, {key: response})
+
+    def evict(self) -> int:
+        """Drop expired entries and the least recently used ones beyond `max_entries`."""
+        return self.store.evict_llm_cache(self.max_entries, max_age=self.ttl_seconds)
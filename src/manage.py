@@ -0,0 +1,196 @@
+"""
+Maintenance commands for the posts database.
+
+Usage (from src/):
+    python manage.py rebuild-rollups [--check]
+    python manage.py migrate-comments
+    python manage.py rebuild-search
+    python manage.py export [--dir DIR] [--format arrow|parquet] [--full]
+    python manage.py cluster
+    python manage.py archive [--days N] [--archive PATH]
+    python manage.py maintain
+    python manage.py rescore [--check] [--workers N] [--batch-size N] [--rate N]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+from dedup import DuplicateIndex, post_text
+from export import EXPORT_DIR, export_posts
+from rescore import RESCORE_BATCH_SIZE, RESCORE_RATE, plan_rescore, rescore_posts
+from scoring import ANALYZER_FILE, ANALYZER_VERSION
+from storage import ARCHIVE_DB_PATH, RETENTION_DAYS, Storage
+
+
+def rebuild_rollups(store: Storage, args) -> int:
+    mismatches = store.verify_rollups()
+    for table, key, stored, recounted in mismatches:
+        print(f"{table} {key}: stored {stored}, recounted {recounted}")
+    if args.check:
+        print("Rollups match a full recount." if not mismatches else f"{len(mismatches)} rollup mismatches.")
+        return 1 if mismatches else 0
+    store.rebuild_rollups()
+    print(f"Rebuilt rollups ({len(mismatches)} mismatches fixed).")
+    return 0
+
+
+def migrate_comments(store: Storage, args) -> int:
+    migrated = store.migrate_comment_blobs()
+    print(f"Moved legacy comment blobs of {migrated} posts into the comments table.")
+
+    # Imported here so the other commands don't need the VADER lexicon
+    from scoring import score_many
+
+    scored = 0
+    while batch := store.get_unscored_comments():
+        compounds = score_many([body or "" for _, body in batch])
+        store.update_comment_sentiments([(comment_id, c) for (comment_id, _), c in zip(batch, compounds)])
+        scored += len(batch)
+    print(f"Scored {scored} comments.")
+    return 0
+
+
+def rebuild_search(store: Storage, args) -> int:
+    start = time.perf_counter()
+    store.rebuild_search_index()
+    print(f"Rebuilt the search index in {time.perf_counter() - start:.1f}s.")
+    return 0
+
+
+def export(store: Storage, args) -> int:
+    start = time.perf_counter()
+    try:
+        result = export_posts(store, args.dir, fmt=args.format, full=args.full)
+    except (RuntimeError, ValueError) as e:
+        print(e)
+        return 1
+    if result["run"] is None:
+        print(f"No posts stored since the last export to {args.dir}.")
+    else:
+        print(f"Export run {result['run']}: {result['rows']} posts across {result['days']} days "
+              f"to {args.dir} in {time.perf_counter() - start:.1f}s.")
+    return 0
+
+
+def cluster(store: Storage, args) -> int:
+    index = DuplicateIndex(store)
+    start = time.perf_counter()
+    clustered = duplicates = 0
+    after = (0, 0)
+    # Oldest first, so each cluster is named after the earliest copy of a story
+    while batch := store.get_unclustered_posts(after):
+        assigned = index.assign([(post_id, created, post_text({"title": title, "body": body}))
+                                 for created, _, post_id, title, body in batch])
+        store.set_post_clusters(assigned)
+        clustered += len(assigned)
+        duplicates += sum(1 for post_id, cluster_id in assigned.items() if cluster_id != post_id)
+        after = batch[-1][:2]
+    index.prune()
+    print(f"Clustered {clustered} posts ({duplicates} near-duplicates) in {time.perf_counter() - start:.1f}s.")
+    return 0
+
+
+def archive(store: Storage, args) -> int:
+    if args.days <= 0:
+        print("Retention is off: set RETENTION_DAYS or pass --days.")
+        return 1
+    start = time.perf_counter()
+    archived = store.archive_posts(int(time.time() - args.days * 86400), args.archive)
+    print(f"Archived {archived} posts older than {args.days:g} days to {args.archive} "
+          f"in {time.perf_counter() - start:.1f}s. Run `manage.py maintain` to reclaim the space.")
+    return 0
+
+
+def maintain(store: Storage, args) -> int:
+    start = time.perf_counter()
+    size = os.path.getsize(store.db_path)
+    compressed = store.compress_posts()
+    result = store.optimize()
+    if result["converted"]:
+        print("Enabled incremental auto-vacuum (one-off full VACUUM).")
+    if result["rowids_changed"]:
+        print("VACUUM renumbered posts: rebuilt the search index; re-run `manage.py export --full`.")
+    print(f"Compressed {compressed} posts, merged the search index, freed {result['freed_pages']} pages and "
+          f"analyzed the database in {time.perf_counter() - start:.1f}s "
+          f"({size / 2**20:.1f} MiB -> {os.path.getsize(store.db_path) / 2**20:.1f} MiB).")
+    return 0
+
+
+def rescore(store: Storage, args) -> int:
+    stale = plan_rescore(store)
+    for version, posts in stale.items():
+        print(f"{posts} posts labelled by {version or 'the built-in analyzer (unversioned)'}")
+    if args.check or not stale:
+        print(f"{sum(stale.values())} posts to bring to {ANALYZER_VERSION} ({ANALYZER_FILE}).")
+        return 1 if args.check and stale else 0
+    result = rescore_posts(store, workers=args.workers, batch_size=args.batch_size, rate=args.rate)
+    print(f"Rescored {result['rescored']} and relabelled {result['relabelled']} posts to {result['version']} "
+          f"in {result['seconds']}s; {result['changed']} changed sentiment or label.")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rollups = commands.add_parser("rebuild-rollups", help="verify the rollup tables and rebuild them from posts")
+    rollups.add_argument("--check", action="store_true", help="only report mismatches, exit 1 if any")
+    rollups.set_defaults(func=rebuild_rollups)
+
+    comments = commands.add_parser(
+        "migrate-comments", help="move legacy comment blobs into the comments table and score them"
+    )
+    comments.set_defaults(func=migrate_comments)
+
+    search = commands.add_parser("rebuild-search", help="re-index every post for full-text search and optimize the index")
+    search.set_defaults(func=rebuild_search)
+
+    snapshot = commands.add_parser(
+        "export", help="append posts stored since the last export to a day-partitioned columnar snapshot"
+    )
+    snapshot.add_argument("--dir", type=Path, default=EXPORT_DIR, help="snapshot directory (default: %(default)s)")
+    snapshot.add_argument("--format", choices=("arrow", "parquet"), help="file format (default: the snapshot's own, else EXPORT_FORMAT)")
+    snapshot.add_argument("--full", action="store_true", help="rewrite the whole snapshot instead of appending")
+    snapshot.set_defaults(func=export)
+
+    clusters = commands.add_parser(
+        "cluster", help="assign near-duplicate clusters to posts stored before clustering was enabled"
+    )
+    clusters.set_defaults(func=cluster)
+
+    retention = commands.add_parser(
+        "archive", help="move posts older than the retention window to the compressed archive database"
+    )
+    retention.add_argument("--days", type=float, default=RETENTION_DAYS,
+                           help="retention window in days (default: RETENTION_DAYS, %(default)s)")
+    retention.add_argument("--archive", type=Path, default=ARCHIVE_DB_PATH, help="archive database (default: %(default)s)")
+    retention.set_defaults(func=archive)
+
+    maintenance = commands.add_parser(
+        "maintain", help="compress stored text, merge the search index, reclaim free pages and run ANALYZE"
+    )
+    maintenance.set_defaults(func=maintain)
+
+    backfill = commands.add_parser(
+        "rescore", help="re-score or relabel the posts labelled by an older analyzer config, in place"
+    )
+    backfill.add_argument("--check", action="store_true", help="only report posts to update, exit 1 if any")
+    backfill.add_argument("--workers", type=int, help="scoring processes (default: SCORING_WORKERS)")
+    backfill.add_argument("--batch-size", type=int, default=RESCORE_BATCH_SIZE,
+                          help="posts per transaction (default: RESCORE_BATCH_SIZE, %(default)s)")
+    backfill.add_argument("--rate", type=float, default=RESCORE_RATE,
+                          help="posts written per second at most, 0 = unthrottled (default: RESCORE_RATE, %(default)s)")
+    backfill.set_defaults(func=rescore)
+
+    args = parser.parse_args(argv)
+    store = Storage()
+    try:
+        return args.func(store, args)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
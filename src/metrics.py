@@ -0,0 +1,296 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms are registered once at import time in the
+module that owns them, e.g.
+
+    QUERY_SECONDS = REGISTRY.histogram("storage_query_duration_seconds", "...", ["method"])
+
+and recorded through `labels(...)` children, which callers on hot paths
+bind once and reuse. `REGISTRY.render()` produces the /metrics payload;
+`serve_metrics(port)` exposes it from processes without an HTTP server of
+their own (the scheduler, a standalone summary worker).
+"""
+import functools
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# Port a background process serves /metrics on (0 disables)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Lets API clients add ?profile=1 to a request to get a sampling profile back
+API_PROFILING = os.getenv("API_PROFILING", "0") == "1"
+
+# Seconds; covers sub-millisecond SQLite lookups up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name: str, labels: str):
+        yield f"{name}{labels} {_format_value(self.value)}"
+
+
+class _GaugeChild(_CounterChild):
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+
+class _HistogramChild:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def samples(self, name: str, labels: str):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        prefix = labels[1:-1] + "," if labels else ""
+        cumulative = 0
+        for bound, count in zip((*self.buckets, math.inf), counts):
+            cumulative += count
+            yield f'{name}_bucket{{{prefix}le="{_format_value(bound)}"}} {cumulative}'
+        yield f"{name}_sum{labels} {_format_value(total)}"
+        yield f"{name}_count{labels} {cumulative}"
+
+
+class Metric:
+    """A named metric family; `labels(...)` returns (and caches) the child for one label set."""
+
+    def __init__(self, kind: str, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS, fn=None):
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Gauges may be computed when rendered instead of being set
+        self.fn = fn
+        self._children: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    if self.kind == "histogram":
+                        child = _HistogramChild(self.buckets)
+                    elif self.kind == "gauge":
+                        child = _GaugeChild()
+                    else:
+                        child = _CounterChild()
+                    self._children[key] = child
+        return child
+
+    def values(self) -> dict[tuple, float]:
+        """Current value of every counter/gauge child, keyed by label values."""
+        with self._lock:
+            return {key: child.value for key, child in self._children.items()}
+
+    # Shortcuts for metrics without labels
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        if self.fn is not None:
+            lines.append(f"{self.name} {_format_value(self.fn())}")
+            return lines
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in sorted(children):
+            labels = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key))
+            lines.extend(child.samples(self.name, f"{{{labels}}}" if labels else ""))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, kind: str, name: str, help: str, labelnames=(), **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Metric(kind, name, help, labelnames, **kwargs)
+            elif metric.kind != kind:
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames=()) -> Metric:
+        return self._register("counter", name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames=(), fn=None) -> Metric:
+        return self._register("gauge", name, help, labelnames, fn=fn)
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Metric:
+        return self._register("histogram", name, help, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for m in metrics for line in m.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def timed(histogram, **labels):
+    """
+    Decorator recording every call's duration (seconds, failures included)
+    in `histogram`, a Metric with `labels` or an already bound child.
+    """
+    child = histogram.labels(**labels) if isinstance(histogram, Metric) else histogram
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+
+        return wrapper
+
+    return decorate
+
+
+HTTP_SECONDS = REGISTRY.histogram(
+    "api_request_duration_seconds", "API request latency by route", ["method", "route", "status"]
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request into `api_request_duration_seconds`,
+    labelled with the route template (not the raw path) to keep label sets bounded.
+
+    With `profiling` on, a request carrying `profile=1` in its query string is
+    run under pyinstrument's sampling profiler and answered with the profile
+    as HTML instead of its normal response.
+    """
+
+    def __init__(self, app, profiling: bool = API_PROFILING):
+        self.app = app
+        self.profiling = profiling
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if self.profiling and self._wants_profile(scope.get("query_string", b"")):
+            return await self._profile(scope, receive, send)
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_SECONDS.labels(method=scope["method"], route=path, status=status).observe(
+                time.perf_counter() - start
+            )
+
+    @staticmethod
+    def _wants_profile(query_string: bytes) -> bool:
+        return b"profile" in query_string and parse_qs(query_string.decode("latin-1")).get("profile") == ["1"]
+
+    async def _profile(self, scope, receive, send):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            body = b"Profiling needs the optional pyinstrument package (pip install pyinstrument).\n"
+            await send({"type": "http.response.start", "status": 501,
+                        "headers": [(b"content-type", b"text/plain; charset=utf-8")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def discard(message):
+            pass
+
+        profiler = Profiler(interval=0.001, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profiler.stop()
+        body = profiler.output_html().encode("utf-8")
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/html; charset=utf-8")]})
+        await send({"type": "http.response.body", "body": body})
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int = METRICS_PORT) -> ThreadingHTTPServer | None:
+    """Serve GET /metrics on `port` from a daemon thread; does nothing if `port` is 0."""
+    if not port:
+        return None
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"Serving metrics on :{port}/metrics")
+    return server
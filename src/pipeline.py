@@ -0,0 +1,65 @@
+import queue
+import threading
+from typing import Iterable, Iterator
+
+# Items buffered between two pipeline stages before the producer blocks
+STAGE_QUEUE_SIZE = 1000
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def stage(items: Iterable, maxsize: int = STAGE_QUEUE_SIZE) -> Iterator:
+    """
+    Run `items` in a background thread and yield what it produces.
+    The bounded queue between the two sides gives backpressure: the producer
+    blocks once `maxsize` items are waiting. Producer errors are re-raised in
+    the consumer.
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except BaseException as exc:
+            put(_StageError(exc))
+            return
+        put(_DONE)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.exc
+            yield item
+    finally:
+        # Let the producer exit if the consumer stops early
+        stopped.set()
+        thread.join()
+
+
+def counted(items: Iterable, counter) -> Iterator:
+    """Yield `items` unchanged, calling `counter.inc()` for each (stage throughput metrics)."""
+    for item in items:
+        counter.inc()
+        yield item
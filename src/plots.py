@@ -0,0 +1,47 @@
+"""
+Dashboard-only plotting helpers (matplotlib + Streamlit).
+
+Kept out of `analysis` so the API, ingestion and workers never import the
+plotting and UI stacks.
+"""
+import matplotlib.pyplot as plt
+import streamlit as st
+from wordcloud import WordCloud
+
+# Plot sentiment pie chart
+def plot_sentiment_distribution(data):
+    labels = ["Positive", "Neutral", "Negative"]
+    sizes = [
+        sum(1 for d in data if d["sentiment"] == "Positive"),
+        sum(1 for d in data if d["sentiment"] == "Neutral"),
+        sum(1 for d in data if d["sentiment"] == "Negative"),
+    ]
+    colors = ["#A3E4D7", "#F9E79F", "#F5B7B1"]
+    fig, ax = plt.subplots()
+    ax.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=140)
+    ax.axis('equal')
+    st.pyplot(fig)
+
+def plot_emotion_bar(summary):
+    fig, ax = plt.subplots()
+    categories = ["Positive", "Neutral", "Negative"]
+    values = [
+        summary["Positive (%)"],
+        summary["Neutral (%)"],
+        summary["Negative (%)"]
+    ]
+    bars = ax.barh(categories, values, color=["#2ECC71", "#F4D03F", "#E74C3C"])
+    ax.set_xlim(0, 100)
+    ax.set_xlabel("Percentage")
+    for bar in bars:
+        width = bar.get_width()
+        ax.text(width + 1, bar.get_y() + bar.get_height()/2, f"{int(width)}%", va='center')
+    st.pyplot(fig)
+
+def plot_wordcloud(posts):
+    all_text = " ".join(post["body"] for post in posts)
+    wc = WordCloud(width=600, height=300, background_color="white").generate(all_text)
+    fig, ax = plt.subplots()
+    ax.imshow(wc, interpolation="bilinear")
+    ax.axis("off")
+    st.pyplot(fig)
@@ -0,0 +1,115 @@
+"""
+Backfill of stored posts after an analyzer change (scoring.ANALYZER_FILE).
+
+Every post records the scoring.ANALYZER_VERSION that labelled it. A rescore
+walks the posts labelled by any other version in rowid order, a batch at a
+time, and writes their new sentiment, label and version back one
+transaction per batch; the rollup triggers move each changed post between
+labels in that same transaction. Posts whose lexicon version still matches
+keep their compound score and are only relabelled, so a threshold change
+only runs VADER on posts that have no score. Otherwise batches are scored in
+worker processes while earlier ones are written.
+
+Progress is the posts' own versions: an interrupted run picks up the posts
+still on an old version, and posts ingested meanwhile are already current.
+"""
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from ratelimit import TokenBucket
+from scoring import (
+    ANALYZER_VERSION, BUILTIN_ANALYZER_VERSION, LEXICON_VERSION, SCORING_WORKERS, label_for, lexicon_version,
+    record_text, score_texts, scoring_pool,
+)
+from storage import SAVE_BATCH_SIZE, Storage
+
+# Posts read, scored and written per transaction
+RESCORE_BATCH_SIZE = int(os.getenv("RESCORE_BATCH_SIZE", str(SAVE_BATCH_SIZE)))
+# Posts written per second at most, so a rescore can run next to the live API (0 = unthrottled)
+RESCORE_RATE = float(os.getenv("RESCORE_RATE", "2000"))
+# Print progress every this many posts
+PROGRESS_EVERY = 50_000
+
+
+def _needs_scoring(version: str | None, sentiment: float | None = 0.0) -> bool:
+    """Whether a post needs VADER rather than a relabel: another lexicon scored it, or nothing did."""
+    return sentiment is None or lexicon_version(version) != LEXICON_VERSION
+
+
+def _score(pool: ProcessPoolExecutor | None, batch: list[tuple]):
+    """Compound scores for the posts of `batch` that need scoring: a future with a pool, else the list."""
+    texts = [
+        record_text({"title": title, "body": body or ""})
+        for _, version, sentiment, _, title, body in batch
+        if _needs_scoring(version, sentiment)
+    ]
+    return pool.submit(score_texts, texts) if pool else score_texts(texts)
+
+
+def plan_rescore(store: Storage) -> dict[str | None, int]:
+    """Return {analyzer version: posts} of the stored posts a rescore would update."""
+    return {
+        version: n for version, n in store.get_analyzer_versions().items()
+        if (version or BUILTIN_ANALYZER_VERSION) != ANALYZER_VERSION
+    }
+
+
+def rescore_posts(store: Storage, workers: int | None = None, batch_size: int = RESCORE_BATCH_SIZE,
+                  rate: float = RESCORE_RATE) -> dict:
+    """
+    Bring every stored post to the current analyzer version, scoring in `workers`
+    processes and writing at most `rate` posts per second. Returns a summary of the run.
+    """
+    workers = SCORING_WORKERS if workers is None else workers
+    stale = plan_rescore(store)
+    result = {"version": ANALYZER_VERSION, "posts": sum(stale.values()), "rescored": 0, "relabelled": 0,
+              "changed": 0}
+    if not stale:
+        return result
+    # Text is only read when some lexicon changed (and for posts without a score)
+    with_text = any(_needs_scoring(version) for version in stale)
+    bucket = TokenBucket(rate, capacity=max(rate, batch_size)) if rate > 0 else None
+    pool = scoring_pool(workers) if with_text and workers > 1 else None
+    start = time.perf_counter()
+    in_flight = deque()
+    after = done = 0
+
+    def write(batch: list[tuple], compounds: list[float]):
+        nonlocal done
+        compounds = iter(compounds)
+        updates = []
+        for rowid, version, sentiment, _, _, _ in batch:
+            if _needs_scoring(version, sentiment):
+                sentiment = next(compounds)
+                result["rescored"] += 1
+            else:
+                result["relabelled"] += 1
+            updates.append((rowid, sentiment, label_for(sentiment), ANALYZER_VERSION))
+        if bucket:
+            bucket.acquire(len(updates))
+        result["changed"] += store.update_post_sentiments(updates)
+        if (done + len(updates)) // PROGRESS_EVERY > done // PROGRESS_EVERY:
+            print(f"Rescore: {done + len(updates)}/{result['posts']} posts, {result['changed']} changed, "
+                  f"{time.perf_counter() - start:.0f}s")
+        done += len(updates)
+
+    try:
+        while True:
+            batch = store.get_stale_posts(ANALYZER_VERSION, after, batch_size, with_text=with_text,
+                                          unversioned=None in stale)
+            if batch:
+                after = batch[-1][0]
+                in_flight.append((batch, _score(pool, batch)))
+            # Keep a batch per worker scoring while the oldest one is written
+            while in_flight and (not batch or len(in_flight) > workers):
+                pending, compounds = in_flight.popleft()
+                write(pending, compounds.result() if pool else compounds)
+            if not batch:
+                break
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+    result["seconds"] = round(time.perf_counter() - start, 1)
+    return result
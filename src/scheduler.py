@@ -0,0 +1,212 @@
+"""
+Multi-subreddit ingestion scheduler.
+
+Every subreddit in the schedule file is ingested on its own interval, up to
+SCHEDULER_WORKERS at a time, all drawing on ingestion's process-wide Reddit
+API budget. Runs are recorded in `ingestion_runs`. When intervals were
+missed (the scheduler was down, or runs failed), the next run covers the
+gap in one go with a larger limit and, for top-post crawls, a wider time
+filter.
+
+Usage (from src/):
+    python scheduler.py                       # run forever
+    python scheduler.py --once                # run whatever is due, then exit
+    python scheduler.py --fake --once         # offline, against FakeReddit
+    python scheduler.py --history             # show recent runs
+    python scheduler.py --metrics-port 9100   # also serve Prometheus metrics
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+from ingestion import get_scoring_pool, run_ingestion, store
+from metrics import METRICS_PORT, serve_metrics
+from storage import Storage
+
+# JSON list of {"subreddit", "limit", "time_filter", "interval_minutes"}
+SCHEDULE_FILE = Path(os.getenv("SCHEDULE_FILE", Path(__file__).with_name("subreddits.json")))
+# Subreddits ingested concurrently
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "4"))
+# Seconds between checks for due subreddits, and before a failed run is retried
+SCHEDULER_POLL_SECONDS = float(os.getenv("SCHEDULER_POLL_SECONDS", "30"))
+SCHEDULER_RETRY_SECONDS = float(os.getenv("SCHEDULER_RETRY_SECONDS", "300"))
+
+# Reddit's time filters and the span each covers (None = everything)
+TIME_FILTERS = {
+    "hour": 3600,
+    "day": 86400,
+    "week": 7 * 86400,
+    "month": 30 * 86400,
+    "year": 365 * 86400,
+    "all": None,
+}
+# Reddit stops paging a listing after about 1000 submissions
+MAX_LISTING_LIMIT = 1000
+
+
+def load_schedule(path: Path | str = SCHEDULE_FILE) -> list[dict]:
+    """Read and validate the schedule file, filling in defaults."""
+    schedules = []
+    for entry in json.loads(Path(path).read_text(encoding="utf-8")):
+        schedule = {"limit": 100, "time_filter": "month", "interval_minutes": 60, **entry}
+        if not schedule.get("subreddit"):
+            raise ValueError(f"Schedule entry without a subreddit: {entry}")
+        if schedule["time_filter"] not in TIME_FILTERS:
+            raise ValueError(f"Unknown time_filter {schedule['time_filter']!r} for r/{schedule['subreddit']}")
+        if schedule["interval_minutes"] <= 0 or schedule["limit"] <= 0:
+            raise ValueError(f"limit and interval_minutes must be positive for r/{schedule['subreddit']}")
+        schedules.append(schedule)
+    return schedules
+
+
+def widen_time_filter(time_filter: str, seconds: float) -> str:
+    """Return the narrowest time filter at least as wide as `time_filter` that covers `seconds`."""
+    names = list(TIME_FILTERS)
+    for name in names[names.index(time_filter):]:
+        span = TIME_FILTERS[name]
+        if span is None or span >= seconds:
+            return name
+    return "all"
+
+
+class Scheduler:
+    def __init__(self, schedules: list[dict], store: Storage, reddit=None,
+                 workers: int = SCHEDULER_WORKERS, retry_seconds: float = SCHEDULER_RETRY_SECONDS):
+        self.schedules = schedules
+        self.store = store
+        # None makes every run open its own PRAW client
+        self.reddit = reddit
+        self.retry_seconds = retry_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ingest")
+        self._running: dict[str, Future] = {}
+        # Runs a previous scheduler process was killed in the middle of
+        self.store.fail_running_ingestion_runs()
+
+    def due(self, now: float | None = None) -> list[dict]:
+        """
+        Return a run plan for every subreddit whose next interval has started:
+        the schedule plus `scheduled_at`, `missed_intervals`, and the `limit`
+        and `time_filter` stretched to cover any missed intervals.
+        """
+        now = time.time() if now is None else now
+        plans = []
+        for schedule in self.schedules:
+            interval = schedule["interval_minutes"] * 60
+            last_done, last_started = self.store.get_ingestion_state(schedule["subreddit"])
+            if last_done is not None and now < last_done + interval:
+                continue
+            if last_started is not None and now < last_started + min(interval, self.retry_seconds):
+                continue
+
+            if last_done is None:
+                plans.append({**schedule, "scheduled_at": int(now), "missed_intervals": 0})
+                continue
+            # Keep runs on the interval grid; every whole interval since the
+            # last successful run beyond the current one was missed
+            elapsed = int((now - last_done) // interval)
+            missed = elapsed - 1
+            plans.append({
+                **schedule,
+                "scheduled_at": int(last_done + elapsed * interval),
+                "missed_intervals": missed,
+                "limit": min(MAX_LISTING_LIMIT, schedule["limit"] * (1 + missed)),
+                "time_filter": widen_time_filter(schedule["time_filter"], now - last_done),
+            })
+        return plans
+
+    def run_pending(self, now: float | None = None) -> list[Future]:
+        """Start every due subreddit that is not already running; return their futures."""
+        self._running = {name: f for name, f in self._running.items() if not f.done()}
+        started = []
+        for plan in self.due(now):
+            if plan["subreddit"] in self._running:
+                continue
+            future = self._pool.submit(self._run, plan)
+            self._running[plan["subreddit"]] = future
+            started.append(future)
+        return started
+
+    def run_forever(self, poll_seconds: float = SCHEDULER_POLL_SECONDS):
+        while True:
+            self.run_pending()
+            time.sleep(poll_seconds)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def _run(self, plan: dict) -> dict:
+        subreddit = plan["subreddit"]
+        run_id = self.store.start_ingestion_run(subreddit, plan["scheduled_at"], plan["missed_intervals"])
+        if plan["missed_intervals"]:
+            print(
+                f"r/{subreddit}: catching up {plan['missed_intervals']} missed intervals "
+                f"(limit {plan['limit']}, time filter {plan['time_filter']})"
+            )
+        try:
+            result = run_ingestion(subreddit, plan["limit"], reddit=self.reddit, time_filter=plan["time_filter"])
+        except Exception as e:
+            self.store.finish_ingestion_run(run_id, error=str(e) or type(e).__name__)
+            print(f"r/{subreddit}: ingestion failed: {e!r}")
+            raise
+        self.store.finish_ingestion_run(run_id, result["new"], result["refreshed"])
+        return result
+
+
+def print_history(store: Storage, n: int = 20):
+    def fmt(ts):
+        return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M") if ts else "-"
+
+    print(f"{'subreddit':<20} {'scheduled':<16} {'started':<16} {'status':<8} {'missed':>6} {'new':>6} {'refreshed':>9}")
+    for _, subreddit, scheduled, started, _, status, missed, new, refreshed, error in store.get_ingestion_runs(n):
+        print(
+            f"{subreddit:<20} {fmt(scheduled):<16} {fmt(started):<16} {status:<8} {missed:>6} "
+            f"{new or 0:>6} {refreshed or 0:>9}" + (f"  {error}" if error else "")
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default=SCHEDULE_FILE, help="schedule file (default: %(default)s)")
+    parser.add_argument("--once", action="store_true", help="run the subreddits that are due, then exit")
+    parser.add_argument("--fake", action="store_true", help="ingest from FakeReddit instead of the Reddit API")
+    parser.add_argument("--fake-posts", type=int, default=200, help="submissions per fake subreddit")
+    parser.add_argument("--fake-latency", type=float, default=0.05, help="seconds per fake API round trip")
+    parser.add_argument("--history", action="store_true", help="print recent ingestion runs and exit")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT, help="serve /metrics on this port (0 = off)")
+    args = parser.parse_args(argv)
+
+    if args.history:
+        print_history(store)
+        return 0
+
+    reddit = None
+    if args.fake:
+        from fake_reddit import FakeReddit
+        reddit = FakeReddit(posts=args.fake_posts, latency=args.fake_latency)
+
+    # Fork the scoring workers now, before any other thread is running
+    get_scoring_pool()
+    serve_metrics(args.metrics_port)
+    scheduler = Scheduler(load_schedule(args.config), store, reddit=reddit)
+    try:
+        if not args.once:
+            scheduler.run_forever()
+        futures = scheduler.run_pending()
+        wait(futures)
+        return 1 if any(f.exception() for f in futures) else 0
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        scheduler.close()
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    finally:
+        store.close()
@@ -0,0 +1,112 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Number of scores kept in the in-process LRU in front of SQLite
+SCORE_CACHE_SIZE = int(os.getenv("SCORE_CACHE_SIZE", "100000"))
+
+
+class CacheStats:
+    """Lookup counters of a score cache, or of the lookups one caller made through it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def add(self, memory_hits: int, db_hits: int, misses: int):
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.db_hits += db_hits
+            self.misses += misses
+
+    def stats(self) -> dict:
+        with self._lock:
+            memory_hits, db_hits, misses = self.memory_hits, self.db_hits, self.misses
+        lookups = memory_hits + db_hits + misses
+        hits = memory_hits + db_hits
+        return {
+            "memory_hits": memory_hits,
+            "db_hits": db_hits,
+            "misses": misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class ScoreCache:
+    """
+    Compound-score cache: an in-process LRU backed by the `score_cache` table.
+    Safe to share between threads (concurrent ingestion runs).
+    """
+
+    def __init__(self, store=None, max_size: int = SCORE_CACHE_SIZE):
+        self.store = store
+        self.max_size = max_size
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+
+    def counted(self) -> "CountedScoreCache":
+        """A view of this cache that also counts its own lookups (one ingestion run's)."""
+        return CountedScoreCache(self)
+
+    def get_many(self, keys: list[str], tally: CacheStats | None = None) -> dict[str, float]:
+        """Return cached scores for `keys`; missing keys are simply absent. Lookups are also counted in `tally`."""
+        found = {}
+        pending = []
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+                else:
+                    pending.append(key)
+
+        from_db = {}
+        if pending and self.store is not None:
+            from_db = self.store.get_cached_scores(pending)
+            found.update(from_db)
+
+        with self._lock:
+            for key, compound in from_db.items():
+                self._remember(key, compound)
+        counts = (len(keys) - len(pending), len(from_db), sum(1 for key in pending if key not in found))
+        self._stats.add(*counts)
+        if tally is not None:
+            tally.add(*counts)
+        return found
+
+    def put_many(self, scores: dict[str, float]):
+        with self._lock:
+            for key, compound in scores.items():
+                self._remember(key, compound)
+        if scores and self.store is not None:
+            self.store.save_cached_scores(scores)
+
+    def stats(self) -> dict:
+        """Lookup counts and hit ratio over the cache's lifetime."""
+        return self._stats.stats()
+
+    def _remember(self, key: str, compound: float):
+        self._lru[key] = compound
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+
+
+class CountedScoreCache:
+    """A ScoreCache seen by one caller: shares its entries, counts only its own lookups."""
+
+    def __init__(self, cache: ScoreCache):
+        self.cache = cache
+        self._stats = CacheStats()
+
+    def get_many(self, keys: list[str]) -> dict[str, float]:
+        return self.cache.get_many(keys, tally=self._stats)
+
+    def put_many(self, scores: dict[str, float]):
+        self.cache.put_many(scores)
+
+    def stats(self) -> dict:
+        return self._stats.stats()
@@ -0,0 +1,280 @@
+import hashlib
+import json
+import os
+import string
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+if TYPE_CHECKING:
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+# Number of worker processes used for batch scoring (1 = score in-process)
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", "1"))
+# Number of records handed to a worker at a time
+SCORING_CHUNK_SIZE = int(os.getenv("SCORING_CHUNK_SIZE", "500"))
+# Fewer texts than this are scored in-process even with a pool: not worth a round trip
+POOL_MIN_TEXTS = 32
+
+# NLTK resource holding the VADER lexicon. It is looked up on the NLTK data path
+# (NLTK_DATA; the Docker image bundles it) and only downloaded if missing there.
+VADER_LEXICON = "sentiment/vader_lexicon.zip"
+
+# Label thresholds and VADER lexicon overrides (JSON); see load_analyzer_config.
+# After changing it, run `manage.py rescore` to relabel the stored posts.
+ANALYZER_FILE = Path(os.getenv("ANALYZER_FILE", Path(__file__).with_name("analyzer.json")))
+
+# Bump whenever the VADER analyzer itself changes; the config is versioned by content
+VADER_VERSION = "vader-nltk-1"
+
+
+def load_analyzer_config(path: Path | str = ANALYZER_FILE) -> dict:
+    """
+    Read the analyzer config: {"positive_threshold": float, "negative_threshold": float,
+    "lexicon": {token: valence}}. Missing keys (or a missing file) keep the built-in
+    thresholds of +/-0.05 and the stock lexicon; valences use VADER's -4..4 scale.
+    """
+    path = Path(path)
+    config = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+    positive = float(config.get("positive_threshold", 0.05))
+    negative = float(config.get("negative_threshold", -0.05))
+    if negative >= positive:
+        raise ValueError(f"{path}: negative_threshold must be below positive_threshold")
+    return {
+        "positive_threshold": positive,
+        "negative_threshold": negative,
+        "lexicon": {token.lower(): float(valence) for token, valence in config.get("lexicon", {}).items()},
+    }
+
+
+def config_versions(config: dict) -> tuple[str, str]:
+    """
+    (lexicon version, analyzer version) of a config. The lexicon version keys cached
+    compound scores, which thresholds do not affect; posts record the analyzer version.
+    """
+    lexicon = VADER_VERSION
+    if config["lexicon"]:
+        digest = hashlib.sha256(json.dumps(config["lexicon"], sort_keys=True).encode("utf-8")).hexdigest()
+        lexicon = f"{VADER_VERSION}+{digest[:12]}"
+    return lexicon, f"{lexicon}/{config['positive_threshold']:g}/{config['negative_threshold']:g}"
+
+
+ANALYZER_CONFIG = load_analyzer_config()
+POSITIVE_THRESHOLD = ANALYZER_CONFIG["positive_threshold"]
+NEGATIVE_THRESHOLD = ANALYZER_CONFIG["negative_threshold"]
+LEXICON_OVERRIDES = ANALYZER_CONFIG["lexicon"]
+LEXICON_VERSION, ANALYZER_VERSION = config_versions(ANALYZER_CONFIG)
+# What labelled posts stored before versions were recorded (analyzer_version NULL)
+BUILTIN_ANALYZER_VERSION = f"{VADER_VERSION}/0.05/-0.05"
+
+_PUNCTUATION = string.punctuation
+
+# Per-process analyzer state, created lazily (and once per pool worker)
+_analyzer = None
+_lexicon = frozenset()
+
+
+def _ensure_lexicon():
+    """Make sure the VADER lexicon is on the NLTK data path, downloading it only as a last resort."""
+    import nltk
+
+    try:
+        nltk.data.find(VADER_LEXICON)
+    except LookupError:
+        print("VADER lexicon not found on the NLTK data path; downloading it")
+        if not nltk.download("vader_lexicon", quiet=True):
+            raise
+
+
+def get_analyzer() -> "SentimentIntensityAnalyzer":
+    """Return this process's analyzer, building it and the lexicon key set on first use."""
+    global _analyzer, _lexicon
+    if _analyzer is None:
+        # Imported here so importing this module stays cheap and offline
+        from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+        _ensure_lexicon()
+        analyzer = SentimentIntensityAnalyzer()
+        analyzer.lexicon.update(LEXICON_OVERRIDES)
+        # Publish the lexicon first: another thread seeing `_analyzer` set must
+        # not run the lexicon-hit check against an empty set
+        _lexicon = frozenset(analyzer.lexicon)
+        _analyzer = analyzer
+    return _analyzer
+
+
+def _init_worker():
+    get_analyzer()
+
+
+def record_text(record: dict) -> str:
+    """Text that gets scored for a post record."""
+    return f"{record['title']} {record.get('body', '')}"
+
+
+def normalize_text(text: str) -> str:
+    # VADER tokenizes on whitespace, so collapsing runs of it never changes the score
+    return " ".join(text.split())
+
+
+def cache_key(text: str, version: str = LEXICON_VERSION) -> str:
+    """Content address for a scored text under a given lexicon version."""
+    return hashlib.sha256(f"{version}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+def lexicon_version(analyzer_version: str | None) -> str:
+    """The lexicon version part of a post's recorded analyzer version."""
+    return (analyzer_version or BUILTIN_ANALYZER_VERSION).split("/")[0]
+
+
+def label_for(compound: float) -> str:
+    if compound >= POSITIVE_THRESHOLD:
+        return "Positive"
+    if compound <= NEGATIVE_THRESHOLD:
+        return "Negative"
+    return "Neutral"
+
+
+def _has_lexicon_hit(text: str) -> bool:
+    # VADER only assigns valence to tokens found in its lexicon, so text with
+    # no lexicon token always scores a compound of exactly 0.0.
+    for token in text.split():
+        lowered = token.lower()
+        if lowered in _lexicon or lowered.strip(_PUNCTUATION) in _lexicon:
+            return True
+    return False
+
+
+def score_text(text: str) -> float:
+    """Return the VADER compound score for `text`."""
+    analyzer = get_analyzer()
+    if not _has_lexicon_hit(text):
+        return 0.0
+    return analyzer.polarity_scores(text)["compound"]
+
+
+def score_texts(texts: list[str]) -> list[float]:
+    """Score a chunk of texts in this process."""
+    return [score_text(t) for t in texts]
+
+
+def scoring_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    A process pool whose workers build their analyzer up front. The workers are
+    started here, in the calling thread, rather than forked later from whichever
+    pipeline thread submits first. Create one per run and pass it along as `pool`.
+    """
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    # The first submit starts every worker process
+    pool.submit(int).result()
+    return pool
+
+
+def _score_uncached(texts: list[str], workers: int, chunk_size: int,
+                    pool: ProcessPoolExecutor | None = None) -> list[float]:
+    if pool is not None:
+        if len(texts) < POOL_MIN_TEXTS:
+            return score_texts(texts)
+        # A chunk per worker, so a batch no larger than chunk_size still uses them all
+        size = min(chunk_size, -(-len(texts) // max(1, workers)))
+        chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
+        return [c for chunk in pool.map(score_texts, chunks) for c in chunk]
+    if workers <= 1 or len(texts) <= chunk_size:
+        return score_texts(texts)
+    # One-off callers without a pool of their own: only worth starting one for several chunks
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    with scoring_pool(workers) as pool:
+        return [c for chunk in pool.map(score_texts, chunks) for c in chunk]
+
+
+def score_many(
+    texts: list[str],
+    workers: int | None = None,
+    chunk_size: int | None = None,
+    cache=None,
+    pool: ProcessPoolExecutor | None = None,
+) -> list[float]:
+    """
+    Return compound scores for `texts`, in input order.
+    With a `pool` or more than one worker, texts are split into chunks and
+    scored in a process pool (a temporary one if no `pool` is given). When a
+    `ScoreCache` is given, only texts it has not seen before are scored.
+    """
+    workers = SCORING_WORKERS if workers is None else workers
+    chunk_size = chunk_size or SCORING_CHUNK_SIZE
+
+    if cache is None:
+        return _score_uncached(texts, workers, chunk_size, pool)
+
+    keys = [cache_key(t) for t in texts]
+    known = cache.get_many(list(dict.fromkeys(keys)))
+    missing = {k: t for k, t in zip(keys, texts) if k not in known}
+    if missing:
+        fresh = dict(zip(missing, _score_uncached(list(missing.values()), workers, chunk_size, pool)))
+        cache.put_many(fresh)
+        known.update(fresh)
+    return [known[k] for k in keys]
+
+
+def score_records(
+    records: list[dict],
+    workers: int | None = None,
+    chunk_size: int | None = None,
+    cache=None,
+    pool: ProcessPoolExecutor | None = None,
+) -> list[dict]:
+    """Score a batch of post records and attach `score`, `label` and `analyzer_version`, in input order."""
+    compounds = score_many([record_text(r) for r in records], workers, chunk_size, cache, pool)
+    return [
+        {**r, "score": compound, "label": label_for(compound), "analyzer_version": ANALYZER_VERSION}
+        for r, compound in zip(records, compounds)
+    ]
+
+
+def score_comments(
+    records: list[dict],
+    workers: int | None = None,
+    chunk_size: int | None = None,
+    cache=None,
+    pool: ProcessPoolExecutor | None = None,
+) -> list[dict]:
+    """Attach a `sentiment` compound score to every comment of `records`, scoring them in one batch."""
+    bodies = [c["body"] for r in records for c in r["comments"]]
+    compounds = iter(score_many(bodies, workers, chunk_size, cache, pool))
+    return [
+        {**r, "comments": [{**c, "sentiment": next(compounds)} for c in r["comments"]]}
+        for r in records
+    ]
+
+
+def score_stream(
+    records: Iterable[dict],
+    workers: int | None = None,
+    chunk_size: int | None = None,
+    cache=None,
+    pool: ProcessPoolExecutor | None = None,
+) -> Iterator[dict]:
+    """
+    Lazily score a stream of records one chunk at a time, yielding them in order.
+    Every comment gets its own score; records flagged `refresh` (already stored
+    and scored) or already carrying a `score` (taken from a near-duplicate) only
+    have their comments scored. Chunks are scored in `pool`; without one, more
+    than one worker gets a pool that lasts for the whole stream.
+    """
+    workers = SCORING_WORKERS if workers is None else workers
+    chunk_size = chunk_size or SCORING_CHUNK_SIZE
+    owned = scoring_pool(workers) if pool is None and workers > 1 else None
+    pool = pool or owned
+    try:
+        it = iter(records)
+        while chunk := list(islice(it, chunk_size)):
+            chunk = score_comments(chunk, workers=workers, chunk_size=chunk_size, cache=cache, pool=pool)
+            done = [r.get("refresh") or "score" in r for r in chunk]
+            to_score = [r for r, skip in zip(chunk, done) if not skip]
+            scored = iter(score_records(to_score, workers=workers, chunk_size=chunk_size, cache=cache, pool=pool))
+            for r, skip in zip(chunk, done):
+                yield r if skip else next(scored)
+    finally:
+        if owned:
+            owned.shutdown(cancel_futures=True)
@@ -1,84 +1,660 @@
+import functools
+import json
 import os
+import queue
 import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
+from typing import Iterable, Iterator
+
+from metrics import REGISTRY
 
 DB_PATH = Path(os.getenv("DB_PATH", "data/reddit_data.db"))
+# Records committed per transaction by Storage.save
+SAVE_BATCH_SIZE = int(os.getenv("SAVE_BATCH_SIZE", "500"))
+# Idle connections kept open for reuse
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+# Newest matching posts Storage.search ranks by BM25; bounds the cost of very common terms
+SEARCH_RANK_WINDOW = int(os.getenv("SEARCH_RANK_WINDOW", "10000"))
+# Rows fetched per round trip when streaming posts out (iter_posts)
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+# Post bodies and summaries at least this many bytes long are stored zlib-compressed (0 = never)
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "512"))
+# Hot window: `manage.py archive` moves posts older than this many days to the archive (0 = keep all)
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", "0"))
+# Cold storage for archived posts: an SQLite file of zlib-compressed JSON records
+ARCHIVE_DB_PATH = Path(os.getenv("ARCHIVE_DB_PATH", "data/archive.db"))
+
+# Applied to every pooled connection
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -65536",     # 64 MiB page cache
+    "PRAGMA mmap_size = 268435456",   # 256 MiB memory-mapped I/O
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Every post counted in the rollups, per UTC hour and label: the stored posts
+# plus the aggregates of those moved to the archive
+_COUNTED_POSTS_SQL = """
+    SELECT created_utc - created_utc % 3600 AS hour, label, 1 AS post_count, ifnull(sentiment, 0) AS sentiment_sum,
+           sentiment IS NOT NULL AS scored_count
+    FROM posts
+    UNION ALL
+    SELECT hour, label, post_count, sentiment_sum, scored_count FROM archived_rollup
+"""
+# Full recount of the daily rollup, used to rebuild and verify it
+ROLLUP_RECOUNT_SQL = f"""
+    SELECT date(hour, 'unixepoch'), label, SUM(post_count), TOTAL(sentiment_sum), SUM(scored_count)
+    FROM ({_COUNTED_POSTS_SQL})
+    GROUP BY 1, 2
+"""
+# Same recount per UTC hour, for the hourly rollup
+HOURLY_RECOUNT_SQL = f"""
+    SELECT hour, label, SUM(post_count), TOTAL(sentiment_sum), SUM(scored_count)
+    FROM ({_COUNTED_POSTS_SQL})
+    GROUP BY 1, 2
+"""
+
+# Search document of a post: title, body, every comment and its summaries.
+# Callers append a WHERE clause on `p` to index a subset.
+SEARCH_DOCUMENT_SQL = """
+    INSERT INTO posts_fts (rowid, title, body, comments, summaries)
+    SELECT p.rowid, p.title, inflate(p.body),
+           (SELECT group_concat(c.body, char(10)) FROM comments c WHERE c.post_id = p.id),
+           trim(ifnull(inflate(p.text_summary), '') || char(10) || ifnull(inflate(p.comment_summary), ''))
+    FROM posts p
+"""
+# posts_fts `rank`: BM25 with column weights for title, body, comments, summaries (lower is better)
+SEARCH_RANK = "bm25(10.0, 4.0, 1.0, 2.0)"
+
+# Keep the rollups in step with `posts` inside the writing transaction
+ROLLUP_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_posts_rollup_insert AFTER INSERT ON posts
+    BEGIN
+        INSERT INTO daily_rollup (day, label, post_count, sentiment_sum, scored_count)
+        VALUES (date(NEW.created_utc, 'unixepoch'), NEW.label, 1, ifnull(NEW.sentiment, 0), NEW.sentiment IS NOT NULL)
+        ON CONFLICT(day, label) DO UPDATE SET
+            post_count = post_count + 1,
+            sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+            scored_count = scored_count + excluded.scored_count;
+        INSERT INTO label_totals (label, post_count, sentiment_sum, scored_count)
+        VALUES (NEW.label, 1, ifnull(NEW.sentiment, 0), NEW.sentiment IS NOT NULL)
+        ON CONFLICT(label) DO UPDATE SET
+            post_count = post_count + 1,
+            sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+            scored_count = scored_count + excluded.scored_count;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_posts_rollup_update
+    AFTER UPDATE OF label, sentiment, created_utc ON posts
+    WHEN OLD.label IS NOT NEW.label
+      OR OLD.sentiment IS NOT NEW.sentiment
+      OR OLD.created_utc IS NOT NEW.created_utc
+    BEGIN
+        UPDATE daily_rollup
+        SET post_count = post_count - 1,
+            sentiment_sum = sentiment_sum - ifnull(OLD.sentiment, 0),
+            scored_count = scored_count - (OLD.sentiment IS NOT NULL)
+        WHERE day = date(OLD.created_utc, 'unixepoch') AND label = OLD.label;
+        UPDATE label_totals
+        SET post_count = post_count - 1,
+            sentiment_sum = sentiment_sum - ifnull(OLD.sentiment, 0),
+            scored_count = scored_count - (OLD.sentiment IS NOT NULL)
+        WHERE label = OLD.label;
+        INSERT INTO daily_rollup (day, label, post_count, sentiment_sum, scored_count)
+        VALUES (date(NEW.created_utc, 'unixepoch'), NEW.label, 1, ifnull(NEW.sentiment, 0), NEW.sentiment IS NOT NULL)
+        ON CONFLICT(day, label) DO UPDATE SET
+            post_count = post_count + 1,
+            sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+            scored_count = scored_count + excluded.scored_count;
+        INSERT INTO label_totals (label, post_count, sentiment_sum, scored_count)
+        VALUES (NEW.label, 1, ifnull(NEW.sentiment, 0), NEW.sentiment IS NOT NULL)
+        ON CONFLICT(label) DO UPDATE SET
+            post_count = post_count + 1,
+            sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+            scored_count = scored_count + excluded.scored_count;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_posts_hourly_insert AFTER INSERT ON posts
+    BEGIN
+        INSERT INTO hourly_rollup (hour, label, post_count, sentiment_sum, scored_count)
+        VALUES (NEW.created_utc - NEW.created_utc % 3600, NEW.label, 1, ifnull(NEW.sentiment, 0), NEW.sentiment IS NOT NULL)
+        ON CONFLICT(hour, label) DO UPDATE SET
+            post_count = post_count + 1,
+            sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+            scored_count = scored_count + excluded.scored_count;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_posts_hourly_update
+    AFTER UPDATE OF label, sentiment, created_utc ON posts
+    WHEN OLD.label IS NOT NEW.label
+      OR OLD.sentiment IS NOT NEW.sentiment
+      OR OLD.created_utc IS NOT NEW.created_utc
+    BEGIN
+        UPDATE hourly_rollup
+        SET post_count = post_count - 1,
+            sentiment_sum = sentiment_sum - ifnull(OLD.sentiment, 0),
+            scored_count = scored_count - (OLD.sentiment IS NOT NULL)
+        WHERE hour = OLD.created_utc - OLD.created_utc % 3600 AND label = OLD.label;
+        INSERT INTO hourly_rollup (hour, label, post_count, sentiment_sum, scored_count)
+        VALUES (NEW.created_utc - NEW.created_utc % 3600, NEW.label, 1, ifnull(NEW.sentiment, 0), NEW.sentiment IS NOT NULL)
+        ON CONFLICT(hour, label) DO UPDATE SET
+            post_count = post_count + 1,
+            sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+            scored_count = scored_count + excluded.scored_count;
+    END
+    """,
+)
+
+# Schema changes _init_db applies once each, in order, inside its transaction;
+# PRAGMA user_version counts those applied. Append new steps, never edit old ones.
+MIGRATIONS = (
+    # 1: indexes for the queries that read whole tables (benchmarks/check_query_plans.py)
+    (
+        # Top posts walk this in sentiment order, reading the time window and cluster
+        # from the index and stopping after `n` rows, instead of sorting every post
+        # with the label; it replaces the label-only index
+        "CREATE INDEX IF NOT EXISTS idx_posts_top ON posts(label, sentiment, created_utc, cluster_id)",
+        "DROP INDEX IF EXISTS idx_posts_label",
+        # Partial indexes hold only the rows still waiting for work
+        "CREATE INDEX IF NOT EXISTS idx_comments_unscored ON comments(id) WHERE sentiment IS NULL",
+        "CREATE INDEX IF NOT EXISTS idx_ingestion_runs_running ON ingestion_runs(id) WHERE status = 'running'",
+    ),
+    # 2: the scoring.ANALYZER_VERSION that labelled each post; NULL for posts stored
+    # before, labelled by scoring.BUILTIN_ANALYZER_VERSION
+    (
+        "ALTER TABLE posts ADD COLUMN analyzer_version TEXT",
+    ),
+    # 3: the rollups count posts with a score apart from all posts, so averages leave
+    # out unscored (NULL) posts as AVG(sentiment) does. Dropping the triggers makes
+    # _init_db recreate them and recount the rollups; archived posts count as scored.
+    (
+        "ALTER TABLE daily_rollup ADD COLUMN scored_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE label_totals ADD COLUMN scored_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE hourly_rollup ADD COLUMN scored_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE archived_rollup ADD COLUMN scored_count INTEGER NOT NULL DEFAULT 0",
+        "UPDATE archived_rollup SET scored_count = post_count",
+        "DROP TRIGGER IF EXISTS trg_posts_rollup_insert",
+        "DROP TRIGGER IF EXISTS trg_posts_rollup_update",
+        "DROP TRIGGER IF EXISTS trg_posts_hourly_insert",
+        "DROP TRIGGER IF EXISTS trg_posts_hourly_update",
+    ),
+)
+
+# get_top_posts sorts the posts of a term matched fewer times than this, and walks
+# the index checking each post against more common terms
+TERM_LIST_MAX = 1000
+
+# Post fields iter_posts yields, in order
+EXPORT_COLUMNS = (
+    "id", "subreddit", "created_utc", "title", "body", "permalink",
+    "sentiment", "label", "text_summary", "comment_summary",
+)
+
+# Post columns that may hold compressed text (see _deflate); read them through inflate()
+COMPRESSED_COLUMNS = ("body", "text_summary", "comment_summary")
+
+# Bucket width in seconds and the offset its boundaries are aligned to, per trend granularity
+TREND_BUCKETS = {
+    "hour": (3600, 0),
+    "day": (86400, 0),
+    "week": (604800, 345600),  # weeks start on Monday; 1970-01-05 00:00 UTC was one
+}
+
+QUERY_SECONDS = REGISTRY.histogram("storage_query_duration_seconds", "Storage method latency", ["method"])
+QUERY_ROWS = REGISTRY.counter("storage_query_rows_total", "Rows returned or written by Storage methods", ["method"])
+
+
+def _deflate(text: str | None):
+    """
+    `text` as a zlib-compressed UTF-8 BLOB if it is at least COMPRESS_MIN_BYTES long
+    and compression pays off; otherwise `text` unchanged.
+    """
+    if text is None or not COMPRESS_MIN_BYTES:
+        return text
+    raw = text.encode("utf-8")
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return text
+    packed = zlib.compress(raw)
+    return packed if len(packed) < len(raw) else text
+
+
+def _inflate(value):
+    """Undo _deflate. Registered on every connection as the SQL function inflate()."""
+    return zlib.decompress(value).decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _row_count(result) -> int:
+    if result is None:
+        return 0
+    if isinstance(result, (list, dict)):
+        return len(result)
+    return 1
+
+
+def _query(rows=_row_count):
+    """
+    Time a Storage method into `storage_query_duration_seconds` and add
+    `rows(result)` to `storage_query_rows_total` (rows=None: timing only).
+    """
+    def decorate(fn):
+        seconds = QUERY_SECONDS.labels(method=fn.__name__)
+        counted = QUERY_ROWS.labels(method=fn.__name__) if rows is not None else None
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                seconds.observe(time.perf_counter() - start)
+            if counted is not None:
+                counted.inc(rows(result))
+            return result
+
+        return wrapper
+
+    return decorate
+
 
 class Storage:
-    def __init__(self, db_path: Path | str = DB_PATH):
+    def __init__(self, db_path: Path | str = DB_PATH, pool_size: int = DB_POOL_SIZE):
         self.db_path = Path(db_path)
         # ensure parent dir exists
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._lock = threading.Lock()
+        self._closed = False
         self._init_db()
 
-    def save(self, records: list[dict]):
-        """Insert or ignore a batch of Reddit posts/comments."""
-        con = sqlite3.connect(self.db_path)
-        cur = con.cursor()
-        cur.executemany(
-            """
-            INSERT OR IGNORE INTO posts
-            (id, title, body, comments, created_utc, permalink,
-             sentiment, label)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            [
-                (
-                    r["id"],
-                    r["title"],
-                    r["body"],
-                    "\n".join(r["comments"]),
-                    int(r["created_utc"]),
-                    r["permalink"],
-                    float(r["sentiment"]["compound"]),
-                    r["label"],
-                )
-                for r in records
-            ],
-        )
-        con.commit()
-        con.close()
+    def _connect(self) -> sqlite3.Connection:
+        # Connections move between threads via the pool but are only ever used
+        # by one thread at a time; sqlite3 reuses prepared statements per connection.
+        con = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        for pragma in CONNECTION_PRAGMAS:
+            con.execute(pragma)
+        con.create_function("inflate", 1, _inflate, deterministic=True)
+        return con
+
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection, opening a new one if none are idle."""
+        try:
+            con = self._pool.get_nowait()
+        except queue.Empty:
+            con = self._connect()
+        try:
+            yield con
+        finally:
+            if con.in_transaction:
+                con.rollback()
+            with self._lock:
+                keep = not self._closed
+                if keep:
+                    try:
+                        self._pool.put_nowait(con)
+                    except queue.Full:
+                        keep = False
+            if not keep:
+                con.close()
+
+    def close(self):
+        """Close all idle pooled connections; connections in use close when returned."""
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    self._pool.get_nowait().close()
+                except queue.Empty:
+                    break
+
+    @_query(rows=int)
+    def save(self, records: Iterable[dict], batch_size: int = SAVE_BATCH_SIZE) -> int:
+        """
+        Insert or ignore Reddit posts and upsert their comments, committing
+        every `batch_size` records in its own transaction. Records flagged
+        `refresh` only update the comments of the already stored post.
+        Records created before the archive cutoff are skipped, so a re-fetched
+        archived post is not counted twice. Returns the number of new posts
+        inserted (skipped and already stored posts are not counted).
+        """
+        inserted = 0
+        with self._connection() as con:
+            archived_before = con.execute("SELECT value FROM meta WHERE key = 'archived_before'").fetchone()[0]
+            it = iter(records)
+            while batch := list(islice(it, batch_size)):
+                batch = [r for r in batch if int(r["created_utc"]) >= archived_before]
+                with con:
+                    inserted += con.executemany(
+                        """
+                        INSERT OR IGNORE INTO posts
+                        (id, title, body, created_utc, permalink,
+                         sentiment, label, subreddit, cluster_id, analyzer_version)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        [
+                            (
+                                r["id"],
+                                r["title"],
+                                _deflate(r["body"]),
+                                int(r["created_utc"]),
+                                r["permalink"],
+                                float(r["score"]),
+                                r["label"],
+                                r.get("subreddit"),
+                                r.get("cluster_id"),
+                                r.get("analyzer_version"),
+                            )
+                            for r in batch
+                            if not r.get("refresh")
+                        ],
+                    ).rowcount
+                    con.executemany(
+                        """
+                        INSERT INTO comments (id, post_id, body, created_utc, score, sentiment)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(id) DO UPDATE SET
+                            body = excluded.body,
+                            score = excluded.score,
+                            sentiment = excluded.sentiment
+                        """,
+                        [
+                            (
+                                c["id"],
+                                r["id"],
+                                c["body"],
+                                int(c["created_utc"]),
+                                c["score"],
+                                c.get("sentiment"),
+                            )
+                            for r in batch
+                            for c in r["comments"]
+                        ],
+                    )
+                    con.executemany(
+                        "INSERT OR IGNORE INTO post_terms (term, post_id) VALUES (?, ?)",
+                        [(term, r["id"]) for r in batch for term in r.get("matched_terms", ())],
+                    )
+                    self._index_posts(con, [r["id"] for r in batch])
+                    self._bump_data_version(con)
+        return inserted
+
+    @staticmethod
+    def _index_posts(con: sqlite3.Connection, post_ids: list[str]):
+        """Rebuild the full-text search rows of `post_ids` from their current posts, comments and summaries."""
+        # Set-based statements per chunk index several times faster than one post at a time
+        for i in range(0, len(post_ids), 500):
+            chunk = post_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            con.execute(
+                f"DELETE FROM posts_fts WHERE rowid IN (SELECT rowid FROM posts WHERE id IN ({placeholders}))",
+                chunk,
+            )
+            con.execute(f"{SEARCH_DOCUMENT_SQL} WHERE p.id IN ({placeholders})", chunk)
+
+    @_query(rows=None)
+    def rebuild_search_index(self):
+        """Re-index every post from scratch and merge the index into one segment."""
+        with self._connection() as con, con:
+            con.execute("DELETE FROM posts_fts")
+            con.execute(SEARCH_DOCUMENT_SQL)
+            con.execute("INSERT INTO posts_fts (posts_fts) VALUES ('optimize')")
 
+    @_query()
+    def search(self, query: str, label: str | None = None, since: int | None = None, until: int | None = None,
+               limit: int = 20, after: tuple | None = None, window: int = SEARCH_RANK_WINDOW) -> list[tuple]:
+        """
+        Full-text search over post titles, bodies, comments and summaries, best BM25 match first.
+        `query` uses FTS5 syntax (words, "phrases", prefix*, AND/OR/NOT). Filters: `label`, and
+        `since` <= created_utc < `until` (unix seconds).
+
+        Only the newest `window` matching posts are ranked, so terms found in most posts
+        cost the same at any table size; rarer terms are ranked exactly.
+
+        Returns (id, title, permalink, sentiment, label, created_utc, snippet, rank, rowid, floor)
+        rows. For the next page pass the last row's (rank, rowid, floor) as `after` (keyset
+        pagination; `floor` pins the ranking window). Raises ValueError for malformed queries.
+        """
+        params = {"query": query, "label": label, "since": since, "until": until, "limit": limit}
+        where = f"""
+            FROM posts_fts
+            JOIN posts p ON p.rowid = posts_fts.rowid
+            WHERE posts_fts MATCH :query
+            {"AND p.label = :label" if label else ""}
+            {"AND p.created_utc >= :since" if since is not None else ""}
+            {"AND p.created_utc < :until" if until is not None else ""}
+        """
+        page = ""
+        if after is not None:
+            params["rank"], params["rowid"], params["floor"] = after
+            page = "AND (posts_fts.rank > :rank OR (posts_fts.rank = :rank AND posts_fts.rowid > :rowid))"
+
+        with self._connection() as con:
+            try:
+                if after is None:
+                    # The doclist is in rowid order, so finding the window costs no ranking
+                    params["floor"] = con.execute(
+                        f"""
+                        SELECT min(rowid) FROM (
+                            SELECT posts_fts.rowid {where} ORDER BY posts_fts.rowid DESC LIMIT :window
+                        )
+                        """,
+                        {**params, "window": window},
+                    ).fetchone()[0]
+                    if params["floor"] is None:
+                        return []
+                # FTS5 sorts by rank itself, computing snippets only for the rows returned
+                return con.execute(
+                    f"""
+                    SELECT p.id, p.title, p.permalink, p.sentiment, p.label, p.created_utc,
+                           snippet(posts_fts, -1, '<mark>', '</mark>', '…', 16),
+                           posts_fts.rank, posts_fts.rowid, :floor
+                    {where}
+                    AND posts_fts.rowid >= :floor
+                    {page}
+                    ORDER BY posts_fts.rank, posts_fts.rowid
+                    LIMIT :limit
+                    """,
+                    params,
+                ).fetchall()
+            except sqlite3.OperationalError as e:
+                # Malformed MATCH expressions fail with the generic SQLITE_ERROR;
+                # busy/locked databases and the like keep their own codes
+                if e.sqlite_errorcode == sqlite3.SQLITE_ERROR:
+                    raise ValueError(f"Invalid search query: {e}") from None
+                raise
+
+    @staticmethod
+    def _bump_data_version(con: sqlite3.Connection):
+        con.execute("UPDATE meta SET value = value + 1 WHERE key = 'data_version'")
+
+    @_query(rows=None)
+    def get_data_version(self) -> int:
+        """Counter bumped by every committed write batch; lets readers invalidate caches across processes."""
+        with self._connection() as con:
+            row = con.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()
+        return row[0] if row else 0
+
+    @_query()
     def get_daily_counts(self, days: int = 7):
-        """Return sentiment counts per day (last `days`)."""
-        con = sqlite3.connect(self.db_path)
-        cur = con.cursor()
-        cur.execute(
-            f"""
-            SELECT date(created_utc, 'unixepoch')  AS day,
-                   SUM(label='Positive') AS pos,
-                   SUM(label='Neutral')  AS neu,
-                   SUM(label='Negative') AS neg
-            FROM posts
-            WHERE created_utc >= strftime('%s','now','-{days} days')
-            GROUP BY day
-            ORDER BY day DESC
-            """
-        )
-        rows = cur.fetchall()
-        con.close()
-        return rows
+        """Return sentiment counts per day (last `days` calendar days), read from the daily rollup."""
+        with self._connection() as con:
+            cur = con.execute(
+                """
+                SELECT day,
+                       SUM(CASE WHEN label = 'Positive' THEN post_count ELSE 0 END) AS pos,
+                       SUM(CASE WHEN label = 'Neutral'  THEN post_count ELSE 0 END) AS neu,
+                       SUM(CASE WHEN label = 'Negative' THEN post_count ELSE 0 END) AS neg
+                FROM daily_rollup
+                WHERE day >= date('now', '-' || ? || ' days')
+                GROUP BY day
+                ORDER BY day DESC
+                """,
+                (int(days),),
+            )
+            return cur.fetchall()
+
+    @_query()
+    def get_trend(self, start: int, end: int, granularity: str = "day", window: int = 7):
+        """
+        Sentiment per hour, day or week (UTC) for posts created in [start, end), as
+        (bucket start, pos, neu, neg, posts, mean compound, rolling mean posts,
+        rolling mean compound) for every bucket, empty ones included. Rolling values
+        cover the last `window` buckets; the rolling compound is weighted by posts.
+
+        Whole hours are read from the hourly rollup; only the partial hours at
+        either end of the range touch `posts`, through idx_posts_created (so
+        archived posts are only counted in whole hours).
+        """
+        size, offset = TREND_BUCKETS[granularity]
+        first_hour = min(-(-start // 3600) * 3600, end)
+        last_hour = max(end // 3600 * 3600, first_hour)
+        params = {
+            "start": start,
+            "end": end,
+            "first_hour": first_hour,
+            "last_hour": last_hour,
+            "size": size,
+            "offset": offset,
+            "first_bucket": start - (start - offset) % size,
+        }
+        with self._connection() as con:
+            cur = con.execute(
+                f"""
+                WITH RECURSIVE
+                buckets(bucket) AS (
+                    SELECT :first_bucket
+                    UNION ALL
+                    SELECT bucket + :size FROM buckets WHERE bucket + :size < :end
+                ),
+                hours(hour, label, post_count, sentiment_sum, scored_count) AS (
+                    -- Every bucket once with nothing in it, so empty buckets are returned too
+                    SELECT bucket, NULL, 0, 0, 0 FROM buckets
+                    UNION ALL
+                    SELECT hour, label, post_count, sentiment_sum, scored_count
+                    FROM hourly_rollup
+                    WHERE hour >= :first_hour AND hour < :last_hour
+                    UNION ALL
+                    SELECT created_utc - created_utc % 3600, label, 1, ifnull(sentiment, 0), sentiment IS NOT NULL
+                    FROM posts
+                    WHERE created_utc >= :start AND created_utc < :first_hour
+                    UNION ALL
+                    SELECT created_utc - created_utc % 3600, label, 1, ifnull(sentiment, 0), sentiment IS NOT NULL
+                    FROM posts
+                    WHERE created_utc >= :last_hour AND created_utc < :end
+                ),
+                counts AS (
+                    SELECT hour - ((hour - :offset) % :size + :size) % :size AS bucket,
+                           SUM(CASE WHEN label = 'Positive' THEN post_count ELSE 0 END) AS pos,
+                           SUM(CASE WHEN label = 'Neutral'  THEN post_count ELSE 0 END) AS neu,
+                           SUM(CASE WHEN label = 'Negative' THEN post_count ELSE 0 END) AS neg,
+                           SUM(post_count) AS posts,
+                           SUM(sentiment_sum) AS sentiment_sum,
+                           SUM(scored_count) AS scored
+                    FROM hours
+                    GROUP BY 1
+                )
+                SELECT bucket, pos, neu, neg, posts,
+                       sentiment_sum / nullif(scored, 0),
+                       AVG(posts) OVER w,
+                       SUM(sentiment_sum) OVER w / nullif(SUM(scored) OVER w, 0)
+                FROM counts
+                WINDOW w AS (ORDER BY bucket ROWS BETWEEN {max(int(window), 1) - 1} PRECEDING AND CURRENT ROW)
+                ORDER BY bucket
+                """,
+                params,
+            )
+            return cur.fetchall()
+
+    def iter_posts(self, since: int | None = None, until: int | None = None, label: str | None = None,
+                   after_rowid: int = 0, upto_rowid: int | None = None,
+                   chunk_size: int = EXPORT_CHUNK_ROWS) -> Iterator[list[tuple]]:
+        """
+        Stream posts as lists of up to `chunk_size` EXPORT_COLUMNS tuples, oldest first,
+        all from one read snapshot. Filters: `since` <= created_utc < `until` (unix seconds),
+        `label`, and `after_rowid` < rowid <= `upto_rowid`.
+
+        Rows are read with fetchmany along idx_posts_created, so memory stays flat at any
+        table size. Holds a pooled connection until exhausted or closed.
+        """
+        params = {"since": since, "until": until, "label": label, "after": after_rowid, "upto": upto_rowid}
+        filters = ["rowid > :after"]
+        if since is not None:
+            filters.append("created_utc >= :since")
+        if until is not None:
+            filters.append("created_utc < :until")
+        if label is not None:
+            filters.append("label = :label")
+        if upto_rowid is not None:
+            filters.append("rowid <= :upto")
+        # Not wrapped in @_query: a generator returns before any rows are read
+        counted = QUERY_ROWS.labels(method="iter_posts")
+        with self._connection() as con:
+            con.execute("BEGIN")
+            # Walking the created_utc index returns rows already in order; a label or
+            # rowid filter would otherwise choose a plan that sorts every row first
+            columns = (f"inflate({c})" if c in COMPRESSED_COLUMNS else c for c in EXPORT_COLUMNS)
+            cur = con.execute(
+                f"""
+                SELECT {", ".join(columns)}
+                FROM posts INDEXED BY idx_posts_created
+                WHERE {" AND ".join(filters)}
+                ORDER BY created_utc, rowid
+                """,
+                params,
+            )
+            while rows := cur.fetchmany(chunk_size):
+                counted.inc(len(rows))
+                yield rows
+
+    @_query(rows=lambda result: len(result[1]))
+    def get_post_days(self, after_rowid: int = 0) -> tuple[int, list[str]]:
+        """
+        Return the newest post rowid and the UTC days (YYYY-MM-DD) of the posts stored
+        after `after_rowid` up to it. Posts are only ever inserted, so a rowid marks how
+        far an incremental export got.
+        """
+        with self._connection() as con:
+            upto = con.execute("SELECT ifnull(max(rowid), 0) FROM posts").fetchone()[0]
+            cur = con.execute(
+                """
+                SELECT DISTINCT date(created_utc, 'unixepoch')
+                FROM posts
+                WHERE rowid > ? AND rowid <= ?
+                ORDER BY 1
+                """,
+                (after_rowid, upto),
+            )
+            return upto, [day for day, in cur]
 
+    @_query(rows=None)
     def get_sentiment_summary(self):
-        """Return overall sentiment counts."""
-        con = sqlite3.connect(self.db_path)
-        cur = con.cursor()
-        cur.execute(
-            """
-            SELECT
-                   SUM(CASE WHEN label = 'Positive' THEN 1 ELSE 0 END),
-                   SUM(CASE WHEN label = 'Neutral' THEN 1 ELSE 0 END),
-                   SUM(CASE WHEN label = 'Negative' THEN 1 ELSE 0 END),
-                   COUNT(*),
-                   AVG(sentiment)
-            FROM posts
-            """
-        )
-        row = cur.fetchone()
-        con.close()
-        
-        if not row or row[3] == 0:
+        """Return overall sentiment counts, read from the per-label totals."""
+        with self._connection() as con:
+            row = con.execute(
+                """
+                SELECT
+                       SUM(CASE WHEN label = 'Positive' THEN post_count ELSE 0 END),
+                       SUM(CASE WHEN label = 'Neutral' THEN post_count ELSE 0 END),
+                       SUM(CASE WHEN label = 'Negative' THEN post_count ELSE 0 END),
+                       SUM(post_count),
+                       -- Posts without a score are left out, as AVG(sentiment) would
+                       SUM(sentiment_sum) / nullif(SUM(scored_count), 0)
+                FROM label_totals
+                """
+            ).fetchone()
+
+        if not row or not row[3]:
             return {
                 "positive_count": 0,
                 "neutral_count": 0,
@@ -86,7 +662,7 @@ class Storage:
                 "total_count": 0,
                 "average_sentiment": 0,
             }
-        
+
         pos, neu, neg, total, avg_sentiment = row
         return {
             "positive_count": pos,
@@ -96,85 +672,1196 @@ class Storage:
             "average_sentiment": avg_sentiment,
         }
 
-    def get_top_posts(self, label: str, n: int = 5, days: int = 7):
-        """Return the `n` posts with the most extreme sentiment scores for a given label within the last `days`."""
-        con = sqlite3.connect(self.db_path)
-        cur = con.cursor()
+    @_query(rows=None)
+    def verify_rollups(self) -> list[tuple]:
+        """
+        Compare the rollup tables against a full recount of `posts`.
+        Returns (table, key, stored, recounted) for every mismatch.
+        """
+        with self._connection() as con:
+            stored_daily = {
+                (day, label): (count, total, scored)
+                for day, label, count, total, scored in con.execute(
+                    "SELECT day, label, post_count, sentiment_sum, scored_count FROM daily_rollup WHERE post_count != 0"
+                )
+            }
+            fresh_daily = {
+                (day, label): (count, total, scored)
+                for day, label, count, total, scored in con.execute(ROLLUP_RECOUNT_SQL)
+            }
+            stored_totals = {
+                label: (count, total, scored)
+                for label, count, total, scored in con.execute(
+                    "SELECT label, post_count, sentiment_sum, scored_count FROM label_totals WHERE post_count != 0"
+                )
+            }
+            stored_hourly = {
+                (hour, label): (count, total, scored)
+                for hour, label, count, total, scored in con.execute(
+                    "SELECT hour, label, post_count, sentiment_sum, scored_count FROM hourly_rollup WHERE post_count != 0"
+                )
+            }
+            fresh_hourly = {
+                (hour, label): (count, total, scored)
+                for hour, label, count, total, scored in con.execute(HOURLY_RECOUNT_SQL)
+            }
+        fresh_totals = {}
+        for (_, label), (count, total, scored) in fresh_daily.items():
+            prev_count, prev_total, prev_scored = fresh_totals.get(label, (0, 0.0, 0))
+            fresh_totals[label] = (prev_count + count, prev_total + total, prev_scored + scored)
 
-        order = "DESC" if label == "Positive" else "ASC"
+        mismatches = []
+        for table, stored, fresh in (
+            ("daily_rollup", stored_daily, fresh_daily),
+            ("label_totals", stored_totals, fresh_totals),
+            ("hourly_rollup", stored_hourly, fresh_hourly),
+        ):
+            for key in stored.keys() | fresh.keys():
+                a, b = stored.get(key, (0, 0.0, 0)), fresh.get(key, (0, 0.0, 0))
+                if a[0] != b[0] or abs(a[1] - b[1]) > 1e-6 or a[2] != b[2]:
+                    mismatches.append((table, key, a, b))
+        return mismatches
 
-        query = f"""
-            SELECT id, title, body, permalink, sentiment
-            FROM posts
-            WHERE label = ? AND created_utc >= strftime('%s', 'now', ?)
-            ORDER BY sentiment {order}
-            LIMIT ?
-        """
+    @_query(rows=None)
+    def rebuild_rollups(self):
+        """Recompute the rollup tables from `posts` in a single transaction."""
+        with self._connection() as con, con:
+            self._rebuild_rollups(con)
 
-        cur.execute(
-            query,
-            (label, f"-{days} days", n),
+    @staticmethod
+    def _rebuild_rollups(con: sqlite3.Connection):
+        con.execute("DELETE FROM daily_rollup")
+        con.execute("DELETE FROM label_totals")
+        con.execute("DELETE FROM hourly_rollup")
+        con.execute(
+            f"INSERT INTO daily_rollup (day, label, post_count, sentiment_sum, scored_count) {ROLLUP_RECOUNT_SQL}"
+        )
+        con.execute(
+            f"INSERT INTO hourly_rollup (hour, label, post_count, sentiment_sum, scored_count) {HOURLY_RECOUNT_SQL}"
+        )
+        con.execute(
+            """
+            INSERT INTO label_totals (label, post_count, sentiment_sum, scored_count)
+            SELECT label, SUM(post_count), SUM(sentiment_sum), SUM(scored_count)
+            FROM daily_rollup
+            GROUP BY label
+            """
         )
-        rows = cur.fetchall()
-        con.close()
-        return rows
 
+    @_query()
+    def get_top_posts(self, label: str, n: int = 5, days: int = 7, term: str | None = None, dedupe: bool = False):
+        """
+        Return the `n` posts with the most extreme sentiment scores for a given label within the last `days`,
+        optionally only posts that matched keyword `term`. With `dedupe`, near-duplicate posts (same
+        cluster_id) count once, represented by their most extreme member.
+        """
+        order, better = ("DESC", ">") if label == "Positive" else ("ASC", "<")
+        params = {"label": label, "since": f"-{days} days", "term": term, "n": n}
+        # Walking idx_posts_top in sentiment order returns the winners first, and stops
+        # after `n` rows. Without statistics the planner would rather range-scan the window
+        # and sort it; with them it may drive the term filter from the primary key instead.
+        source, term_filter, dedupe_filter = "posts p INDEXED BY idx_posts_top", "", ""
+
+        with self._connection() as con:
+            if term:
+                matches = con.execute(
+                    "SELECT count(*) FROM (SELECT 1 FROM post_terms WHERE term = ? LIMIT ?)", (term, TERM_LIST_MAX)
+                ).fetchone()[0]
+                if matches < TERM_LIST_MAX:
+                    # Few posts to walk past: start from the term's posts and sort those
+                    source = "post_terms t CROSS JOIN posts p ON p.id = t.post_id AND t.term = :term"
+                else:
+                    term_filter = "AND EXISTS (SELECT 1 FROM post_terms WHERE term = :term AND post_id = p.id)"
+            if dedupe:
+                # Skip posts outranked by a near-duplicate in the window, so the walk still
+                # stops after `n` rows; the planner would rather range-scan idx_posts_top
+                dedupe_filter = f"""
+                    AND NOT EXISTS (
+                        SELECT 1 FROM posts m INDEXED BY idx_posts_cluster
+                        WHERE m.cluster_id = p.cluster_id AND m.label = :label
+                          AND m.created_utc >= strftime('%s', 'now', :since)
+                          AND (m.sentiment {better} p.sentiment OR (m.sentiment = p.sentiment AND m.id < p.id))
+                          {"AND EXISTS (SELECT 1 FROM post_terms WHERE term = :term AND post_id = m.id)" if term else ""}
+                    )
+                """
+            query = f"""
+                SELECT p.id, p.title, inflate(p.body), p.permalink, p.sentiment
+                FROM {source}
+                WHERE p.label = :label AND p.created_utc >= strftime('%s', 'now', :since)
+                {term_filter}
+                {dedupe_filter}
+                ORDER BY p.sentiment {order}, p.id
+                LIMIT :n
+            """
+            return con.execute(query, params).fetchall()
+
+    @_query()
+    def get_terms(self) -> list[tuple]:
+        """Return (term, post_count) for every keyword term that matched a stored post."""
+        with self._connection() as con:
+            return con.execute(
+                "SELECT term, COUNT(*) FROM post_terms GROUP BY term ORDER BY COUNT(*) DESC"
+            ).fetchall()
+
+    @_query()
     def get_post_by_id(self, post_id: str):
         """Return a single post by its ID."""
-        con = sqlite3.connect(self.db_path)
-        con.row_factory = sqlite3.Row
-        cur = con.cursor()
-        cur.execute(
-            """
-            SELECT id, title, body, comments, text_summary, comment_summary
-            FROM posts
-            WHERE id = ?
-            """,
-            (post_id,),
+        with self._connection() as con:
+            cur = con.cursor()
+            cur.row_factory = sqlite3.Row
+            cur.execute(
+                """
+                SELECT id, title, inflate(body) AS body, inflate(text_summary) AS text_summary,
+                       inflate(comment_summary) AS comment_summary, cluster_id
+                FROM posts
+                WHERE id = ?
+                """,
+                (post_id,),
+            )
+            return cur.fetchone()
+
+    @_query()
+    def sample_comments(self, post_id: str, n: int = 50, strategy: str = "random") -> list[str]:
+        """
+        Return up to `n` comment bodies for a post, picked in SQL.
+        `strategy` is "random" or "extreme" (strongest sentiment either way first).
+        The random sample is a shuffle seeded by the post ID, so the same comments
+        give the same sample (and the same LLM prompt) every time.
+        """
+        if strategy == "extreme":
+            order, params = "abs(ifnull(sentiment, 0)) DESC, id", (post_id, n)
+        else:
+            # Multiplicative hash of the rowid, offset per post
+            order, params = "(rowid * 2654435761 + ?) % 4294967296", (post_id, zlib.crc32(post_id.encode()), n)
+        with self._connection() as con:
+            cur = con.execute(
+                f"SELECT body FROM comments WHERE post_id = ? ORDER BY {order} LIMIT ?",
+                params,
+            )
+            return [row[0] for row in cur.fetchall()]
+
+    @_query(rows=int)
+    def migrate_comment_blobs(self, batch_size: int = SAVE_BATCH_SIZE) -> int:
+        """
+        Move comments stored in the legacy newline-joined `posts.comments` column
+        into the `comments` table, one line per comment, and clear the column.
+        Migrated comments have no created time, score or sentiment yet.
+        Returns the number of posts migrated.
+        """
+        migrated = 0
+        with self._connection() as con:
+            while True:
+                with con:
+                    rows = con.execute(
+                        "SELECT id, comments FROM posts WHERE comments IS NOT NULL LIMIT ?",
+                        (batch_size,),
+                    ).fetchall()
+                    if not rows:
+                        return migrated
+                    con.executemany(
+                        "INSERT OR IGNORE INTO comments (id, post_id, body) VALUES (?, ?, ?)",
+                        [
+                            (f"{post_id}:{i}", post_id, body)
+                            for post_id, blob in rows
+                            for i, body in enumerate(blob.split("\n"))
+                            if body
+                        ],
+                    )
+                    con.executemany(
+                        "UPDATE posts SET comments = NULL WHERE id = ?",
+                        [(post_id,) for post_id, _ in rows],
+                    )
+                    self._index_posts(con, [post_id for post_id, _ in rows])
+                migrated += len(rows)
+
+    @_query()
+    def get_unscored_comments(self, n: int = SAVE_BATCH_SIZE) -> list[tuple]:
+        """Return up to `n` (id, body) pairs of comments that have no sentiment yet."""
+        with self._connection() as con:
+            return con.execute(
+                "SELECT id, body FROM comments WHERE sentiment IS NULL LIMIT ?",
+                (n,),
+            ).fetchall()
+
+    @_query(rows=None)
+    def update_comment_sentiments(self, scores: list[tuple]):
+        """Store (comment_id, sentiment) pairs."""
+        with self._connection() as con, con:
+            con.executemany(
+                "UPDATE comments SET sentiment = ? WHERE id = ?",
+                [(sentiment, comment_id) for comment_id, sentiment in scores],
+            )
+
+    @_query()
+    def get_analyzer_versions(self) -> dict[str | None, int]:
+        """Return {analyzer_version: number of posts} (None: stored before versions were recorded)."""
+        with self._connection() as con:
+            return dict(con.execute("SELECT analyzer_version, count(*) FROM posts GROUP BY analyzer_version"))
+
+    @_query()
+    def get_stale_posts(self, analyzer_version: str, after_rowid: int = 0, limit: int = SAVE_BATCH_SIZE,
+                        with_text: bool = True, unversioned: bool = True) -> list[tuple]:
+        """
+        Return (rowid, analyzer_version, sentiment, label, title, body) of the first `limit` posts
+        after `after_rowid`, in rowid order, not labelled by `analyzer_version`, including
+        unversioned posts only if `unversioned`. Title and body are None unless `with_text`
+        or the post has no sentiment (it needs scoring whatever the version).
+        """
+        text = "title, inflate(body)" if with_text else (
+            "CASE WHEN sentiment IS NULL THEN title END, CASE WHEN sentiment IS NULL THEN inflate(body) END"
         )
-        row = cur.fetchone()
-        con.close()
-        return row
+        with self._connection() as con:
+            return con.execute(
+                f"""
+                SELECT rowid, analyzer_version, sentiment, label, {text}
+                FROM posts
+                WHERE rowid > ? AND analyzer_version IS NOT ? AND (analyzer_version IS NOT NULL OR ?)
+                ORDER BY rowid
+                LIMIT ?
+                """,
+                (after_rowid, analyzer_version, unversioned, limit),
+            ).fetchall()
 
+    @_query(rows=int)
+    def update_post_sentiments(self, updates: list[tuple[int, float, str, str]]) -> int:
+        """
+        Store (rowid, sentiment, label, analyzer_version) of posts in one transaction. The
+        rollup triggers move posts whose sentiment or label changed; the rest only get
+        their new version. Returns the number of posts whose sentiment or label changed.
+        """
+        with self._connection() as con, con:
+            changed = con.executemany(
+                """
+                UPDATE posts SET sentiment = ?, label = ?, analyzer_version = ?
+                WHERE rowid = ? AND (sentiment IS NOT ? OR label IS NOT ?)
+                """,
+                [(sentiment, label, version, rowid, sentiment, label) for rowid, sentiment, label, version in updates],
+            ).rowcount
+            con.executemany(
+                "UPDATE posts SET analyzer_version = ? WHERE rowid = ? AND analyzer_version IS NOT ?",
+                [(version, rowid, version) for rowid, _, _, version in updates],
+            )
+            if changed:
+                self._bump_data_version(con)
+        return changed
+
+    @_query(rows=None)
     def update_summaries(self, post_id: str, text_summary: str, comment_summary: str):
         """Update the text and comment summaries for a post."""
-        con = sqlite3.connect(self.db_path)
-        cur = con.cursor()
-        cur.execute(
-            """
-            UPDATE posts
-            SET text_summary = ?, comment_summary = ?
-            WHERE id = ?
-            """,
-            (text_summary, comment_summary, post_id),
+        with self._connection() as con, con:
+            con.execute(
+                """
+                UPDATE posts
+                SET text_summary = ?, comment_summary = ?
+                WHERE id = ?
+                """,
+                (_deflate(text_summary), _deflate(comment_summary), post_id),
+            )
+            self._index_posts(con, [post_id])
+
+    @_query()
+    def get_cluster_text_summaries(self, post_ids: list[str]) -> dict[str, str]:
+        """
+        Return {post ID: text summary} for those of `post_ids` that have no text summary
+        of their own while a near-duplicate in their cluster has one.
+        """
+        shared = {}
+        with self._connection() as con:
+            for i in range(0, len(post_ids), 500):
+                chunk = post_ids[i:i + 500]
+                cur = con.execute(
+                    f"""
+                    SELECT p.id,
+                           (SELECT inflate(m.text_summary) FROM posts m
+                            WHERE m.cluster_id = p.cluster_id AND m.text_summary IS NOT NULL
+                            LIMIT 1)
+                    FROM posts p
+                    WHERE p.id IN ({','.join('?' * len(chunk))})
+                      AND p.cluster_id IS NOT NULL AND p.text_summary IS NULL
+                    """,
+                    chunk,
+                )
+                shared.update((post_id, summary) for post_id, summary in cur if summary)
+        return shared
+
+    @_query(rows=int)
+    def enqueue_summaries(self, post_ids: list[str]) -> int:
+        """
+        Queue summary jobs for posts that are still missing a summary.
+        Posts already queued or running are left alone; failed jobs are retried.
+        Returns the number of jobs queued.
+        """
+        if not post_ids:
+            return 0
+        with self._connection() as con, con:
+            cur = con.execute(
+                f"""
+                INSERT INTO summary_jobs (post_id, status, attempts, enqueued_at, updated_at)
+                SELECT id, 'pending', 0, strftime('%s', 'now'), strftime('%s', 'now')
+                FROM posts
+                WHERE id IN ({','.join('?' * len(post_ids))})
+                  AND (text_summary IS NULL OR comment_summary IS NULL)
+                ON CONFLICT(post_id) DO UPDATE SET
+                    status = 'pending',
+                    error = NULL,
+                    enqueued_at = excluded.enqueued_at,
+                    updated_at = excluded.updated_at
+                WHERE status IN ('failed', 'done')
+                """,
+                list(post_ids),
+            )
+            return cur.rowcount
+
+    @_query()
+    def claim_summary_jobs(self, n: int = 1) -> list[str]:
+        """Atomically move up to `n` of the oldest pending summary jobs to running; return their post IDs."""
+        with self._connection() as con, con:
+            rows = con.execute(
+                """
+                UPDATE summary_jobs
+                SET status = 'running', attempts = attempts + 1, updated_at = strftime('%s', 'now')
+                WHERE post_id IN (
+                    SELECT post_id FROM summary_jobs
+                    WHERE status = 'pending'
+                    ORDER BY enqueued_at
+                    LIMIT ?
+                )
+                RETURNING post_id
+                """,
+                (n,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    @_query(rows=None)
+    def finish_summary_job(self, post_id: str, error: str | None = None):
+        """Mark a summary job done, or failed with `error`."""
+        with self._connection() as con, con:
+            con.execute(
+                """
+                UPDATE summary_jobs
+                SET status = ?, error = ?, updated_at = strftime('%s', 'now')
+                WHERE post_id = ?
+                """,
+                ("failed" if error else "done", error, post_id),
+            )
+
+    @_query()
+    def get_summary_job(self, post_id: str):
+        """Return (status, attempts, error) for a post's summary job, or None."""
+        with self._connection() as con:
+            return con.execute(
+                "SELECT status, attempts, error FROM summary_jobs WHERE post_id = ?",
+                (post_id,),
+            ).fetchone()
+
+    @_query(rows=int)
+    def requeue_running_summary_jobs(self) -> int:
+        """Put jobs left running by a crashed worker back in the queue."""
+        with self._connection() as con, con:
+            return con.execute(
+                "UPDATE summary_jobs SET status = 'pending' WHERE status = 'running'"
+            ).rowcount
+
+    @_query(rows=lambda result: len(result[1]))
+    def get_cluster_candidates(self, buckets: list[tuple[int, int]]) -> tuple[dict, dict[str, bytes]]:
+        """
+        Look up LSH (band, bucket) pairs. Returns ({(band, bucket): [cluster IDs]},
+        {cluster ID: MinHash signature}) for every indexed cluster sharing one.
+        """
+        members, signatures = {}, {}
+        unique = list(dict.fromkeys(buckets))
+        with self._connection() as con:
+            for i in range(0, len(unique), 250):
+                chunk = unique[i:i + 250]
+                # Joined from a VALUES list: `(band, bucket) IN (VALUES ...)` would scan the table
+                cur = con.execute(
+                    f"""
+                    WITH wanted(band, bucket) AS (VALUES {','.join(['(?, ?)'] * len(chunk))})
+                    SELECT b.band, b.bucket, c.cluster_id, c.signature
+                    FROM wanted w
+                    JOIN lsh_buckets b ON b.band = w.band AND b.bucket = w.bucket
+                    JOIN clusters c ON c.cluster_id = b.cluster_id
+                    """,
+                    [value for pair in chunk for value in pair],
+                )
+                for band, bucket, cluster_id, signature in cur:
+                    members.setdefault((band, bucket), []).append(cluster_id)
+                    signatures[cluster_id] = signature
+        return members, signatures
+
+    @_query(rows=None)
+    def save_clusters(self, new: list[tuple[str, bytes, int, list[tuple[int, int]]]], grown: dict[str, tuple[int, int]]):
+        """
+        Index `new` clusters, given as (cluster ID, signature, created_utc, LSH buckets),
+        and record members joining existing ones: `grown` maps cluster ID to
+        (posts added, newest created_utc).
+        """
+        with self._connection() as con, con:
+            con.executemany(
+                "INSERT OR IGNORE INTO clusters (cluster_id, signature, size, last_seen) VALUES (?, ?, 1, ?)",
+                [(cluster_id, signature, created) for cluster_id, signature, created, _ in new],
+            )
+            con.executemany(
+                "INSERT OR IGNORE INTO lsh_buckets (band, bucket, cluster_id) VALUES (?, ?, ?)",
+                [(band, bucket, cluster_id) for cluster_id, _, _, buckets in new for band, bucket in buckets],
+            )
+            con.executemany(
+                "UPDATE clusters SET size = size + ?, last_seen = max(last_seen, ?) WHERE cluster_id = ?",
+                [(added, created, cluster_id) for cluster_id, (added, created) in grown.items()],
+            )
+
+    @_query(rows=int)
+    def prune_clusters(self, before: int) -> int:
+        """Drop clusters with no post created since `before` from the LSH index; returns how many."""
+        with self._connection() as con, con:
+            con.execute(
+                """
+                DELETE FROM lsh_buckets
+                WHERE cluster_id IN (SELECT cluster_id FROM clusters WHERE last_seen < ?)
+                """,
+                (before,),
+            )
+            return con.execute("DELETE FROM clusters WHERE last_seen < ?", (before,)).rowcount
+
+    @_query()
+    def get_cluster_sentiments(self, cluster_ids: list[str]) -> dict[str, tuple[float, str, str | None]]:
+        """
+        Return {cluster ID: (sentiment, label, analyzer_version)} of the stored, scored
+        first posts of `cluster_ids`.
+        """
+        found = {}
+        with self._connection() as con:
+            for i in range(0, len(cluster_ids), 500):
+                chunk = cluster_ids[i:i + 500]
+                cur = con.execute(
+                    f"""
+                    SELECT id, sentiment, label, analyzer_version FROM posts
+                    WHERE id IN ({','.join('?' * len(chunk))}) AND sentiment IS NOT NULL
+                    """,
+                    chunk,
+                )
+                found.update((post_id, tuple(scored)) for post_id, *scored in cur)
+        return found
+
+    @_query()
+    def get_post_clusters(self, post_ids: list[str]) -> dict[str, str | None]:
+        """Return {post ID: cluster_id} for the posts of `post_ids` already stored."""
+        found = {}
+        with self._connection() as con:
+            for i in range(0, len(post_ids), 500):
+                chunk = post_ids[i:i + 500]
+                found.update(con.execute(
+                    f"SELECT id, cluster_id FROM posts WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ))
+        return found
+
+    @_query()
+    def get_unclustered_posts(self, after: tuple[int, int] = (0, 0), limit: int = SAVE_BATCH_SIZE) -> list[tuple]:
+        """
+        Return up to `limit` posts without a cluster_id as (created_utc, rowid, id, title, body),
+        oldest first. Pass the last row's (created_utc, rowid) as `after` for the next page.
+        """
+        with self._connection() as con:
+            return con.execute(
+                """
+                SELECT created_utc, rowid, id, title, inflate(body)
+                FROM posts INDEXED BY idx_posts_created
+                WHERE (created_utc, rowid) > (?, ?) AND cluster_id IS NULL
+                ORDER BY created_utc, rowid
+                LIMIT ?
+                """,
+                (*after, limit),
+            ).fetchall()
+
+    @_query(rows=None)
+    def set_post_clusters(self, assignments: dict[str, str]):
+        """Record the cluster of already stored posts ({post ID: cluster ID})."""
+        with self._connection() as con, con:
+            con.executemany(
+                "UPDATE posts SET cluster_id = ? WHERE id = ?",
+                [(cluster_id, post_id) for post_id, cluster_id in assignments.items()],
+            )
+
+    @_query()
+    def get_cached_scores(self, keys: list[str]) -> dict[str, float]:
+        """Return cached compound scores for the given content keys."""
+        found = {}
+        with self._connection() as con:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                cur = con.execute(
+                    f"SELECT key, compound FROM score_cache WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                found.update(cur.fetchall())
+        return found
+
+    @_query(rows=None)
+    def save_cached_scores(self, scores: dict[str, float]):
+        """Persist compound scores keyed by content hash."""
+        with self._connection() as con, con:
+            con.executemany(
+                "INSERT OR REPLACE INTO score_cache (key, compound) VALUES (?, ?)",
+                scores.items(),
+            )
+
+    @_query()
+    def get_llm_responses(self, keys: list[str], max_age: float | None = None) -> dict[str, str]:
+        """
+        Return cached LLM responses for the given keys, skipping entries older
+        than `max_age` seconds, and mark the ones found as just used.
+        """
+        found = {}
+        now = int(time.time())
+        oldest = now - max_age if max_age is not None else 0
+        with self._connection() as con, con:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                cur = con.execute(
+                    f"SELECT key, response FROM llm_cache WHERE key IN ({','.join('?' * len(chunk))}) AND created_at >= ?",
+                    [*chunk, oldest],
+                )
+                found.update(cur.fetchall())
+            con.executemany("UPDATE llm_cache SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+        return found
+
+    @_query(rows=None)
+    def save_llm_responses(self, responses: list[tuple[str, str, str]]):
+        """Persist (key, kind, response) LLM responses, replacing older entries with the same key."""
+        now = int(time.time())
+        with self._connection() as con, con:
+            con.executemany(
+                """
+                INSERT INTO llm_cache (key, kind, response, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    response = excluded.response,
+                    created_at = excluded.created_at,
+                    last_used = excluded.last_used
+                """,
+                [(key, kind, response, now, now) for key, kind, response in responses],
+            )
+
+    @_query(rows=int)
+    def evict_llm_cache(self, max_entries: int, max_age: float | None = None) -> int:
+        """
+        Delete LLM cache entries older than `max_age` seconds, then the least
+        recently used ones beyond `max_entries`. Returns the number deleted.
+        """
+        with self._connection() as con, con:
+            deleted = 0
+            if max_age is not None:
+                deleted += con.execute(
+                    "DELETE FROM llm_cache WHERE created_at < ?", (int(time.time() - max_age),)
+                ).rowcount
+            deleted += con.execute(
+                """
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (max_entries,),
+            ).rowcount
+        return deleted
+
+    @_query(rows=lambda checkpoint: len(checkpoint["seen"]) if checkpoint else 0)
+    def get_checkpoint(self, subreddit: str, active_since: int):
+        """
+        Return the ingestion checkpoint for `subreddit`, or None before the first run.
+        `seen` maps post IDs created at or after `active_since` (or the newest
+        checkpointed post, whichever is older) to their (num_comments, edited) state.
+        """
+        with self._connection() as con:
+            row = con.execute(
+                "SELECT newest_created_utc FROM checkpoints WHERE subreddit = ?",
+                (subreddit,),
+            ).fetchone()
+            if not row:
+                return None
+
+            newest = row[0]
+            cur = con.execute(
+                """
+                SELECT post_id, num_comments, edited
+                FROM seen_posts
+                WHERE subreddit = ? AND created_utc >= ?
+                """,
+                (subreddit, min(newest, active_since)),
+            )
+            seen = {post_id: (num_comments, edited) for post_id, num_comments, edited in cur.fetchall()}
+        return {"newest_created_utc": newest, "seen": seen}
+
+    @_query(rows=None)
+    def save_checkpoint(self, subreddit: str, newest_created_utc: int | None, records: list[dict]):
+        """
+        Remember the state of `records` and, unless `newest_created_utc` is None,
+        advance the checkpoint for `subreddit`.
+        """
+        with self._connection() as con, con:
+            if newest_created_utc is not None:
+                con.execute(
+                    """
+                    INSERT INTO checkpoints (subreddit, newest_created_utc, updated_at)
+                    VALUES (?, ?, strftime('%s', 'now'))
+                    ON CONFLICT(subreddit) DO UPDATE SET
+                        newest_created_utc = max(newest_created_utc, excluded.newest_created_utc),
+                        updated_at = excluded.updated_at
+                    """,
+                    (subreddit, int(newest_created_utc)),
+                )
+            con.executemany(
+                """
+                INSERT OR REPLACE INTO seen_posts (post_id, subreddit, created_utc, num_comments, edited)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [
+                    (r["id"], subreddit, int(r["created_utc"]), r["num_comments"], int(r["edited"] or 0))
+                    for r in records
+                ],
+            )
+
+    @_query(rows=None)
+    def start_ingestion_run(self, subreddit: str, scheduled_at: int, missed_intervals: int = 0) -> int:
+        """Record the start of an ingestion run for the interval starting at `scheduled_at`; return its ID."""
+        with self._connection() as con, con:
+            cur = con.execute(
+                """
+                INSERT INTO ingestion_runs (subreddit, scheduled_at, started_at, status, missed_intervals)
+                VALUES (?, ?, strftime('%s', 'now'), 'running', ?)
+                """,
+                (subreddit, int(scheduled_at), missed_intervals),
+            )
+            return cur.lastrowid
+
+    @_query(rows=None)
+    def finish_ingestion_run(self, run_id: int, new_posts: int = 0, refreshed_posts: int = 0,
+                             error: str | None = None):
+        """Mark an ingestion run done, or failed with `error`."""
+        with self._connection() as con, con:
+            con.execute(
+                """
+                UPDATE ingestion_runs
+                SET status = ?, finished_at = strftime('%s', 'now'),
+                    new_posts = ?, refreshed_posts = ?, error = ?
+                WHERE id = ?
+                """,
+                ("failed" if error else "done", new_posts, refreshed_posts, error, run_id),
+            )
+
+    @_query()
+    def get_ingestion_state(self, subreddit: str) -> tuple:
+        """
+        Return (scheduled_at of the last successful run, started_at of the last
+        run of any outcome) for `subreddit`; either is None if there is no such run.
+        """
+        with self._connection() as con:
+            return con.execute(
+                """
+                SELECT (SELECT MAX(scheduled_at) FROM ingestion_runs WHERE subreddit = ? AND status = 'done'),
+                       (SELECT MAX(started_at) FROM ingestion_runs WHERE subreddit = ?)
+                """,
+                (subreddit, subreddit),
+            ).fetchone()
+
+    @_query()
+    def get_ingestion_runs(self, n: int = 20):
+        """Return the `n` most recent ingestion runs, newest first."""
+        with self._connection() as con:
+            return con.execute(
+                """
+                SELECT id, subreddit, scheduled_at, started_at, finished_at, status,
+                       missed_intervals, new_posts, refreshed_posts, error
+                FROM ingestion_runs
+                ORDER BY id DESC
+                LIMIT ?
+                """,
+                (n,),
+            ).fetchall()
+
+    @_query(rows=int)
+    def fail_running_ingestion_runs(self) -> int:
+        """Mark runs left running by a crashed scheduler as failed."""
+        with self._connection() as con, con:
+            return con.execute(
+                """
+                UPDATE ingestion_runs
+                SET status = 'failed', error = 'interrupted', finished_at = strftime('%s', 'now')
+                WHERE status = 'running'
+                """
+            ).rowcount
+
+    @_query(rows=int)
+    def archive_posts(self, before: int, archive_path: Path | str = ARCHIVE_DB_PATH,
+                      batch_size: int = SAVE_BATCH_SIZE) -> int:
+        """
+        Move posts created before `before` (unix seconds) and their comments to the
+        archive database as zlib-compressed JSON records, `batch_size` posts per
+        transaction. Their counts stay in the rollups (via `archived_rollup`); their
+        search rows, keyword terms, summary jobs and ingestion state are dropped.
+        Returns the number of posts archived.
+        """
+        archive_path = Path(archive_path)
+        archive_path.parent.mkdir(parents=True, exist_ok=True)
+        archived = 0
+        with self._connection() as con:
+            con.execute("ATTACH DATABASE ? AS archive", (str(archive_path),))
+            try:
+                with con:
+                    con.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS archive.archived_posts (
+                            id           TEXT PRIMARY KEY,
+                            subreddit    TEXT,
+                            created_utc  INTEGER,
+                            label        TEXT,
+                            sentiment    REAL,
+                            archived_at  INTEGER,
+                            record       BLOB
+                        )
+                        """
+                    )
+                    con.execute(
+                        "CREATE INDEX IF NOT EXISTS archive.idx_archived_posts_created ON archived_posts(created_utc)"
+                    )
+                    # From now on saves skip posts this old, so re-fetching one cannot count it twice
+                    con.execute("UPDATE meta SET value = max(value, ?) WHERE key = 'archived_before'", (int(before),))
+                while True:
+                    with con:
+                        rows = con.execute(
+                            """
+                            SELECT rowid, id, subreddit, created_utc, label, sentiment, cluster_id, title,
+                                   inflate(body), permalink, inflate(text_summary), inflate(comment_summary)
+                            FROM posts
+                            WHERE created_utc < ?
+                              -- Incremental exports resume after the newest rowid, and SQLite
+                              -- would hand that rowid out again if its post were deleted
+                              AND rowid < (SELECT max(rowid) FROM posts)
+                            ORDER BY created_utc
+                            LIMIT ?
+                            """,
+                            (int(before), batch_size),
+                        ).fetchall()
+                        if not rows:
+                            break
+                        rowids = [row[0] for row in rows]
+                        ids = [row[1] for row in rows]
+                        placeholders = ",".join("?" * len(rows))
+                        comments = {}
+                        for post_id, *comment in con.execute(
+                            f"""
+                            SELECT post_id, id, body, created_utc, score, sentiment
+                            FROM comments
+                            WHERE post_id IN ({placeholders})
+                            """,
+                            ids,
+                        ):
+                            comments.setdefault(post_id, []).append(
+                                dict(zip(("id", "body", "created_utc", "score", "sentiment"), comment))
+                            )
+                        con.executemany(
+                            """
+                            INSERT OR REPLACE INTO archive.archived_posts
+                            (id, subreddit, created_utc, label, sentiment, archived_at, record)
+                            VALUES (?, ?, ?, ?, ?, strftime('%s', 'now'), ?)
+                            """,
+                            [
+                                (post_id, subreddit, created, label, sentiment, zlib.compress(json.dumps({
+                                    "id": post_id, "subreddit": subreddit, "created_utc": created, "label": label,
+                                    "sentiment": sentiment, "cluster_id": cluster_id, "title": title, "body": body,
+                                    "permalink": permalink, "text_summary": text_summary,
+                                    "comment_summary": comment_summary, "comments": comments.get(post_id, []),
+                                }, ensure_ascii=False).encode("utf-8")))
+                                for _, post_id, subreddit, created, label, sentiment, cluster_id, title, body,
+                                permalink, text_summary, comment_summary in rows
+                            ],
+                        )
+                        con.execute(
+                            f"""
+                            INSERT INTO archived_rollup (hour, label, post_count, sentiment_sum, scored_count)
+                            SELECT created_utc - created_utc % 3600, label, COUNT(*), TOTAL(sentiment), COUNT(sentiment)
+                            FROM posts
+                            WHERE rowid IN ({placeholders})
+                            GROUP BY 1, 2
+                            ON CONFLICT(hour, label) DO UPDATE SET
+                                post_count = post_count + excluded.post_count,
+                                sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+                                scored_count = scored_count + excluded.scored_count
+                            """,
+                            rowids,
+                        )
+                        con.execute(f"DELETE FROM posts_fts WHERE rowid IN ({placeholders})", rowids)
+                        con.execute(f"DELETE FROM comments WHERE post_id IN ({placeholders})", ids)
+                        con.execute(f"DELETE FROM summary_jobs WHERE post_id IN ({placeholders})", ids)
+                        # No delete trigger on posts: the rollups keep these posts' counts
+                        con.execute(f"DELETE FROM posts WHERE rowid IN ({placeholders})", rowids)
+                        self._bump_data_version(con)
+                    archived += len(rows)
+                # post_terms is keyed by term first, so its orphans are cleared in one pass
+                with con:
+                    con.execute("DELETE FROM post_terms WHERE post_id NOT IN (SELECT id FROM posts)")
+                    con.execute("DELETE FROM seen_posts WHERE created_utc < ?", (int(before),))
+            finally:
+                con.execute("DETACH DATABASE archive")
+        return archived
+
+    @_query()
+    def get_archived_post(self, post_id: str, archive_path: Path | str = ARCHIVE_DB_PATH) -> dict | None:
+        """Return an archived post, with its comments, as the dict archive_posts stored, or None."""
+        archive_path = Path(archive_path)
+        if not archive_path.exists():
+            return None
+        con = sqlite3.connect(f"{archive_path.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            row = con.execute("SELECT record FROM archived_posts WHERE id = ?", (post_id,)).fetchone()
+        finally:
+            con.close()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    @_query(rows=int)
+    def compress_posts(self, batch_size: int = SAVE_BATCH_SIZE) -> int:
+        """
+        Compress the bodies and summaries of posts stored before compression was enabled
+        (or under a higher COMPRESS_MIN_BYTES), `batch_size` posts per transaction.
+        Returns the number of posts rewritten.
+        """
+        if not COMPRESS_MIN_BYTES:
+            return 0
+        large = " OR ".join(
+            f"(typeof({c}) = 'text' AND length(CAST({c} AS BLOB)) >= :min_bytes)" for c in COMPRESSED_COLUMNS
         )
-        con.commit()
-        con.close()
+        compressed, after = 0, 0
+        with self._connection() as con:
+            while True:
+                with con:
+                    rows = con.execute(
+                        f"""
+                        SELECT rowid, {", ".join(COMPRESSED_COLUMNS)}
+                        FROM posts
+                        WHERE rowid > :after AND ({large})
+                        ORDER BY rowid
+                        LIMIT :limit
+                        """,
+                        {"after": after, "min_bytes": COMPRESS_MIN_BYTES, "limit": batch_size},
+                    ).fetchall()
+                    if not rows:
+                        return compressed
+                    # The text is unchanged, so neither the rollups nor the search index need updating
+                    con.executemany(
+                        f"UPDATE posts SET {', '.join(f'{c} = ?' for c in COMPRESSED_COLUMNS)} WHERE rowid = ?",
+                        [(*(_deflate(value) for value in values), rowid) for rowid, *values in rows],
+                    )
+                compressed += len(rows)
+                after = rows[-1][0]
+
+    @_query(rows=None)
+    def optimize(self) -> dict:
+        """
+        Merge the search index (dropping the entries of deleted posts), hand free pages
+        back to the filesystem with an incremental vacuum and refresh the query planner's
+        statistics (ANALYZE). A database created before incremental auto-vacuum is
+        converted first by one full VACUUM, which may renumber post rowids; the search
+        index is then rebuilt. Returns what was done.
+        """
+        converted = rowids_changed = False
+        with self._connection() as con:
+            if con.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                fingerprint = "SELECT count(*), total(rowid), ifnull(max(rowid), 0) FROM posts"
+                before = con.execute(fingerprint).fetchone()
+                con.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                con.execute("VACUUM")
+                converted = True
+                # Rowids are renumbered in order, so an unchanged count, sum and max means none moved
+                rowids_changed = con.execute(fingerprint).fetchone() != before
+        if rowids_changed:
+            self.rebuild_search_index()
+        with self._connection() as con:
+            with con:
+                con.execute("INSERT INTO posts_fts (posts_fts) VALUES ('optimize')")
+            free_pages = con.execute("PRAGMA freelist_count").fetchone()[0]
+            # Each step of the pragma frees one page, and execute() only takes the first step
+            con.executescript("PRAGMA incremental_vacuum")
+            # The file only shrinks once the WAL is checkpointed
+            con.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+            # Sample at most this many index entries per index, so ANALYZE stays fast on large tables
+            con.execute("PRAGMA analysis_limit = 1000")
+            con.execute("ANALYZE")
+        return {"converted": converted, "rowids_changed": rowids_changed, "freed_pages": free_pages}
 
     def _init_db(self):
-        """Create the DB + table if needed, and add summary columns if missing."""
-        con = sqlite3.connect(self.db_path)
-        cur = con.cursor()
+        """Create the DB + tables if needed, switch it to WAL, and add the subreddit column if missing."""
+        with self._connection() as con, con:
+            # Only takes effect on a new, empty database: lets `manage.py maintain` hand pages freed
+            # by archiving back to the filesystem without a full VACUUM
+            con.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            # WAL lets API readers keep going while ingestion writes; the mode is stored in the file
+            con.execute("PRAGMA journal_mode = WAL")
 
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS posts (
-                id               TEXT PRIMARY KEY,
-                title            TEXT,
-                body             TEXT,
-                comments         TEXT,
-                created_utc      INTEGER,
-                permalink        TEXT,
-                sentiment        REAL,
-                label            TEXT,
-                text_summary     TEXT,
-                comment_summary  TEXT
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS posts (
+                    id               TEXT PRIMARY KEY,
+                    title            TEXT,
+                    body             TEXT,
+                    comments         TEXT,
+                    created_utc      INTEGER,
+                    permalink        TEXT,
+                    sentiment        REAL,
+                    label            TEXT,
+                    text_summary     TEXT,
+                    comment_summary  TEXT,
+                    subreddit        TEXT,
+                    cluster_id       TEXT
+                )
+                """
+            )
+            columns = {row[1] for row in con.execute("PRAGMA table_info(posts)")}
+            if "subreddit" not in columns:
+                # Databases from before multi-subreddit ingestion: recover the
+                # source from the permalink ("https://reddit.com/r/<name>/comments/...")
+                con.execute("ALTER TABLE posts ADD COLUMN subreddit TEXT")
+                con.execute(
+                    """
+                    UPDATE posts
+                    SET subreddit = substr(
+                        substr(permalink, instr(permalink, '/r/') + 3), 1,
+                        instr(substr(permalink, instr(permalink, '/r/') + 3), '/') - 1
+                    )
+                    WHERE instr(permalink, '/r/') > 0
+                    """
+                )
+            if "cluster_id" not in columns:
+                # Posts stored before near-duplicate detection stay unclustered (NULL)
+                # until `manage.py cluster` assigns them
+                con.execute("ALTER TABLE posts ADD COLUMN cluster_id TEXT")
+
+            con.execute("CREATE INDEX IF NOT EXISTS idx_posts_created ON posts(created_utc)")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_posts_cluster ON posts(cluster_id)")
+
+            # Near-duplicate clusters (dedup.DuplicateIndex): the MinHash signature of
+            # each cluster's first post, and its LSH band buckets. Clusters idle for
+            # longer than DEDUP_WINDOW_DAYS leave the index; posts keep their cluster_id.
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS clusters (
+                    cluster_id  TEXT PRIMARY KEY,
+                    signature   BLOB NOT NULL,
+                    size        INTEGER NOT NULL DEFAULT 1,
+                    last_seen   INTEGER NOT NULL
+                )
+                """
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_clusters_last_seen ON clusters(last_seen)")
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS lsh_buckets (
+                    band        INTEGER,
+                    bucket      INTEGER,
+                    cluster_id  TEXT,
+                    PRIMARY KEY (band, bucket, cluster_id)
+                ) WITHOUT ROWID
+                """
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_lsh_buckets_cluster ON lsh_buckets(cluster_id)")
+
+            # One row per comment; posts.comments only holds un-migrated legacy blobs
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS comments (
+                    id           TEXT PRIMARY KEY,
+                    post_id      TEXT NOT NULL,
+                    body         TEXT,
+                    created_utc  INTEGER,
+                    score        INTEGER,
+                    sentiment    REAL
+                )
+                """
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_comments_post ON comments(post_id)")
+
+            # Full-text index over each post's title, body, comments and summaries;
+            # rowid = posts.rowid. Rows are rebuilt by _index_posts on every write, and
+            # wholesale by rebuild_search_index (needed after VACUUM renumbers rowids).
+            has_search = con.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts'"
+            ).fetchone()
+            con.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+                    title, body, comments, summaries,
+                    tokenize = 'porter unicode61 remove_diacritics 2'
+                )
+                """
+            )
+            con.execute(f"INSERT INTO posts_fts (posts_fts, rank) VALUES ('rank', '{SEARCH_RANK}')")
+
+            # Keyword terms each post matched at ingestion
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS post_terms (
+                    term     TEXT,
+                    post_id  TEXT,
+                    PRIMARY KEY (term, post_id)
+                ) WITHOUT ROWID
+                """
+            )
+
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS meta (
+                    key    TEXT PRIMARY KEY,
+                    value  INTEGER NOT NULL
+                )
+                """
+            )
+            con.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0)")
+            # Posts created before this were moved to the archive (archive_posts)
+            con.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('archived_before', 0)")
+
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS score_cache (
+                    key       TEXT PRIMARY KEY,
+                    compound  REAL NOT NULL
+                ) WITHOUT ROWID
+                """
             )
-            """
-        )
 
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_created ON posts(created_utc)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_label   ON posts(label)")
-        
-        con.commit()
-        con.close()
\ No newline at end of file
+            # LLM responses keyed by model, prompt version and input (llm_cache.LLMCache)
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key         TEXT PRIMARY KEY,
+                    kind        TEXT NOT NULL,
+                    response    TEXT NOT NULL,
+                    created_at  INTEGER NOT NULL,
+                    last_used   INTEGER NOT NULL
+                )
+                """
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used)")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created_at ON llm_cache(created_at)")
+
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    subreddit           TEXT PRIMARY KEY,
+                    newest_created_utc  INTEGER,
+                    updated_at          INTEGER
+                )
+                """
+            )
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS seen_posts (
+                    post_id       TEXT PRIMARY KEY,
+                    subreddit     TEXT,
+                    created_utc   INTEGER,
+                    num_comments  INTEGER,
+                    edited        INTEGER
+                )
+                """
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_seen_subreddit_created ON seen_posts(subreddit, created_utc)")
+
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS summary_jobs (
+                    post_id      TEXT PRIMARY KEY,
+                    status       TEXT NOT NULL,
+                    attempts     INTEGER NOT NULL DEFAULT 0,
+                    error        TEXT,
+                    enqueued_at  INTEGER,
+                    updated_at   INTEGER
+                )
+                """
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_summary_jobs_status ON summary_jobs(status, enqueued_at)")
+
+            # One row per scheduled ingestion of a subreddit (see scheduler.py)
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ingestion_runs (
+                    id                INTEGER PRIMARY KEY,
+                    subreddit         TEXT NOT NULL,
+                    scheduled_at      INTEGER NOT NULL,
+                    started_at        INTEGER NOT NULL,
+                    finished_at       INTEGER,
+                    status            TEXT NOT NULL,
+                    missed_intervals  INTEGER NOT NULL DEFAULT 0,
+                    new_posts         INTEGER,
+                    refreshed_posts   INTEGER,
+                    error             TEXT
+                )
+                """
+            )
+            con.execute(
+                "CREATE INDEX IF NOT EXISTS idx_ingestion_runs_subreddit ON ingestion_runs(subreddit, status, scheduled_at)"
+            )
+
+            # Materialized aggregates behind get_daily_counts / get_sentiment_summary
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS daily_rollup (
+                    day            TEXT,
+                    label          TEXT,
+                    post_count     INTEGER NOT NULL DEFAULT 0,
+                    sentiment_sum  REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, label)
+                ) WITHOUT ROWID
+                """
+            )
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS label_totals (
+                    label          TEXT PRIMARY KEY,
+                    post_count     INTEGER NOT NULL DEFAULT 0,
+                    sentiment_sum  REAL NOT NULL DEFAULT 0
+                ) WITHOUT ROWID
+                """
+            )
+            # Posts per UTC hour (epoch seconds of its start) and label, behind get_trend
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS hourly_rollup (
+                    hour           INTEGER,
+                    label          TEXT,
+                    post_count     INTEGER NOT NULL DEFAULT 0,
+                    sentiment_sum  REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (hour, label)
+                ) WITHOUT ROWID
+                """
+            )
+            # Counts of archived posts per UTC hour and label: the rollups keep them, and
+            # full recounts add them back
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS archived_rollup (
+                    hour           INTEGER,
+                    label          TEXT,
+                    post_count     INTEGER NOT NULL DEFAULT 0,
+                    sentiment_sum  REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (hour, label)
+                ) WITHOUT ROWID
+                """
+            )
+            # Read inside the write transaction, so concurrent starts apply each step once.
+            # Applied before the triggers are created, so a step may replace them
+            version = con.execute("PRAGMA user_version").fetchone()[0]
+            for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+                for statement in statements:
+                    con.execute(statement)
+                con.execute(f"PRAGMA user_version = {number}")
+
+            has_triggers, has_hourly = (
+                con.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)).fetchone()
+                for name in ("trg_posts_rollup_insert", "trg_posts_hourly_insert")
+            )
+            for trigger in ROLLUP_TRIGGERS:
+                con.execute(trigger)
+            if not has_triggers or not has_hourly:
+                # Existing databases: seed the rollups from the posts already stored
+                self._rebuild_rollups(con)
+            if not has_search:
+                # Existing databases: index the posts already stored
+                con.execute(SEARCH_DOCUMENT_SQL)
@@ -0,0 +1,211 @@
+"""
+Background summarization worker pool.
+
+Summary jobs live in the `summary_jobs` table, so any process can queue
+them (the API on a cache miss, ingestion for new top posts) and any worker
+can claim them. Within a process, concurrent requests for the same post
+share a single job and a single future (single-flight).
+
+Workers claim up to LLM_BATCH_SIZE jobs at a time and summarize those posts
+in one batched LLM call; every LLM response goes through the `llm_cache`
+table, so identical prompts are only paid for once, and near-duplicate posts
+(same cluster_id) share one text summary.
+
+Run standalone (from src/):
+    python summary_worker.py
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from llm_cache import LLMCache
+from metrics import REGISTRY, serve_metrics, timed
+from storage import Storage
+from text_summarizer import LLM_BATCH_SIZE, summarize_comments, summarize_post, summarize_posts
+
+# Threads generating summaries
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "2"))
+# Seconds an idle worker waits before polling the queue again
+SUMMARY_POLL_INTERVAL = float(os.getenv("SUMMARY_POLL_INTERVAL", "2"))
+# Comments sent to the LLM per post, and how they are picked ("random" or "extreme")
+COMMENT_SAMPLE_SIZE = int(os.getenv("COMMENT_SAMPLE_SIZE", "50"))
+COMMENT_SAMPLE_STRATEGY = os.getenv("COMMENT_SAMPLE_STRATEGY", "random")
+
+SUMMARY_SECONDS = REGISTRY.histogram(
+    "summary_generation_duration_seconds", "Time to generate a post's missing summaries (all LLM calls)"
+)
+SUMMARY_JOBS = REGISTRY.counter("summary_jobs_total", "Summary jobs processed by outcome", ["outcome"])
+
+
+@timed(SUMMARY_SECONDS)
+def generate_summaries(post, comments_list: list[str], cache: LLMCache | None = None) -> tuple[str, str]:
+    """Generate whichever of the post's two summaries is missing."""
+    text_summary = post["text_summary"]
+    comment_summary = post["comment_summary"]
+
+    if not text_summary:
+        text_summary = summarize_post(post["title"], post["body"], cache=cache)
+
+    if not comment_summary:
+        # In case there are no comments
+        if not comments_list:
+            comment_summary = "No comments to summarize."
+        else:
+            comment_summary = summarize_comments(comments_list, cache=cache)
+
+    return text_summary, comment_summary
+
+
+class SummaryWorker:
+    def __init__(self, store: Storage, workers: int = SUMMARY_WORKERS,
+                 poll_interval: float = SUMMARY_POLL_INTERVAL, batch_size: int = LLM_BATCH_SIZE):
+        self.store = store
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.batch_size = max(1, batch_size)
+        self.cache = LLMCache(store)
+        self._futures: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self):
+        """Start the worker threads, first re-queueing jobs a crashed worker left running."""
+        self.store.requeue_running_summary_jobs()
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"summary-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float | None = None):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def submit(self, post_id: str) -> Future:
+        """
+        Queue a summary job for `post_id` and return a future resolving to
+        (text_summary, comment_summary). Concurrent callers share one future.
+        """
+        with self._lock:
+            future = self._futures.get(post_id)
+            created = future is None
+            if created:
+                future = self._futures[post_id] = Future()
+        if created and self.store.enqueue_summaries([post_id]):
+            self._wake.set()
+            return future
+        # Nothing was queued, or a caller is already waiting: the job may be
+        # running in another process, which never resolves this one's futures
+        self._settle(post_id, future)
+        return future
+
+    def _settle(self, post_id: str, future: Future):
+        """Resolve `future` from the database unless the post's job is still pending or running."""
+        job = self.store.get_summary_job(post_id)
+        if job is not None and job[0] in ("pending", "running"):
+            return
+        post = self.store.get_post_by_id(post_id)
+        if post is None:
+            self._resolve(post_id, future, LookupError(f"Post {post_id} not found"))
+        elif job is not None and job[0] == "failed" and not (post["text_summary"] and post["comment_summary"]):
+            self._resolve(post_id, future, RuntimeError(job[2] or "summary job failed"))
+        else:
+            self._resolve(post_id, future, (post["text_summary"], post["comment_summary"]))
+
+    def _resolve(self, post_id: str, future: Future, result):
+        """Forget `future` and set its result (or exception), unless another thread already did."""
+        with self._lock:
+            if self._futures.get(post_id) is future:
+                del self._futures[post_id]
+            if future.done():
+                return
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _future_for(self, post_id: str) -> Future:
+        with self._lock:
+            return self._futures.setdefault(post_id, Future())
+
+    def _run(self):
+        while not self._stop.is_set():
+            post_ids = self.store.claim_summary_jobs(self.batch_size)
+            if not post_ids:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._process_batch(post_ids)
+
+    def _process_batch(self, post_ids: list[str]):
+        # Near-duplicates share a text summary: reuse one a cluster-mate already
+        # has, and ask the LLM once per cluster. One LLM call covers the post
+        # summaries of the whole batch; posts it misses are summarized on their
+        # own by _process
+        text_summaries = {}
+        try:
+            text_summaries = self.store.get_cluster_text_summaries(post_ids)
+            posts = [self.store.get_post_by_id(post_id) for post_id in post_ids]
+            pending = [
+                post for post in posts
+                if post is not None and not post["text_summary"] and post["id"] not in text_summaries
+            ]
+            leaders = {}
+            for post in pending:
+                leaders.setdefault(post["cluster_id"] or post["id"], post)
+            if len(pending) > 1:
+                fresh = summarize_posts(list(leaders.values()), cache=self.cache)
+                for post in pending:
+                    leader = leaders[post["cluster_id"] or post["id"]]["id"]
+                    if leader in fresh:
+                        text_summaries[post["id"]] = fresh[leader]
+        except Exception as e:
+            print(f"Batched summarization failed; summarizing posts one by one: {e!r}")
+        for post_id in post_ids:
+            self._process(post_id, text_summaries.get(post_id))
+
+    def _process(self, post_id: str, text_summary: str | None = None):
+        future = self._future_for(post_id)
+        try:
+            post = self.store.get_post_by_id(post_id)
+            if post is None:
+                raise LookupError(f"Post {post_id} not found")
+            if text_summary and not post["text_summary"]:
+                post = {**dict(post), "text_summary": text_summary}
+            comments = []
+            if not post["comment_summary"]:
+                comments = self.store.sample_comments(post_id, COMMENT_SAMPLE_SIZE, COMMENT_SAMPLE_STRATEGY)
+            text_summary, comment_summary = generate_summaries(post, comments, cache=self.cache)
+            self.store.update_summaries(post_id, text_summary, comment_summary)
+        except Exception as e:
+            self.store.finish_summary_job(post_id, error=str(e) or type(e).__name__)
+            SUMMARY_JOBS.labels(outcome="failed").inc()
+            result = e
+        else:
+            self.store.finish_summary_job(post_id)
+            SUMMARY_JOBS.labels(outcome="done").inc()
+            result = (text_summary, comment_summary)
+
+        self._resolve(post_id, future, result)
+
+
+if __name__ == "__main__":
+    serve_metrics()
+    store = Storage()
+    worker = SummaryWorker(store)
+    worker.start()
+    print(f"Summarization worker running with {worker.workers} threads (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.stop()
+        store.close()
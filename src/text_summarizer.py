@@ -1,40 +1,240 @@
-import google.generativeai as genai
+import hashlib
+import json
 import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import os
+from llm_cache import LLMCache
+from metrics import REGISTRY
 
 # Set up Gemini API key and load model
 load_dotenv()
-# API_KEY = os.getenv("GOOGLE_API_KEY")
-# genai.configure(api_key=API_KEY)
-# model = genai.GenerativeModel("gemini-2.0-flash")
+# "stub" selects a local deterministic model that never calls the network
+SUMMARIZER_MODEL = os.getenv("SUMMARIZER_MODEL", "gemini-2.0-flash")
+# Simulated per-call latency of the stub model, in seconds
+STUB_MODEL_LATENCY = float(os.getenv("STUB_MODEL_LATENCY", "0"))
+# Posts packed into one summarization prompt by summarize_posts
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "8"))
+# LLM calls in flight at once across the process
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+# Retries of a failed LLM call, with exponential backoff (and jitter) starting at LLM_BACKOFF_SECONDS
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "1"))
 
+# Bump a prompt's version whenever its wording changes so cached responses are not reused.
+# Single and batched post prompts ask for the same summary and share a version.
+POST_PROMPT_VERSION = "post-1"
+COMMENTS_PROMPT_VERSION = "comments-1"
+COMMENT_PROMPT_LIMIT = 50
+
+# Precedes the JSON list of posts in a batched prompt
+_BATCH_INPUT_MARKER = "Posts (JSON):"
+
+_model = None
+_llm_slots = threading.BoundedSemaphore(LLM_CONCURRENCY)
+
+LLM_SECONDS = REGISTRY.histogram("llm_request_duration_seconds", "LLM call latency", ["kind", "outcome"])
+LLM_CHARS = REGISTRY.counter("llm_chars_total", "Characters sent to and received from the LLM", ["kind", "direction"])
+LLM_TOKENS = REGISTRY.counter("llm_tokens_total", "Tokens billed by the LLM, when it reports usage", ["kind", "direction"])
+LLM_RETRIES = REGISTRY.counter("llm_retries_total", "LLM calls retried after an error", ["kind"])
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubModel:
+    """
+    Offline stand-in for genai.GenerativeModel returning deterministic summaries.
+    Batched prompts get a JSON answer with the same summary each post would get on
+    its own. The first `failures` calls raise, to exercise retries.
+    """
+
+    def __init__(self, latency: float = STUB_MODEL_LATENCY, failures: int = 0):
+        self.latency = latency
+        self.failures = failures
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str) -> _StubResponse:
+        with self._lock:
+            self.calls += 1
+            fail = self.calls <= self.failures
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise RuntimeError("Stub model: injected failure")
+        if _BATCH_INPUT_MARKER in prompt:
+            posts = json.loads(prompt.split(_BATCH_INPUT_MARKER, 1)[1])
+            return _StubResponse(json.dumps([
+                {"id": p["id"], "summary": self._summary(post_prompt(p["title"], p["body"]))} for p in posts
+            ]))
+        return _StubResponse(self._summary(prompt))
+
+    @staticmethod
+    def _summary(prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        words = " ".join(prompt.split()[-12:])
+        return f"Stub summary {digest}: {words}"
+
+
+def get_model():
+    """Return the summarization model, configuring it on first use."""
+    global _model
+    if _model is None:
+        if SUMMARIZER_MODEL == "stub":
+            _model = StubModel()
+        else:
+            # The Gemini SDK takes most of a second to import; only pay for it when used
+            import google.generativeai as genai
+
+            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+            _model = genai.GenerativeModel(SUMMARIZER_MODEL)
+    return _model
+
+
+def set_model(model):
+    """Use `model` (anything with generate_content(prompt) -> .text) for every later call."""
+    global _model
+    _model = model
+
+
+def _generate(kind: str, prompt: str) -> str:
+    """
+    Call the model, at most LLM_CONCURRENCY calls at a time, retrying errors
+    with exponential backoff. Records latency, character and (when reported)
+    token counts.
+    """
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        with _llm_slots:
+            start = time.perf_counter()
+            try:
+                response = get_model().generate_content(prompt)
+                text = response.text.strip()
+            except ValueError:
+                # Blocked or empty response: asking again gets the same answer
+                LLM_SECONDS.labels(kind=kind, outcome="error").observe(time.perf_counter() - start)
+                raise
+            except Exception as e:
+                LLM_SECONDS.labels(kind=kind, outcome="error").observe(time.perf_counter() - start)
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                error = e
+            else:
+                LLM_SECONDS.labels(kind=kind, outcome="ok").observe(time.perf_counter() - start)
+                break
+        delay = LLM_BACKOFF_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5)
+        LLM_RETRIES.labels(kind=kind).inc()
+        print(f"LLM {kind} call failed ({error!r}); retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+    LLM_CHARS.labels(kind=kind, direction="prompt").inc(len(prompt))
+    LLM_CHARS.labels(kind=kind, direction="response").inc(len(text))
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        LLM_TOKENS.labels(kind=kind, direction="prompt").inc(getattr(usage, "prompt_token_count", 0) or 0)
+        LLM_TOKENS.labels(kind=kind, direction="response").inc(getattr(usage, "candidates_token_count", 0) or 0)
+    return text
+
+
+def _cached(cache: LLMCache | None, kind: str, version: str, text: str, generate) -> str:
+    """Return the cached response for `text` under prompt `version`, or generate and cache it."""
+    if cache is None:
+        return generate()
+    key = LLMCache.key(f"{SUMMARIZER_MODEL}:{version}", text)
+    response = cache.get(kind, key)
+    if response is None:
+        response = generate()
+        cache.put(kind, key, response)
+    return response
+
+
+def post_prompt(title, body) -> str:
+    return f"""You are a social media manager for a large enterprise. Summarize the following Reddit post in 3 sentences.
 
-def summarize_post(title, body):
-    prompt = f"""You are a social media manager for a large enterprise. Summarize the following Reddit post in 3 sentences.
-    
     Title: {title}
-    
+
     Body: {body}
     """
-    response = model.generate_content(prompt)
-    return response.text.strip()
 
 
-def summarize_comments(comments: list[str]) -> str:
-    # If more than 50 comments, randomly sample 50
-    if len(comments) > 50:
-        sampled_comments = random.sample(comments, 50)
-    else:
-        sampled_comments = comments
+def _post_input(title, body) -> str:
+    return f"{title}\n\n{body}"
 
-    comments_text = "\n".join(sampled_comments)
+
+def summarize_post(title, body, cache: LLMCache | None = None) -> str:
+    return _cached(
+        cache, "post", POST_PROMPT_VERSION, _post_input(title, body),
+        lambda: _generate("post", post_prompt(title, body)),
+    )
+
+
+def _summarize_batch(posts: list) -> dict[str, str]:
+    """One LLM call summarizing every post in `posts`; posts the answer leaves out are missing."""
+    if len(posts) == 1:
+        return {posts[0]["id"]: _generate("post", post_prompt(posts[0]["title"], posts[0]["body"]))}
+    prompt = f"""You are a social media manager for a large enterprise. Summarize each of the following Reddit posts in 3 sentences.
+    Answer with only a JSON array holding one object per post: [{{"id": "<post id>", "summary": "<summary>"}}].
+
+    {_BATCH_INPUT_MARKER}
+    {json.dumps([{"id": p["id"], "title": p["title"], "body": p["body"]} for p in posts], ensure_ascii=False)}
+    """
+    try:
+        text = _generate("posts_batch", prompt)
+        # Models like to wrap JSON in a ```json fence
+        items = json.loads(text[text.find("["):text.rfind("]") + 1])
+    except Exception as e:
+        print(f"Batched summary of {len(posts)} posts failed: {e!r}")
+        return {}
+    ids = {p["id"] for p in posts}
+    return {
+        item["id"]: item["summary"].strip()
+        for item in items
+        if isinstance(item, dict) and item.get("id") in ids
+        and isinstance(item.get("summary"), str) and item["summary"].strip()
+    }
+
+
+def summarize_posts(posts: list, cache: LLMCache | None = None, batch_size: int = LLM_BATCH_SIZE) -> dict[str, str]:
+    """
+    Summarize many posts (mappings with id, title and body), `batch_size` per
+    LLM call and up to LLM_CONCURRENCY calls at once. Returns {post id: summary};
+    posts whose batch failed or whose summary the model left out are missing,
+    and need a summarize_post call of their own.
+    """
+    version = f"{SUMMARIZER_MODEL}:{POST_PROMPT_VERSION}"
+    keys = {p["id"]: LLMCache.key(version, _post_input(p["title"], p["body"])) for p in posts}
+    summaries = {}
+    if cache is not None:
+        cached = cache.get_many("post", list(keys.values()))
+        summaries = {post_id: cached[key] for post_id, key in keys.items() if key in cached}
+
+    missing = [p for p in posts if p["id"] not in summaries]
+    chunks = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+    if not chunks:
+        return summaries
+    with ThreadPoolExecutor(max_workers=min(LLM_CONCURRENCY, len(chunks)), thread_name_prefix="llm") as pool:
+        fresh = {post_id: s for result in pool.map(_summarize_batch, chunks) for post_id, s in result.items()}
+    if cache is not None:
+        cache.put_many("post", {keys[post_id]: s for post_id, s in fresh.items()})
+    summaries.update(fresh)
+    return summaries
+
+
+def summarize_comments(comments: list[str], cache: LLMCache | None = None) -> str:
+    # Sorted, and sampled with a seed taken from the comments themselves, so the
+    # same comments always make the same prompt
+    comments = sorted(comments)
+    if len(comments) > COMMENT_PROMPT_LIMIT:
+        comments = sorted(random.Random("\n".join(comments)).sample(comments, COMMENT_PROMPT_LIMIT))
+
+    comments_text = "\n".join(comments)
 
     prompt = f"""
     You are a social media manager for State Farm. Summarize the following comments to a Reddit post in 3 sentences, focusing specifically on sentiment towards State Farm.
     Comments: {comments_text}
     """
-    response = model.generate_content(prompt)
-    return response.text.strip()
-
-
+    return _cached(cache, "comments", COMMENTS_PROMPT_VERSION, comments_text, lambda: _generate("comments", prompt))